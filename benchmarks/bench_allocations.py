@@ -0,0 +1,104 @@
+# Measures the memory allocated on the call path with tracemalloc: the size
+# and number of memory blocks of each hot-path object, the peak memory of a
+# call and the time per call.
+#
+#   python -m benchmarks.bench_allocations [--calls 20000]
+import argparse
+import time
+import tracemalloc
+from typing import Any, Callable
+from verlib import VerLib
+from verlib.call import HttpHeaders
+from verlib.jsonrpc import Error, ErrorCode, ErrRes, OkRes, Request
+from verlib.verliberr import ErrKind, ErrMsg, VerLibErr
+from utils.result import Err, Ok
+import verlib.transport as transport
+
+
+def build_lib() -> VerLib:
+    verlib = VerLib("bench")
+
+    @verlib.verproc
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    return verlib
+
+
+def retained(make: Callable[[int], Any], count: int) -> tuple[float, float]:
+    # Bytes and memory blocks per object, kept alive so they can be counted
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [make(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    size = sum(stat.size_diff for stat in stats)
+    blocks = sum(stat.count_diff for stat in stats)
+    del objects
+    # The list holding the objects takes one pointer per object
+    return (size / count - 8, blocks / count)
+
+
+def peak(call: Callable[[], Any], repeat: int = 100) -> int:
+    # Highest memory use above the baseline while a call runs
+    call()
+    tracemalloc.start()
+    highest = 0
+    for _ in range(repeat):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        call()
+        highest = max(highest, tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    return highest
+
+
+def per_call(call: Callable[[], Any], calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        call()
+    return (time.perf_counter() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    error = VerLibErr(ErrKind.INVALID_PARAMS, ErrMsg.INVALID_PARAMS)
+    objects: dict[str, Callable[[int], Any]] = {
+        "Request": lambda i: Request(method="add", id=i, params=None),
+        "Ok": lambda i: Ok(i),
+        "Err": lambda i: Err(error),
+        "VerLibErr": lambda i: VerLibErr(
+            ErrKind.INVALID_PARAMS, ErrMsg.INVALID_PARAMS
+        ),
+        "OkRes": lambda i: OkRes(i, None),
+        "ErrRes + Error": lambda i: ErrRes(
+            i, Error(ErrorCode.INVALID_PARAMS, "", None)
+        ),
+    }
+    print("object              bytes   blocks")
+    for name, make in objects.items():
+        size, blocks = retained(make, 10000)
+        print(f"  {name:16} {size:7.1f} {blocks:8.2f}")
+
+    verlib = build_lib()
+    req = Request(method="add", id=1, params=[1, 2])
+    body = b'{"jsonrpc": "2.0", "method": "add", "params": [1, 2], "id": 1}'
+    headers = HttpHeaders({})
+    calls: dict[str, Callable[[], Any]] = {
+        "execute_rpc": lambda: verlib.execute_rpc(req),
+        "transport.dispatch": lambda: transport.dispatch(verlib, body, headers),
+    }
+    print("call                 peak bytes   us/call")
+    for name, call in calls.items():
+        print(
+            f"  {name:20} {peak(call):9} "
+            f"{per_call(call, args.calls) * 1e6:9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Measures response compression: size and time per level for encoded
+# results, and the Flask dispatch path with and without negotiation.
+#
+#   python -m benchmarks.bench_compression [--calls 2000]
+import argparse
+import json
+import time
+from flask import Flask
+from verlib import VerLib
+from verlib.compression import Compression
+from verlib.jsonrpc import JSONValues
+from verlib.integrations.flask import FlaskVerLib
+
+
+def build_lib() -> VerLib:
+    verlib = VerLib("bench")
+
+    @verlib.verproc
+    def records(count: int) -> list[dict[str, JSONValues]]:
+        return [
+            {"id": i, "name": f"record-{i}", "tags": ["a", "b"], "score": 0.5}
+            for i in range(count)
+        ]
+
+    return verlib
+
+
+def measure_levels(body: bytes, repeat: int):
+    for level in (1, 6, 9):
+        compression = Compression(min_size=0, level=level)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            compressed = compression.compress(body, "gzip")
+        per_call = (time.perf_counter() - started) / repeat
+        print(
+            f"  gzip level={level}: {len(compressed):8} bytes "
+            f"(ratio {len(body) / len(compressed):5.1f}x) "
+            f"{per_call * 1e6:9.1f} us"
+        )
+
+
+def measure_dispatch(app: Flask, body: bytes, calls: int) -> tuple[float, int]:
+    client = app.test_client()
+    headers = {"Content-Type": "application/json", "Accept-Encoding": "gzip"}
+    res = client.post("/verlib", data=body, headers=headers)
+    size = len(res.data)
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        client.post("/verlib", data=body, headers=headers)
+    return ((time.perf_counter() - started) / calls, size)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--level", type=int, default=6)
+    args = parser.parse_args()
+
+    verlib = build_lib()
+    apps: dict[str, Flask] = {}
+    for name, compression in (
+        ("plain", None),
+        ("gzip", Compression(level=args.level)),
+    ):
+        apps[name] = Flask(name)
+        FlaskVerLib(verlib, compression=compression).init_app(apps[name])
+
+    for size in args.sizes:
+        body = json.dumps(
+            {"jsonrpc": "2.0", "id": 1, "method": "records", "params": [size]}
+        ).encode()
+        print(f"records={size}:")
+        for name, app in apps.items():
+            per_call, response_size = measure_dispatch(app, body, args.calls)
+            print(
+                f"  {name:5} dispatch: {per_call * 1e6:9.1f} us/call, "
+                f"{response_size:8} bytes"
+            )
+        result = apps["plain"].test_client().post("/verlib", data=body).data
+        measure_levels(result, max(1, args.calls // 10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Measures execute_rpc throughput with an increasing number of threads, on a
+# mutable and on a frozen library. Throughput only scales across cores on
+# free-threaded (no-GIL) builds of CPython.
+#
+#   python -m benchmarks.bench_concurrent_dispatch [--calls 200000]
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from verlib import VerLib, VerModule
+from verlib.jsonrpc import Request
+
+
+def build_lib(modules: int) -> VerLib:
+    verlib = VerLib("bench")
+    for m in range(modules):
+        module = VerModule(f"module_{m}")
+
+        @module.verproc
+        def add(a: int, b: int) -> int:
+            return a + b
+
+        verlib.declare_module(module)
+    return verlib
+
+
+def run(verlib: VerLib, threads: int, calls: int, modules: int) -> float:
+    per_thread = calls // threads
+    requests = [
+        Request(method=f"module_{i % modules}.add", id=i, params=[i, 1])
+        for i in range(per_thread)
+    ]
+
+    def worker(_: int):
+        for req in requests:
+            verlib.execute_rpc(req)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--modules", type=int, default=50)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"GIL enabled: {gil_enabled}")
+    for frozen in (False, True):
+        verlib = build_lib(args.modules)
+        if frozen:
+            verlib.freeze()
+        for threads in args.threads:
+            throughput = run(verlib, threads, args.calls, args.modules)
+            label = "frozen" if frozen else "mutable"
+            print(f"{label:8} {threads:3} threads: {throughput:12.0f} calls/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Compares the Flask dispatch path against the previous implementation,
+# which parsed the body twice and re-serialized rewrapped responses through
+# flask.jsonify, using Flask's test client.
+#
+#   python -m benchmarks.bench_flask_dispatch [--calls 5000]
+import argparse
+import json
+import time
+import typing
+import flask
+from flask import Flask, request
+from verlib import VerLib
+from verlib.call import HttpHeaders
+from verlib.integrations.flask import FlaskVerLib
+from verlib.jsonrpc import ErrRes, OkRes
+import verlib.jsonrpc as jsonrpc
+
+
+def build_lib() -> VerLib:
+    verlib = VerLib("bench")
+
+    @verlib.verproc
+    def echo(values: list[int]) -> list[int]:
+        return values
+
+    return verlib
+
+
+def legacy_app(verlib: VerLib) -> Flask:
+    app = Flask("legacy")
+
+    @app.post("/verlib")
+    def dispatch() -> flask.Response:
+        req_json: dict = request.get_json()
+        req_id = req_json.get("id")
+        rpc_req = jsonrpc.into_rpc_request(request.get_json())
+        if rpc_req.is_err():
+            return flask.jsonify(ErrRes(req_id, rpc_req.unwrap_err()))
+        rpc_call = rpc_req.unwrap()
+        result = verlib.execute_rpc(
+            rpc_call, http_headers=HttpHeaders(dict(request.headers))
+        )
+        if result.is_err():
+            return flask.jsonify(
+                ErrRes(rpc_call.id, typing.cast(ErrRes, result).err_data())
+            )
+        return flask.jsonify(OkRes(rpc_call.id, result.result_data()))
+
+    return app
+
+
+def lean_app(verlib: VerLib) -> Flask:
+    app = Flask("lean")
+    FlaskVerLib(verlib).init_app(app)
+    return app
+
+
+def measure(app: Flask, body: bytes, calls: int) -> float:
+    client = app.test_client()
+    headers = {"Content-Type": "application/json"}
+    for _ in range(100):
+        client.post("/verlib", data=body, headers=headers)
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        client.post("/verlib", data=body, headers=headers)
+    return (time.perf_counter() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000])
+    args = parser.parse_args()
+
+    verlib = build_lib()
+    apps = {"legacy": legacy_app(verlib), "lean": lean_app(verlib)}
+    for size in args.sizes:
+        body = json.dumps(
+            {
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": "echo",
+                "params": [list(range(size))],
+            }
+        ).encode()
+        for name, app in apps.items():
+            per_call = measure(app, body, args.calls)
+            print(f"{name:7} params={size:6}: {per_call * 1e6:9.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Measures the cost of `import verlib` in a fresh interpreter, and fails if
+# it exceeds a time budget or loads a web framework or an optional
+# dependency.
+#
+#   python -m benchmarks.bench_import [--budget-ms 150] [--repeat 10]
+import argparse
+import subprocess
+import sys
+
+# Modules that `import verlib` must not load
+LAZY_MODULES = ("flask", "django", "werkzeug", "schema", "asyncio", "cProfile")
+
+IMPORT_SCRIPT = """\
+import resource, sys, time
+started = time.perf_counter()
+import verlib
+elapsed = time.perf_counter() - started
+print(elapsed)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+print(",".join(sorted(sys.modules)))
+"""
+
+
+def measure(statement: str) -> tuple[float, int, set[str]]:
+    out = subprocess.run(
+        [sys.executable, "-c", statement],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.splitlines()
+    return float(out[0]), int(out[1]), set(out[2].split(","))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure(IMPORT_SCRIPT) for _ in range(args.repeat)]
+    best = min(elapsed for elapsed, _, _ in runs)
+    rss = min(rss for _, rss, _ in runs)
+    modules = runs[0][2]
+    loaded = [name for name in LAZY_MODULES if name in modules]
+
+    print(f"import verlib: {best * 1000:8.1f} ms (best of {args.repeat})")
+    print(f"max RSS:       {rss / 1024:8.1f} MiB")
+    print(f"modules:       {len(modules):8}")
+
+    failed = False
+    if best * 1000 > args.budget_ms:
+        print(f"FAIL: over the budget of {args.budget_ms:.0f} ms")
+        failed = True
+    if loaded:
+        print(f"FAIL: eagerly loaded {', '.join(loaded)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
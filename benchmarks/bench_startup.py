@@ -0,0 +1,96 @@
+# Compares cold start time of a library declaring all of its modules
+# eagerly against declaring them lazily by import path.
+#
+#   python -m benchmarks.bench_startup [--modules 300] [--procedures 20]
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+MODULE_TEMPLATE = """\
+from verlib import VerModule
+
+module = VerModule("{name}")
+"""
+
+PROC_TEMPLATE = """
+@module.verproc
+def proc_{i}(a: int, b: int) -> int:
+    return a + b + {i}
+"""
+
+STARTUP_SCRIPT = """\
+import json, sys, time
+started = time.perf_counter()
+from verlib import VerLib, LazyVerModule
+verlib = VerLib("bench")
+for name, procs in json.loads(sys.argv[2]).items():
+    if sys.argv[1] == "lazy":
+        verlib.declare_module(LazyVerModule(name, f"{name}:module", procs))
+    else:
+        module = __import__(name)
+        verlib.declare_module(module.module)
+print(time.perf_counter() - started)
+"""
+
+
+def write_modules(
+    root: Path, modules: int, procedures: int
+) -> dict[str, list[str]]:
+    declared: dict[str, list[str]] = {}
+    for m in range(modules):
+        name = f"bench_module_{m}"
+        source = MODULE_TEMPLATE.format(name=name) + "".join(
+            PROC_TEMPLATE.format(i=i) for i in range(procedures)
+        )
+        (root / f"{name}.py").write_text(source)
+        declared[name] = [f"proc_{i}" for i in range(procedures)]
+    return declared
+
+
+def measure(
+    mode: str, root: Path, declared: dict[str, list[str]], repeat: int
+) -> float:
+    env_path = f"{root}:{Path.cwd()}"
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [
+                sys.executable,
+                "-B",
+                "-c",
+                STARTUP_SCRIPT,
+                mode,
+                json.dumps(declared),
+            ],
+            env={"PYTHONPATH": env_path},
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        timings.append(float(out.stdout))
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", type=int, default=300)
+    parser.add_argument("--procedures", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        declared = write_modules(root, args.modules, args.procedures)
+        eager = measure("eager", root, declared, args.repeat)
+        lazy = measure("lazy", root, declared, args.repeat)
+
+    print(f"{args.modules} modules x {args.procedures} procedures")
+    print(f"eager declaration: {eager * 1000:8.1f} ms")
+    print(f"lazy declaration:  {lazy * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+from verlib import VerLib
+from verlib.jsonrpc import Request
+from verlib.call import Context, HttpHeaders
+from verlib.auth import AccessLevel
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DEBUG=True,
+        ALLOWED_HOSTS=["testserver"],
+        ROOT_URLCONF=__name__,
+        MIDDLEWARE=["django.middleware.csrf.CsrfViewMiddleware"],
+    )
+
+from verlib.integrations.django import DjangoVerLib
+from verlib.limits import RequestLimits
+from django.core.handlers.asgi import ASGIRequest
+from django.test import AsyncRequestFactory, Client, RequestFactory
+from typing import Any
+import asyncio
+import io
+import threading
+import json
+import pytest
+
+
+def make_lib() -> VerLib:
+    verlib = VerLib("Testlib")
+
+    @verlib.verproc
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    @verlib.verproc
+    async def async_add(a: int, b: int) -> int:
+        await asyncio.sleep(0)
+        return a + b
+
+    @verlib.private_access
+    @verlib.verproc
+    def double(a: int) -> int:
+        return a * 2
+
+    @verlib.verproc(cache_control="max-age=10")
+    def greet(name: str) -> str:
+        return f"Hello {name}"
+
+    @verlib.context_builder
+    def context_builder(headers: HttpHeaders, req: Request) -> Context:
+        context = Context()
+        context.is_authenticated = headers.get("X-API-KEY") == "baz"
+        return context
+
+    @verlib.auth_provider
+    def auth_provider(
+        headers: HttpHeaders, req: Request, context: Context
+    ) -> AccessLevel:
+        return (
+            AccessLevel.private
+            if context.is_authenticated
+            else AccessLevel.public
+        )
+
+    return verlib
+
+
+django_verlib = DjangoVerLib(make_lib())
+urlpatterns = [
+    *django_verlib.urls("verlib"),
+    *django_verlib.urls("async", use_async=True),
+]
+
+
+def rpc_body(**kwargs: Any) -> bytes:
+    return json.dumps({"jsonrpc": "2.0", "id": 1, **kwargs}).encode()
+
+
+def test_django_view():
+    request = RequestFactory().post(
+        "/verlib",
+        rpc_body(method="add", params=[42, 13]),
+        content_type="application/json",
+    )
+    res = django_verlib.view(request)
+
+    assert res.status_code == 200
+    assert res["Content-Type"] == "application/json"
+    assert json.loads(res.content) == {"id": 1, "jsonrpc": "2.0", "result": 55}
+
+
+def test_django_async_view():
+    async def call(method: str) -> Any:
+        request = AsyncRequestFactory().post(
+            "/async",
+            rpc_body(method=method, params=[1, 2]),
+            content_type="application/json",
+        )
+        res = await django_verlib.async_view(request)
+        return json.loads(res.content)["result"]
+
+    async def run() -> list[Any]:
+        return list(await asyncio.gather(call("add"), call("async_add")))
+
+    assert asyncio.run(run()) == [3, 3]
+
+
+def test_django_async_view_runs_sync_procedures_concurrently():
+    verlib = VerLib("concurrent")
+    barrier = threading.Barrier(2, timeout=5)
+
+    # Only returns once both calls run at the same time
+    @verlib.verproc
+    def meet() -> int:
+        return barrier.wait()
+
+    django_verlib = DjangoVerLib(verlib)
+
+    async def call() -> Any:
+        request = AsyncRequestFactory().post(
+            "/async", rpc_body(method="meet"), content_type="application/json"
+        )
+        res = await django_verlib.async_view(request)
+        return json.loads(res.content)["result"]
+
+    async def run() -> list[Any]:
+        return list(await asyncio.gather(call(), call()))
+
+    assert sorted(asyncio.run(run())) == [0, 1]
+
+
+def test_django_urls_are_csrf_exempt_and_read_headers():
+    client = Client(enforce_csrf_checks=True)
+    for lib_url in ("/verlib", "/async"):
+        res: Any = client.post(
+            lib_url,
+            rpc_body(method="double", params=[2]),
+            content_type="application/json",
+        )
+        assert res.json()["error"]["code"] == -32501
+
+        res = client.post(
+            lib_url,
+            rpc_body(method="double", params=[2]),
+            content_type="application/json",
+            HTTP_X_API_KEY="baz",
+        )
+        assert res.json()["result"] == 4
+
+
+def test_django_rejects_other_methods():
+    res: Any = Client().get("/verlib")
+    assert res.status_code == 405
+
+
+def test_django_lib_import_with_etag():
+    client = Client()
+    res: Any = client.get("/verlib/import")
+    assert res.status_code == 200
+    assert len(res.json()["result"]) == 4
+
+    res = client.get("/verlib/import", HTTP_IF_NONE_MATCH=res["ETag"])
+    assert res.status_code == 304
+
+
+def test_django_read_call_over_get():
+    client = Client()
+    res: Any = client.get("/verlib/call/greet", {"name": '"Ana"'})
+    assert res.status_code == 200
+    assert res["Cache-Control"] == "max-age=10"
+    assert res.json()["result"] == "Hello Ana"
+
+    res = client.get(
+        "/verlib/call/greet", {"name": '"Ana"'}, HTTP_IF_NONE_MATCH=res["ETag"]
+    )
+    assert res.status_code == 304
+
+
+def test_django_enforces_request_limits():
+    django_verlib = DjangoVerLib(make_lib(), limits=RequestLimits(max_depth=2))
+
+    request = RequestFactory().post(
+        "/verlib",
+        rpc_body(method="add", params=[1, 2]),
+        content_type="application/json",
+    )
+    assert json.loads(django_verlib.view(request).content)["result"] == 3
+
+    request = RequestFactory().post(
+        "/verlib",
+        rpc_body(method="add", params=[[1], 2]),
+        content_type="application/json",
+    )
+    res = django_verlib.view(request)
+    assert json.loads(res.content)["error"]["data"]["limit"] == "max_depth"
+
+
+def test_django_reads_bodies_without_content_length():
+    django_verlib = DjangoVerLib(make_lib(), limits=RequestLimits())
+    # An ASGI request with a chunked body
+    request = ASGIRequest(
+        {
+            "type": "http",
+            "method": "POST",
+            "path": "/async",
+            "headers": [(b"content-type", b"application/json")],
+        },
+        io.BytesIO(rpc_body(method="add", params=[1, 2])),
+    )
+    res = asyncio.run(django_verlib.async_view(request))
+    assert json.loads(res.content)["result"] == 3
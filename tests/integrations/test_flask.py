@@ -3,10 +3,15 @@ from verlib.jsonrpc import Request
 from verlib import VerLib
 from verlib.call import Context, HttpHeaders
 from verlib.auth import AccessLevel
+from verlib.admission import ConcurrencyLimit
+from verlib.compression import Compression
+from verlib.limits import RequestLimits
 
 from flask import Flask
 from flask.testing import FlaskClient
 from typing import Any, cast
+import gzip
+import json
 import pytest
 
 
@@ -146,29 +151,57 @@ def test_res_on_invalid_params(
 
 
 def test_res_on_exception(client: FlaskClient, jsonrpc_headers: dict[str, Any]):
-    with pytest.raises(Exception):
-        res = client.post(
-            "/verlib",
-            json={**jsonrpc_headers, "method": "add", "params": [None, 13]},
-        )
+    res = client.post(
+        "/verlib",
+        json={**jsonrpc_headers, "method": "add", "params": [None, 13]},
+    )
+
+    assert res.status_code == 200
+    assert res.json == {
+        "id": 1,
+        "jsonrpc": "2.0",
+        "error": {
+            "code": -32500,
+            "message": "An error occurred during the execution of the procedure.",
+            "data": None,
+        },
+    }
 
 
 def test_res_on_lib_import(client: FlaskClient):
-    with pytest.raises(Exception):
-        res = client.get("/verlib/import")
-        lib_import: dict = cast(dict, res.json)
-
-        assert lib_import["id"] == None
-        assert lib_import["result"] is not None
-        assert len(lib_import["result"]) == 3
-        assert all(
-            map(
-                lambda p: "name" in p
-                and "num_params" in p
-                and p["module"] in ("_default_", "test_module"),
-                lib_import["result"],
-            )
+    res = client.get("/verlib/import")
+    lib_import: dict = cast(dict, res.json)
+
+    assert lib_import["id"] == None
+    assert lib_import["result"] is not None
+    assert len(lib_import["result"]) == 3
+    assert all(
+        map(
+            lambda p: "name" in p
+            and "num_params" in p
+            and p["module"] in ("_default_", "test_module"),
+            lib_import["result"],
         )
+    )
+
+
+def test_lib_import_supports_etags(client: FlaskClient, test_lib: VerLib):
+    res = client.get("/verlib/import")
+    etag = res.headers["ETag"]
+    assert etag == f'"{test_lib.describe().etag}"'
+
+    res = client.get("/verlib/import", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.data == b""
+
+    @test_lib.verproc
+    def new_proc() -> int:
+        return 1
+
+    res = client.get("/verlib/import", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+    assert len(cast(dict, res.json)["result"]) == 4
 
 
 def test_cannot_access_private_method_without_auth(
@@ -204,3 +237,153 @@ def test_can_access_private_method_with_auth(
         "jsonrpc": "2.0",
         "result": 26,
     }
+
+
+def test_overloaded_call_returns_retry_hint(
+    app: Flask, jsonrpc_headers: dict[str, Any]
+):
+    limit = ConcurrencyLimit(1, retry_after=1.5)
+    verlib = VerLib("Testlib", limit=limit)
+
+    @verlib.verproc
+    def foo():
+        return 1
+
+    FlaskVerLib(verlib).init_app(app)
+    client = app.test_client()
+
+    assert limit.try_acquire()
+    res = client.post("/verlib", json={**jsonrpc_headers, "method": "foo"})
+
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == "2"
+    assert res.json == {
+        "id": 1,
+        "jsonrpc": "2.0",
+        "error": {
+            "code": -32502,
+            "message": "The server is overloaded, retry the call later.",
+            "data": {"retry_after": 1.5},
+        },
+    }
+
+
+def test_res_on_parse_error(client: FlaskClient):
+    res = client.post(
+        "/verlib",
+        data=b'{"jsonrpc": "2.0", "method"',
+        content_type="application/json",
+    )
+
+    assert res.status_code == 200
+    assert res.json == {
+        "id": None,
+        "jsonrpc": "2.0",
+        "error": {"code": -32700, "message": "Parse error", "data": None},
+    }
+
+
+def test_res_on_non_object_request(client: FlaskClient):
+    res = client.post("/verlib", json=1)
+
+    assert res.json == {
+        "id": None,
+        "jsonrpc": "2.0",
+        "error": {"code": -32600, "message": "Invalid Request", "data": None},
+    }
+
+
+def test_res_on_batch_of_invalid_requests(client: FlaskClient):
+    res = client.post("/verlib", json=[1, 2])
+
+    error = {"code": -32600, "message": "Invalid Request", "data": None}
+    assert res.json == [
+        {"id": None, "jsonrpc": "2.0", "error": error},
+        {"id": None, "jsonrpc": "2.0", "error": error},
+    ]
+
+
+def test_res_is_pre_encoded_json(
+    client: FlaskClient, jsonrpc_headers: dict[str, Any]
+):
+    res = client.post(
+        "/verlib",
+        data=json.dumps({**jsonrpc_headers, "method": "add", "params": [1, 2]}),
+    )
+
+    assert res.mimetype == "application/json"
+    assert res.data == b'{"id":1,"result":3,"jsonrpc":"2.0"}'
+
+
+def test_read_call_over_get(app: Flask, test_lib: VerLib):
+    @test_lib.verproc(cache_control="public, max-age=60")
+    def scale(value: int, factor: int) -> int:
+        return value * factor
+
+    FlaskVerLib(test_lib).init_app(app)
+    client = app.test_client()
+
+    res = client.get("/verlib/call/scale?factor=3&value=2")
+    assert res.status_code == 200
+    assert res.headers["Cache-Control"] == "public, max-age=60"
+    assert res.json == {"id": None, "jsonrpc": "2.0", "result": 6}
+
+    res = client.get(
+        "/verlib/call/scale?factor=3&value=2",
+        headers={"If-None-Match": res.headers["ETag"]},
+    )
+    assert res.status_code == 304
+
+    res = client.get("/verlib/call/add?a=1&b=2")
+    assert res.status_code == 405
+
+
+def test_compresses_large_responses(app: Flask, test_lib: VerLib):
+    @test_lib.verproc
+    def numbers(count: int) -> list[int]:
+        return list(range(count))
+
+    FlaskVerLib(test_lib, compression=Compression(min_size=1000)).init_app(app)
+    client = app.test_client()
+
+    res = client.post(
+        "/verlib",
+        json={"jsonrpc": "2.0", "id": 1, "method": "numbers", "params": [1000]},
+        headers={"Accept-Encoding": "gzip, deflate"},
+    )
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(res.data))["result"] == list(range(1000))
+
+    res = client.post(
+        "/verlib",
+        json={"jsonrpc": "2.0", "id": 1, "method": "numbers", "params": [1]},
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert "Content-Encoding" not in res.headers
+    assert res.json == {"id": 1, "jsonrpc": "2.0", "result": [0]}
+
+
+def test_enforces_request_limits(app: Flask, test_lib: VerLib):
+    FlaskVerLib(test_lib, limits=RequestLimits(max_body_size=200)).init_app(app)
+    client = app.test_client()
+
+    res = client.post(
+        "/verlib",
+        json={"jsonrpc": "2.0", "id": 1, "method": "add", "params": [1, 2]},
+    )
+    assert res.json == {"id": 1, "jsonrpc": "2.0", "result": 3}
+
+    res = client.post(
+        "/verlib",
+        json={
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "add",
+            "params": ["x" * 200],
+        },
+    )
+    assert res.status_code == 413
+    assert cast(dict, res.json)["error"]["data"] == {
+        "limit": "max_body_size",
+        "maximum": 200,
+    }
@@ -0,0 +1,239 @@
+from verlib.integrations.wsgi import WSGIVerLib
+from verlib.jsonrpc import Request
+from verlib import VerLib
+from verlib.call import Context, HttpHeaders
+from verlib.compression import Compression
+from verlib.limits import RequestLimits
+from verlib.auth import AccessLevel
+
+from wsgiref.util import setup_testing_defaults
+from wsgiref.validate import validator
+from typing import Any, Callable
+import gzip
+import io
+import json
+import pytest
+
+
+@pytest.fixture
+def auth_key() -> str:
+    return "baz"
+
+
+@pytest.fixture
+def test_lib(auth_key: str) -> VerLib:
+    verlib = VerLib("Testlib")
+
+    @verlib.verproc
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    @verlib.private_access
+    @verlib.verproc
+    def double(a: int) -> int:
+        return a * 2
+
+    @verlib.verproc(cache_control="public, max-age=60")
+    def greet(name: str) -> str:
+        return f"Hello {name}"
+
+    @verlib.context_builder
+    def context_builder(headers: HttpHeaders, req: Request) -> Context:
+        context = Context()
+        context.is_authenticated = headers.get("X-API-KEY") == auth_key
+        return context
+
+    @verlib.auth_provider
+    def auth_provider(
+        headers: HttpHeaders, req: Request, context: Context
+    ) -> AccessLevel:
+        return (
+            AccessLevel.private
+            if context.is_authenticated
+            else AccessLevel.public
+        )
+
+    return verlib
+
+
+@pytest.fixture
+def app(test_lib: VerLib) -> WSGIVerLib:
+    return WSGIVerLib(test_lib)
+
+
+def call(
+    app: Any,
+    method: str,
+    path: str,
+    body: bytes = b"",
+    headers: dict[str, str] | None = None,
+    script_name: str = "",
+    query: str = "",
+) -> tuple[str, dict[str, str], bytes]:
+    environ: dict[str, Any] = {
+        "REQUEST_METHOD": method,
+        "SCRIPT_NAME": script_name,
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "CONTENT_LENGTH": str(len(body)),
+        "CONTENT_TYPE": "application/json",
+        # Trailing garbage must never be read past Content-Length
+        "wsgi.input": io.BytesIO(body + b"garbage"),
+    }
+    for name, value in (headers or {}).items():
+        environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+    setup_testing_defaults(environ)
+
+    response: dict[str, Any] = {}
+
+    def start_response(
+        status: str, headers: list[tuple[str, str]], exc_info: Any = None
+    ) -> Callable[[bytes], object]:
+        response["status"] = status
+        response["headers"] = dict(headers)
+        return lambda data: None
+
+    chunks = validator(app)(environ, start_response)
+    body = b"".join(chunks)
+    getattr(chunks, "close", lambda: None)()
+    return response["status"], response["headers"], body
+
+
+def rpc_body(**kwargs: Any) -> bytes:
+    return json.dumps({"jsonrpc": "2.0", "id": 1, **kwargs}).encode()
+
+
+def test_wsgi_successful_rpc_request(app: WSGIVerLib):
+    status, headers, body = call(
+        app, "POST", "/verlib", rpc_body(method="add", params=[42, 13])
+    )
+
+    assert status == "200 OK"
+    assert headers["Content-Type"] == "application/json"
+    assert headers["Content-Length"] == str(len(body))
+    assert json.loads(body) == {"id": 1, "jsonrpc": "2.0", "result": 55}
+
+
+def test_wsgi_reads_headers_from_environ(app: WSGIVerLib, auth_key: str):
+    _, _, body = call(
+        app, "POST", "/verlib", rpc_body(method="double", params=[2])
+    )
+    assert json.loads(body)["error"]["code"] == -32501
+
+    _, _, body = call(
+        app,
+        "POST",
+        "/verlib",
+        rpc_body(method="double", params=[2]),
+        headers={"X-API-KEY": auth_key},
+    )
+    assert json.loads(body)["result"] == 4
+
+
+def test_wsgi_parse_error(app: WSGIVerLib):
+    _, _, body = call(app, "POST", "/verlib", b'{"jsonrpc"')
+    assert json.loads(body)["error"]["code"] == -32700
+
+
+def test_wsgi_unknown_path_and_method(app: WSGIVerLib):
+    status, _, _ = call(app, "POST", "/other", rpc_body(method="add"))
+    assert status == "404 Not Found"
+
+    status, headers, _ = call(app, "GET", "/verlib")
+    assert status == "405 Method Not Allowed"
+    assert headers["Allow"] == "POST"
+
+
+def test_wsgi_mounted_at_root(test_lib: VerLib):
+    app = WSGIVerLib(test_lib, lib_url="/")
+    status, _, body = call(
+        app,
+        "POST",
+        "/",
+        rpc_body(method="add", params=[1, 2]),
+        script_name="/api/rpc",
+    )
+    assert status == "200 OK"
+    assert json.loads(body)["result"] == 3
+
+
+def test_wsgi_lib_import_with_etag(app: WSGIVerLib, test_lib: VerLib):
+    status, headers, body = call(app, "GET", "/verlib/import")
+    assert status == "200 OK"
+    assert json.loads(body) == test_lib.import_lib().to_dict()
+    etag = headers["ETag"]
+
+    status, _, body = call(
+        app, "GET", "/verlib/import", headers={"If-None-Match": etag}
+    )
+    assert status == "304 Not Modified"
+    assert body == b""
+
+
+def test_wsgi_read_call_over_get(app: WSGIVerLib):
+    status, headers, body = call(
+        app, "GET", "/verlib/call/greet", query="name=%22Ana%22"
+    )
+    assert status == "200 OK"
+    assert headers["Cache-Control"] == "public, max-age=60"
+    assert json.loads(body) == {
+        "id": None,
+        "jsonrpc": "2.0",
+        "result": "Hello Ana",
+    }
+
+    status, _, body = call(
+        app,
+        "GET",
+        "/verlib/call/greet",
+        headers={"If-None-Match": headers["ETag"]},
+        query="name=%22Ana%22",
+    )
+    assert status == "304 Not Modified"
+
+    status, headers, _ = call(app, "GET", "/verlib/call/add", query="a=1&b=2")
+    assert status == "405 Method Not Allowed"
+    assert headers["Allow"] == "POST"
+
+
+def test_wsgi_compresses_large_responses(test_lib: VerLib):
+    app = WSGIVerLib(test_lib, compression=Compression(min_size=10))
+
+    status, headers, body = call(
+        app,
+        "POST",
+        "/verlib",
+        rpc_body(method="add", params=[1, 2]),
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert status == "200 OK"
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["Content-Length"] == str(len(body))
+    assert json.loads(gzip.decompress(body))["result"] == 3
+
+    status, headers, body = call(
+        app, "POST", "/verlib", rpc_body(method="add", params=[1, 2])
+    )
+    assert "Content-Encoding" not in headers
+    assert json.loads(body)["result"] == 3
+
+
+def test_wsgi_enforces_request_limits(test_lib: VerLib):
+    app = WSGIVerLib(test_lib, limits=RequestLimits(max_body_size=100))
+
+    status, _, body = call(app, "POST", "/verlib", b"[" + b" " * 100 + b"]")
+    assert status == "413 Request Entity Too Large"
+    assert json.loads(body)["error"]["data"]["limit"] == "max_body_size"
+
+    status, _, body = call(
+        app, "POST", "/verlib", rpc_body(method="add", params=[1, 2])
+    )
+    assert status == "200 OK"
+    assert json.loads(body)["result"] == 3
+
+    app = WSGIVerLib(test_lib, limits=RequestLimits(max_depth=3))
+    status, _, body = call(
+        app, "POST", "/verlib", rpc_body(method="add", params=[[[1]], 2])
+    )
+    assert status == "200 OK"
+    assert json.loads(body)["error"]["data"]["limit"] == "max_depth"
@@ -0,0 +1,329 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import pytest
+from typing import Any
+from verlib.admission import (
+    ConcurrencyLimit,
+    AdaptiveLimit,
+    FairShareLimit,
+    acquire_all,
+    release_all,
+)
+from verlib.call import Context, HttpHeaders
+from verlib.jsonrpc import Request
+from verlib.verlib import VerLib, VerModule
+
+
+def test_concurrency_limit_admits_up_to_max_concurrency():
+    limit = ConcurrencyLimit(2)
+
+    assert limit.try_acquire()
+    assert limit.try_acquire()
+    assert not limit.try_acquire()
+    assert limit.in_flight == 2
+
+    limit.release()
+    assert limit.try_acquire()
+
+
+def test_concurrency_limit_rejects_invalid_config():
+    with pytest.raises(ValueError):
+        ConcurrencyLimit(0)
+
+    with pytest.raises(ValueError):
+        ConcurrencyLimit(1, max_queue=-1)
+
+
+def test_concurrency_limit_queued_call_waits_for_slot():
+    limit = ConcurrencyLimit(1, max_queue=1, queue_timeout=5)
+    assert limit.try_acquire()
+
+    results: list[bool] = []
+    waiter = threading.Thread(
+        target=lambda: results.append(limit.try_acquire())
+    )
+    waiter.start()
+
+    while limit.queued == 0:
+        pass
+    # The queue is full, so further calls are shed immediately
+    assert not limit.try_acquire()
+
+    limit.release()
+    waiter.join()
+    assert results == [True]
+    assert limit.in_flight == 1
+
+
+def test_concurrency_limit_queued_call_times_out():
+    limit = ConcurrencyLimit(1, max_queue=1, queue_timeout=0.01)
+    assert limit.try_acquire()
+    assert not limit.try_acquire()
+    assert limit.queued == 0
+
+
+@pytest.mark.parametrize("limit_type", [ConcurrencyLimit, FairShareLimit])
+def test_async_queued_call_waits_on_the_loop(
+    limit_type: type[ConcurrencyLimit],
+):
+    limit = limit_type(1, max_queue=1, queue_timeout=5)
+
+    async def run():
+        assert await limit.acquire_async()
+        waiter = asyncio.create_task(limit.acquire_async())
+        await asyncio.sleep(0)
+        assert limit.queued == 1
+        # The queue is full, so further calls are shed immediately
+        assert not await limit.acquire_async()
+
+        limit.release()
+        assert await waiter
+        assert limit.in_flight == 1
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("limit_type", [ConcurrencyLimit, FairShareLimit])
+def test_cancelled_async_call_gives_its_slot_back(
+    limit_type: type[ConcurrencyLimit],
+):
+    limit = limit_type(1, max_queue=2)
+
+    async def run():
+        assert await limit.acquire_async()
+        cancelled = asyncio.create_task(limit.acquire_async())
+        handed_over = asyncio.create_task(limit.acquire_async())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert limit.queued == 1
+
+        # Cancelled after `release` handed it the slot
+        limit.release()
+        handed_over.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await handed_over
+
+    asyncio.run(run())
+    assert limit.in_flight == 0
+    assert limit.queued == 0
+    assert limit.try_acquire(blocking=False)
+
+
+def test_acquire_all_releases_on_rejection():
+    proc_limit = ConcurrencyLimit(1)
+    global_limit = ConcurrencyLimit(1)
+    assert global_limit.try_acquire()
+
+    assert acquire_all([proc_limit, global_limit]) is global_limit
+    assert proc_limit.in_flight == 0
+
+    global_limit.release()
+    assert acquire_all([proc_limit, global_limit]) is None
+    release_all([proc_limit, global_limit], 0.01)
+    assert proc_limit.in_flight == 0
+    assert global_limit.in_flight == 0
+
+
+def test_adaptive_limit_shrinks_when_latency_rises():
+    limit = AdaptiveLimit(50, min_concurrency=5, max_concurrency=100)
+    for _ in range(20):
+        assert limit.try_acquire()
+        limit.release(0.01)
+    steady_limit = limit.max_concurrency
+
+    for _ in range(50):
+        assert limit.try_acquire()
+        limit.release(0.5)
+
+    assert limit.max_concurrency < steady_limit
+    assert limit.max_concurrency >= 5
+
+
+def test_adaptive_limit_grows_when_latency_is_stable():
+    limit = AdaptiveLimit(10, max_concurrency=40)
+    for _ in range(100):
+        assert limit.try_acquire()
+        limit.release(0.01)
+
+    assert 10 < limit.max_concurrency <= 40
+
+
+def test_fair_share_limit_admits_by_weight():
+    limit = FairShareLimit(1, weights={"interactive": 3}, max_queue=10)
+    assert limit.try_acquire(priority_class="batch")
+
+    order: list[str] = []
+    admitted = threading.Semaphore(0)
+
+    def wait(priority_class: str):
+        assert limit.try_acquire(priority_class=priority_class)
+        order.append(priority_class)
+        admitted.release()
+
+    threads = []
+    for i, priority_class in enumerate(["batch"] * 4 + ["interactive"] * 3):
+        thread = threading.Thread(target=wait, args=(priority_class,))
+        thread.start()
+        threads.append(thread)
+        while limit.queued <= i:
+            pass
+
+    for _ in threads:
+        limit.release()
+        admitted.acquire()
+    for thread in threads:
+        thread.join()
+
+    # The interactive calls arrived last but get 3 slots for every batch one
+    assert order == [
+        "interactive",
+        "interactive",
+        "batch",
+        "interactive",
+        "batch",
+        "batch",
+        "batch",
+    ]
+    stats = limit.stats()
+    assert stats["interactive"].admitted == 3
+    assert stats["batch"].admitted == 5
+    assert stats["interactive"].queued == 0
+    assert stats["batch"].max_wait >= stats["interactive"].max_wait > 0
+
+
+def test_fair_share_limit_skips_timed_out_calls():
+    limit = FairShareLimit(1, max_queue=1, queue_timeout=0.01)
+    assert limit.try_acquire()
+    assert not limit.try_acquire(priority_class="tenant")
+    assert not limit.try_acquire(blocking=False, priority_class="tenant")
+    assert limit.stats()["tenant"].rejected == 2
+    assert limit.queued == 0
+
+    limit.release()
+    assert limit.try_acquire(priority_class="tenant")
+    limit.release()
+    assert limit.in_flight == 0
+
+    with pytest.raises(ValueError):
+        FairShareLimit(1, weights={"batch": 0})
+
+
+def test_verlib_assigns_priority_classes():
+    limit = FairShareLimit(4)
+    verlib = VerLib("scheduled", limit=limit)
+    reports = VerModule("reports", priority_class="batch")
+
+    @reports.verproc
+    def monthly() -> int:
+        return 1
+
+    @reports.verproc(priority_class="interactive")
+    def today() -> int:
+        return 1
+
+    @verlib.verproc
+    def ping() -> int:
+        return 1
+
+    verlib.declare_module(reports)
+
+    @verlib.context_builder
+    def context_builder(headers: HttpHeaders, req: Request) -> Context:
+        context = Context()
+        context.tenant = headers.get("X-Tenant")
+        return context
+
+    @verlib.priority_classifier
+    def by_tenant(context: Context, req: Request) -> str | None:
+        return context.tenant
+
+    for method in ("reports.monthly", "reports.today", "ping"):
+        verlib.execute_rpc(Request(method=method, id=1))
+    verlib.execute_rpc(
+        Request(method="reports.monthly", id=1),
+        HttpHeaders({"X-Tenant": "acme"}),
+    )
+
+    assert {name: stats.admitted for name, stats in limit.stats().items()} == {
+        "batch": 1,
+        "interactive": 1,
+        "default": 1,
+        "acme": 1,
+    }
+
+
+def test_verlib_counts_queued_async_calls_once():
+    limit = FairShareLimit(1, max_queue=2, queue_timeout=5)
+    verlib = VerLib("queued", limit=limit)
+
+    @verlib.verproc
+    async def slow() -> int:
+        await asyncio.sleep(0.01)
+        return 1
+
+    async def run() -> list[Any]:
+        return list(
+            await asyncio.gather(
+                *(
+                    verlib.execute_rpc_async(Request(method="slow", id=i))
+                    for i in range(3)
+                )
+            )
+        )
+
+    assert all(res.is_success() for res in asyncio.run(run()))
+    stats = limit.stats()["default"]
+    assert (stats.admitted, stats.rejected) == (3, 0)
+
+
+def test_verlib_queued_async_calls_leave_the_thread_pool_to_procedures():
+    limit = ConcurrencyLimit(2, max_queue=100, queue_timeout=5)
+    verlib = VerLib("queued", limit=limit)
+
+    @verlib.verproc
+    def slow() -> int:
+        time.sleep(0.01)
+        return 1
+
+    async def run() -> list[Any]:
+        # A pool as small as the limit, shared by the queued calls and the
+        # sync procedures they run
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(2))
+
+        async def run_sync(fn: Any) -> Any:
+            return await loop.run_in_executor(None, fn)
+
+        calls = (
+            verlib.execute_rpc_async(
+                Request(method="slow", id=i), run_sync=run_sync
+            )
+            for i in range(20)
+        )
+        return list(await asyncio.wait_for(asyncio.gather(*calls), 2))
+
+    assert all(res.is_success() for res in asyncio.run(run()))
+    assert limit.in_flight == 0
+
+
+def test_fair_share_limit_counts_async_calls_once():
+    limit = FairShareLimit(1, max_queue=2, queue_timeout=0.01)
+
+    async def run():
+        assert await limit.acquire_async("tenant")
+        # Queued, and not counted as rejected until it times out
+        assert not await limit.acquire_async("tenant")
+        cancelled = asyncio.create_task(limit.acquire_async("tenant"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+
+    asyncio.run(run())
+    stats = limit.stats()["tenant"]
+    # The cancelled call was neither admitted nor rejected
+    assert (stats.admitted, stats.rejected, stats.queued) == (1, 1, 0)
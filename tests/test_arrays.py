@@ -0,0 +1,52 @@
+from array import array
+import base64
+from typing import Annotated, Any
+import pytest
+from verlib.arrays import DoubleArray, TypedArray, encode_array, typed_array_of
+
+
+def test_typed_array_of_reads_annotation():
+    assert typed_array_of(DoubleArray) == TypedArray("d")
+    assert typed_array_of(Annotated[array, "other"]) is None
+    assert typed_array_of(list[float]) is None
+
+
+def test_typed_array_rejects_invalid_typecodes():
+    with pytest.raises(TypeError):
+        TypedArray("u")
+    with pytest.raises(TypeError):
+        TypedArray("d", "tuple")  # type: ignore
+
+
+def test_decode_list_and_base64():
+    typed_array = TypedArray("d")
+
+    decoded = typed_array.decode([1.5, 2, 3])
+    assert isinstance(decoded, array)
+    assert decoded == array("d", [1.5, 2, 3])
+
+    encoded = encode_array(array("d", [1.5, 2.5]))
+    assert typed_array.decode(encoded) == array("d", [1.5, 2.5])
+    assert typed_array.decode(base64.b64decode(encoded)) == array(
+        "d", [1.5, 2.5]
+    )
+
+
+def test_decode_memoryview():
+    view = TypedArray("i", "memoryview").decode([1, 2, 3])
+    assert isinstance(view, memoryview)
+    assert view.format == "i"
+    assert view.tolist() == [1, 2, 3]
+
+
+def test_decode_numpy():
+    numpy = pytest.importorskip("numpy")
+    values = TypedArray("d", "numpy").decode([1.0, 2.0])
+    assert isinstance(values, numpy.ndarray)
+    assert values.tolist() == [1.0, 2.0]
+
+
+@pytest.mark.parametrize("value", [["a"], "not base64!", b"\x00" * 7, 5])
+def test_decode_invalid_values(value: Any):
+    with pytest.raises((TypeError, ValueError, OverflowError)):
+        TypedArray("d").decode(value)
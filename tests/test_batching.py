@@ -0,0 +1,60 @@
+import threading
+import pytest
+from verlib.batching import BatchCollector, invoke_batch
+
+
+def test_invoke_batch_checks_result_count():
+    assert invoke_batch(
+        lambda calls: [a * 2 for (a,) in calls], [(1,), (2,)]
+    ) == [2, 4]
+
+    with pytest.raises(ValueError):
+        invoke_batch(lambda calls: [], [(1,)])
+
+
+def test_collector_merges_concurrent_calls():
+    batches: list[list[tuple[int, ...]]] = []
+
+    def double(calls: list[tuple[int, ...]]) -> list[int]:
+        batches.append(calls)
+        return [a * 2 for (a,) in calls]
+
+    collector = BatchCollector(double, window=5, max_batch_size=4)
+    results: dict[int, int] = {}
+
+    def submit(i: int):
+        results[i] = collector.submit((i,))
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == {i: i * 2 for i in range(4)}
+    assert len(batches) == 1
+    assert sorted(batches[0]) == [(0,), (1,), (2,), (3,)]
+
+
+def test_collector_without_window_runs_each_call():
+    batches: list[int] = []
+
+    def count(calls: list[tuple[int, ...]]) -> list[int]:
+        batches.append(len(calls))
+        return [a for (a,) in calls]
+
+    collector = BatchCollector(count, window=0)
+
+    assert collector.submit((1,)) == 1
+    assert collector.submit((2,)) == 2
+    assert batches == [1, 1]
+
+
+def test_collector_fans_out_exceptions():
+    def fail(calls: list[tuple[int, ...]]) -> list[int]:
+        raise KeyError()
+
+    collector = BatchCollector(fail, window=0)
+
+    with pytest.raises(KeyError):
+        collector.submit((1,))
@@ -1,3 +1,5 @@
+import pytest
+from typing import Any
 from verlib.call import HttpHeaders
 
 
@@ -19,3 +21,54 @@ def test_http_headers_makes_key_case_insensitive():
     assert headers.get("CONTENT-TYPE") == "application/json"
     assert headers.get("content-LENGTH") == 68
     assert headers.get("content-LENGTH1") is None
+
+
+def test_http_headers_wraps_raw_asgi_pairs():
+    headers = HttpHeaders.from_asgi(
+        {
+            "type": "http",
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"x-api-key", b"baz"),
+                (b"x-api-key", b"ignored"),
+            ],
+        }
+    )
+
+    assert headers["X-API-KEY"] == "baz"
+    assert headers.get("Content-Type") == "application/json"
+    assert "x-missing" not in headers
+    assert headers.get("x-missing", "default") == "default"
+    assert list(headers) == ["content-type", "x-api-key", "x-api-key"]
+
+
+def test_http_headers_delegates_to_case_insensitive_source():
+    lookups: list[str] = []
+
+    class NativeHeaders:
+        def get(self, key: str, default: Any = None) -> Any:
+            lookups.append(key)
+            return "baz" if key.lower() == "x-api-key" else default
+
+        def items(self):
+            return [("X-Api-Key", "baz")]
+
+    headers = HttpHeaders(NativeHeaders(), case_insensitive=True)
+
+    assert headers["x-api-key"] == "baz"
+    assert headers["X-API-KEY"] == "baz"
+    assert headers.get("Content-Type") is None
+    assert dict(headers) == {"x-api-key": "baz"}
+    # Looked up keys are memoized
+    assert lookups == ["x-api-key", "Content-Type"]
+
+
+def test_http_headers_is_read_only_mapping():
+    headers = HttpHeaders({"Content-Type": "application/json"})
+
+    assert len(headers) == 1
+    assert dict(headers) == {"content-type": "application/json"}
+    with pytest.raises(KeyError):
+        headers["Content-Length"]
+    with pytest.raises(TypeError):
+        headers["Content-Length"] = 1  # type: ignore
@@ -0,0 +1,63 @@
+import gzip
+import zlib
+import pytest
+from verlib.compression import Compression, negotiate
+from verlib.transport import TransportResponse
+
+
+def test_negotiate_picks_highest_q_value():
+    encodings = ("gzip", "deflate")
+    assert negotiate("gzip, deflate", encodings) == "gzip"
+    assert negotiate("gzip;q=0.5, deflate", encodings) == "deflate"
+    assert negotiate("br", encodings) is None
+    assert negotiate("*", encodings) == "gzip"
+    assert negotiate("*, gzip;q=0", encodings) == "deflate"
+    assert negotiate("identity", encodings) is None
+    assert negotiate(None, encodings) is None
+
+
+def test_compression_validates_settings():
+    with pytest.raises(ValueError):
+        Compression(level=10)
+    with pytest.raises(ValueError):
+        Compression(encodings=("br",))
+
+
+def test_apply_compresses_above_threshold():
+    compression = Compression(min_size=100, level=1)
+    body = b'{"result":' + b"1," * 500 + b"1}"
+    response = TransportResponse(
+        body, headers={"Content-Type": "application/json", "ETag": '"abc"'}
+    )
+
+    compressed = compression.apply(response, "gzip")
+    assert gzip.decompress(compressed.body) == body
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+    assert compressed.headers["ETag"] == 'W/"abc"'
+    assert response.headers["ETag"] == '"abc"'
+
+    deflated = compression.apply(response, "deflate")
+    assert zlib.decompress(deflated.body) == body
+
+    plain = compression.apply(response, "br")
+    assert plain.body == body
+    assert plain.headers["Vary"] == "Accept-Encoding"
+    assert "Content-Encoding" not in plain.headers
+
+
+def test_apply_skips_small_bodies():
+    response = TransportResponse(b"{}")
+    assert Compression(min_size=100).apply(response, "gzip") is response
+
+
+def test_stream_flushes_every_chunk():
+    compression = Compression()
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    chunks = [b"[1,", b"2,", b"3]"]
+
+    stream = compression.stream(chunks, "gzip")
+    for chunk in chunks:
+        assert decompressor.decompress(next(stream)) == chunk
+    decompressor.decompress(b"".join(stream))
+    assert decompressor.eof
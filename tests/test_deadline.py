@@ -0,0 +1,41 @@
+import time
+from verlib.call import HttpHeaders
+from verlib.deadline import Deadline, DeadlineHeader
+
+
+def test_deadline_remaining_budget():
+    deadline = Deadline.after(10)
+    assert not deadline.expired()
+    assert 9 < deadline.remaining() <= 10
+
+    expired = Deadline.after(-1)
+    assert expired.expired()
+    assert expired.remaining() == 0
+
+
+def test_deadline_from_timestamp():
+    deadline = Deadline.at_timestamp(time.time() + 5)
+    assert 4 < deadline.remaining() <= 5
+
+
+def test_deadline_header_parses_timestamp():
+    header = DeadlineHeader()
+    deadline = header.parse(
+        HttpHeaders({"x-request-deadline": str(time.time() + 5)})
+    )
+    assert deadline is not None
+    assert 4 < deadline.remaining() <= 5
+
+
+def test_deadline_header_parses_relative_timeout():
+    header = DeadlineHeader("X-Timeout", relative=True)
+    deadline = header.parse(HttpHeaders({"X-Timeout": "2.5"}))
+    assert deadline is not None
+    assert 2 < deadline.remaining() <= 2.5
+
+
+def test_deadline_header_ignores_missing_and_invalid_values():
+    header = DeadlineHeader()
+    assert header.parse(HttpHeaders({})) is None
+    assert header.parse(HttpHeaders({"X-Request-Deadline": "soon"})) is None
+    assert header.parse(HttpHeaders({"X-Request-Deadline": "nan"})) is None
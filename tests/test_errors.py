@@ -0,0 +1,52 @@
+import pytest
+from verlib.errors import ErrorRegistry
+from verlib.verliberr import ErrKind
+
+
+def test_registry_resolves_closest_base_class():
+    registry = ErrorRegistry()
+    registry.register(LookupError, -32010, "Lookup failed")
+    registry.register(KeyError, -32011, "Missing key", {"retry": False})
+
+    assert registry.resolve(KeyError).code == -32011
+    assert registry.resolve(KeyError).data == {"retry": False}
+    assert registry.resolve(IndexError).code == -32010
+    assert (
+        registry.resolve(ValueError).code == ErrKind.PROCEDURE_RAISED_EXCEPTION
+    )
+
+
+def test_registry_rejects_non_exceptions():
+    with pytest.raises(TypeError):
+        ErrorRegistry().register(int, -32010, "Not an exception")  # type: ignore
+
+
+def test_registry_counts_exceptions_without_tracebacks():
+    registry = ErrorRegistry()
+
+    for _ in range(3):
+        registry.handle("foo", ValueError())
+    registry.handle("bar", KeyError())
+
+    stats = registry.stats
+    assert stats.counts == {("foo", "ValueError"): 3, ("bar", "KeyError"): 1}
+    assert stats.tracebacks == ()
+
+
+def test_registry_captures_sampled_tracebacks():
+    registry = ErrorRegistry(traceback_sample_rate=1.0, max_tracebacks=2)
+
+    for i in range(3):
+        try:
+            raise ValueError(i)
+        except ValueError as exc:
+            registry.handle("foo", exc)
+
+    tracebacks = registry.stats.tracebacks
+    assert len(tracebacks) == 2
+    assert tracebacks[-1].procedure == "foo"
+    assert tracebacks[-1].exc_type == "ValueError"
+    assert "ValueError: 2" in tracebacks[-1].traceback
+
+    registry.reset_stats()
+    assert registry.stats.counts == {}
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+from verlib.verlib import VerLib
+from verlib.admission import ConcurrencyLimit
+from verlib.auth import AccessLevel
+from verlib.call import Context, HttpHeaders
+from verlib.idempotency import (
+    IdempotencyCache,
+    IdempotencyConflict,
+    MemoryStore,
+    StoredResponse,
+    fingerprint,
+)
+from verlib.jsonrpc import Request
+from verlib.transport import TransportResponse
+from verlib.verliberr import ErrKind
+import verlib.transport as transport
+
+
+def charge_lib(idempotency: IdempotencyCache) -> tuple[VerLib, list[int]]:
+    charges: list[int] = []
+    verlib = VerLib("payments", idempotency=idempotency)
+
+    @verlib.verproc
+    def charge(amount: int) -> int:
+        time.sleep(0.05)
+        charges.append(amount)
+        return len(charges)
+
+    return verlib, charges
+
+
+def call(amount: int, id: int = 1) -> bytes:
+    return json.dumps(
+        {"jsonrpc": "2.0", "method": "charge", "params": [amount], "id": id}
+    ).encode()
+
+
+def keyed(key: str) -> HttpHeaders:
+    return HttpHeaders({"Idempotency-Key": key})
+
+
+def test_memory_store_expires_and_evicts():
+    store = MemoryStore(max_entries=2)
+    stored = StoredResponse(b"", b"{}", 200, ())
+    store.set("a", stored, 60)
+    store.set("b", stored, 0)
+    assert store.get("a") is stored
+    assert store.get("b") is None
+    store.set("c", stored, 60)
+    store.set("d", stored, 60)
+    assert len(store) == 2
+    assert store.get("a") is None
+
+
+def test_retries_replay_the_first_response():
+    verlib, charges = charge_lib(IdempotencyCache())
+    first = transport.dispatch(verlib, call(10), keyed("k1"))
+    retry = transport.dispatch(verlib, call(10), keyed("k1"))
+    assert charges == [10]
+    assert retry.body == first.body
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+
+    # Without a key, or with another key, the call runs again
+    transport.dispatch(verlib, call(10), HttpHeaders({}))
+    transport.dispatch(verlib, call(10), keyed("k2"))
+    assert charges == [10, 10, 10]
+
+
+def test_concurrent_duplicates_wait_for_the_original():
+    verlib, charges = charge_lib(IdempotencyCache())
+    bodies: list[bytes] = []
+
+    def send():
+        bodies.append(transport.dispatch(verlib, call(5), keyed("k")).body)
+
+    threads = [threading.Thread(target=send) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert charges == [5]
+    assert len(set(bodies)) == 1
+
+
+def test_key_conflicts():
+    verlib, charges = charge_lib(IdempotencyCache(max_key_length=8))
+    transport.dispatch(verlib, call(10), keyed("k"))
+
+    reused = transport.dispatch(verlib, call(20), keyed("k"))
+    assert reused.status == 422
+    assert json.loads(reused.body)["error"]["data"] == {
+        "idempotency": "key_reused"
+    }
+    too_long = transport.dispatch(verlib, call(10), keyed("k" * 9))
+    assert too_long.status == 400
+    assert charges == [10]
+
+    cache = IdempotencyCache(wait_timeout=0.01)
+    assert cache.begin("busy", b"") is None
+    with pytest.raises(IdempotencyConflict) as exc_info:
+        cache.begin("busy", b"")
+    assert exc_info.value.status == 409
+
+
+def test_transient_failures_are_not_replayed():
+    idempotency = IdempotencyCache()
+    verlib = VerLib("busy", idempotency=idempotency)
+    verlib.limit = ConcurrencyLimit(1)
+
+    @verlib.verproc
+    def work() -> int:
+        return 1
+
+    body = b'{"jsonrpc": "2.0", "method": "work", "id": 1}'
+    assert verlib.limit.try_acquire()
+    assert transport.dispatch(verlib, body, keyed("k")).status == 503
+    verlib.limit.release()
+    res = transport.dispatch(verlib, body, keyed("k"))
+    assert res.status == 200
+    assert "Idempotent-Replayed" not in res.headers
+    stored = idempotency.store.get("k")
+    assert stored is not None
+    assert stored.fingerprint == fingerprint(body)
+
+
+def test_dispatch_async_waits_for_the_original_off_the_loop():
+    verlib, charges = charge_lib(IdempotencyCache())
+
+    async def send_twice() -> list[transport.TransportResponse]:
+        return list(
+            await asyncio.gather(
+                transport.dispatch_async(
+                    verlib, call(7), keyed("k"), run_sync=asyncio.to_thread
+                ),
+                transport.dispatch_async(
+                    verlib, call(7), keyed("k"), run_sync=asyncio.to_thread
+                ),
+            )
+        )
+
+    first, second = asyncio.run(send_twice())
+    assert charges == [7]
+    assert first.body == second.body
+
+
+def test_replays_are_scoped_to_the_caller():
+    verlib = VerLib("secrets", idempotency=IdempotencyCache())
+    calls: list[int] = []
+
+    @verlib.private_access
+    @verlib.verproc
+    def secret() -> str:
+        calls.append(1)
+        return "top secret"
+
+    @verlib.context_builder
+    def context_builder(headers: HttpHeaders, req: Request) -> Context:
+        context = Context()
+        context.key = headers.get("X-API-KEY") or headers.get("Authorization")
+        return context
+
+    @verlib.auth_provider
+    def auth_provider(
+        headers: HttpHeaders, req: Request, context: Context
+    ) -> AccessLevel:
+        return (
+            AccessLevel.private
+            if context.key in ("key", "Bearer a", "Bearer b")
+            else AccessLevel.public
+        )
+
+    body = b'{"jsonrpc": "2.0", "method": "secret", "id": 1}'
+
+    def send(**headers: str) -> TransportResponse:
+        return transport.dispatch(
+            verlib, body, HttpHeaders({"Idempotency-Key": "abc", **headers})
+        )
+
+    # Credentials outside of the vary headers are checked before replaying
+    assert json.loads(send(**{"X-API-KEY": "key"}).body)["result"]
+    res = send()
+    assert json.loads(res.body)["error"]["code"] == ErrKind.NOT_AUTHORIZED
+    assert "Idempotent-Replayed" not in res.headers
+    assert send(**{"X-API-KEY": "key"}).headers["Idempotent-Replayed"]
+    assert calls == [1]
+
+    # and other values of the vary headers are another request
+    verlib.idempotency = IdempotencyCache()
+    assert json.loads(send(Authorization="Bearer a").body)["result"]
+    assert send(Authorization="Bearer b").status == 422
+    assert send().status == 422
+    assert send(Authorization="Bearer a").headers["Idempotent-Replayed"]
+    assert calls == [1, 1]
@@ -0,0 +1,56 @@
+import subprocess
+import sys
+
+
+def loaded_modules(statement: str) -> set[str]:
+    out = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys\n{statement}\nprint(','.join(sys.modules))",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return set(out.stdout.strip().split(","))
+
+
+def test_import_verlib_does_not_load_frameworks_or_schema():
+    modules = loaded_modules("import verlib")
+    for name in ("flask", "django", "werkzeug", "schema", "asyncio"):
+        assert name not in modules
+    # Not available on every platform, only the shared cache uses them
+    for name in ("fcntl", "mmap", "verlib.sharedcache"):
+        assert name not in modules
+    assert "verlib.integrations" not in modules
+
+
+def test_integrations_are_imported_on_attribute_access():
+    modules = loaded_modules(
+        "import verlib\nassert verlib.integrations.WSGIVerLib"
+    )
+    assert "verlib.integrations.wsgi" in modules
+    assert "flask" not in modules
+
+    modules = loaded_modules(
+        "from verlib.integrations import FlaskVerLib\nassert FlaskVerLib"
+    )
+    assert "flask" in modules
+
+    modules = loaded_modules(
+        "from verlib.integrations import DjangoVerLib\nassert DjangoVerLib"
+    )
+    assert "django" in modules
+    assert "flask" not in modules
+
+
+def test_schema_is_only_imported_for_the_schemas():
+    # Requests are validated without it
+    modules = loaded_modules(
+        "from verlib.jsonrpc import into_rpc_request\n"
+        'into_rpc_request(\'{"jsonrpc": "2.0", "method": "add"}\')'
+    )
+    assert "schema" not in modules
+    modules = loaded_modules("from verlib.jsonrpc import request_schema")
+    assert "schema" in modules
@@ -1,6 +1,11 @@
 from __future__ import annotations
+from typing import Any
+import pytest
 from verlib.jsonrpc import (
     into_rpc_request,
+    is_valid_request,
+    request_schema,
+    Request,
     ErrorCode,
     Error,
     OkRes,
@@ -152,3 +157,42 @@ def test_err_res_sets_id_to_null():
     )
 
     assert res.id is None
+
+
+@pytest.mark.parametrize(
+    "req",
+    [
+        {"jsonrpc": "2.0", "method": "add"},
+        {"jsonrpc": "2.0", "method": "add", "id": None, "params": [1]},
+        {"jsonrpc": "2.0", "method": "add", "id": "a", "params": {"a": {}}},
+        {"jsonrpc": "2.0", "method": "add", "params": [None, "a", 1.5, []]},
+        {"jsonrpc": "2.0", "method": "add", "params": []},
+        {"jsonrpc": "2.0", "method": "add", "params": {}},
+        {"jsonrpc": "2.0", "method": "add", "params": None},
+        {"jsonrpc": "2.0", "method": "add", "params": (1,)},
+        {"jsonrpc": "2.0", "method": "add", "params": [True]},
+        {"jsonrpc": "2.0", "method": "add", "params": {1: 2}},
+        {"jsonrpc": "2.0", "method": "add", "params": [object()]},
+        {"jsonrpc": "2.0", "method": "add", "id": True},
+        {"jsonrpc": "2.0", "method": "add", "id": 1.0},
+        {"jsonrpc": "2.0", "method": 1},
+        {"jsonrpc": "2.0", "method": "add", "extra": 1},
+        {"jsonrpc": 2.0, "method": "add"},
+        {"method": "add"},
+        {"jsonrpc": "2.0"},
+        ["jsonrpc", "method"],
+        None,
+    ],
+)
+def test_is_valid_request_agrees_with_request_schema(req: Any):
+    assert is_valid_request(req) == request_schema.is_valid(req)
+
+
+def test_hot_path_types_are_slotted():
+    for obj in (
+        Request(method="add", id=1),
+        OkRes(1, None),
+        ErrRes(1, Error(-1, "", None)),
+    ):
+        assert not hasattr(obj, "__dict__")
+        assert obj.jsonrpc == "2.0"
@@ -0,0 +1,60 @@
+import io
+import json
+import pytest
+from verlib.limits import LimitExceeded, RequestLimits
+
+
+def test_scanner_tracks_depth_outside_strings():
+    limits = RequestLimits(max_depth=3)
+    limits.check(b'{"params": [[1, 2], "[[[[{{{", "\\"[[[["]}')
+
+    with pytest.raises(LimitExceeded) as exc:
+        limits.check(b'{"params": [[[1]]]}')
+    assert exc.value.limit == "max_depth"
+
+
+def test_scanner_handles_strings_split_across_chunks():
+    scanner = RequestLimits(max_depth=2).scanner()
+    for chunk in (b'{"a": "\\', b'"[[[', b'", "b\\\\', b'"', b": [1]}"):
+        scanner.feed(chunk)
+    assert scanner.depth == 0
+
+
+def test_read_body_rejects_declared_length_without_reading():
+    stream = io.BytesIO(b"[]")
+    with pytest.raises(LimitExceeded) as exc:
+        RequestLimits(max_body_size=10).read_body(stream.read, 11)
+    assert exc.value.limit == "max_body_size"
+    assert stream.tell() == 0
+
+
+def test_read_body_fails_fast_on_undeclared_length():
+    body = json.dumps([list(range(100_000))]).encode()
+    stream = io.BytesIO(body)
+
+    with pytest.raises(LimitExceeded):
+        RequestLimits(max_body_size=100_000).read_body(stream.read, None)
+    assert stream.tell() < len(body)
+
+
+def test_read_body_fails_fast_on_depth():
+    body = b"[" * 100_000 + b"]" * 100_000
+    stream = io.BytesIO(body)
+
+    with pytest.raises(LimitExceeded):
+        RequestLimits(max_body_size=None).read_body(stream.read, len(body))
+    assert stream.tell() < len(body)
+
+
+def test_read_body_returns_whole_body():
+    body = json.dumps({"jsonrpc": "2.0", "params": ["x" * 100_000]}).encode()
+    assert RequestLimits().read_body(io.BytesIO(body).read, None) == body
+
+
+def test_check_batch():
+    limits = RequestLimits(max_batch_length=2)
+    limits.check_batch([{}, {}])
+    limits.check_batch({"params": [1, 2, 3]})
+
+    with pytest.raises(LimitExceeded):
+        limits.check_batch([{}, {}, {}])
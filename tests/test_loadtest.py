@@ -0,0 +1,158 @@
+import json
+import threading
+from pathlib import Path
+from typing import Any, cast
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+import pytest
+from verlib import VerLib
+from verlib.integrations.wsgi import WSGIVerLib
+from verlib.loadtest import (
+    HttpTarget,
+    InProcessTarget,
+    LoadTest,
+    build_calls,
+    compile_template,
+    main,
+    percentile,
+)
+
+lib = VerLib("loadtest_lib")
+
+
+@lib.verproc
+def add(a: int, b: int) -> int:
+    return a + b
+
+
+@lib.verproc
+def ping() -> str:
+    return "pong"
+
+
+@lib.verproc
+def fail(tag: str) -> str:
+    raise ValueError(tag)
+
+
+def test_compile_template():
+    factory = compile_template(
+        {
+            "id": "${seq}",
+            "values": ["${int:1:3}", "${float:0:1}", "${choice:a|b}", "x"],
+        }
+    )
+    params = factory(7)
+    assert isinstance(params, dict)
+    values = params["values"]
+    assert isinstance(values, list)
+    assert params["id"] == 7
+    assert values[0] in (1, 2, 3)
+    assert 0 <= cast(float, values[1]) <= 1
+    assert values[2] in ("a", "b")
+    assert values[3] == "x"
+
+    with pytest.raises(ValueError):
+        compile_template(["${unknown}"])
+
+
+def test_percentile_nearest_rank():
+    samples = [float(i) for i in range(1, 1001)]
+    assert percentile(samples, 50) == 500
+    assert percentile(samples, 99.9) == 999
+    assert percentile(samples, 100) == 1000
+    assert percentile([], 50) == 0.0
+
+
+def test_build_calls_skips_procedures_without_templates():
+    calls = build_calls(lib.describe().response.result, {"add": [1, "${seq}"]})
+    assert set(calls) == {"add", "ping"}
+
+    with pytest.raises(ValueError):
+        build_calls(lib.describe().response.result, {"missing": []})
+
+
+def test_closed_loop_reports_errors():
+    calls = build_calls(
+        lib.describe().response.result, {"add": [1, 2], "fail": ["${seq}"]}
+    )
+    report = LoadTest(
+        InProcessTarget(lib), calls, concurrency=4, requests=200
+    ).run()
+
+    assert report.requests == 200
+    assert sum(report.calls.values()) == 200
+    assert report.errors == {"rpc -32500": report.calls["fail"]}
+    result = report.to_dict()
+    assert set(result["latency"]) == {
+        "p50",
+        "p90",
+        "p99",
+        "p999",
+        "mean",
+        "max",
+    }
+    assert "throughput" in report.to_text()
+
+
+def test_open_loop_keeps_rate():
+    report = LoadTest(
+        InProcessTarget(lib), {"ping": None}, rate=200, duration=0.25
+    ).run()
+    assert 30 <= report.requests <= 60
+    assert report.errors == {}
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args: Any):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = make_server(
+        "127.0.0.1", 0, WSGIVerLib(lib), handler_class=_QuietHandler
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/verlib"
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_target(server_url: str):
+    target = HttpTarget(server_url)
+    calls = build_calls(target.describe(), {"add": ["${seq}", 1]})
+
+    report = LoadTest(target, calls, concurrency=2, requests=20).run()
+    assert report.requests == 20
+    assert report.errors == {}
+
+
+def test_cli_writes_json_report(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+):
+    templates = tmp_path / "templates.json"
+    templates.write_text(json.dumps({"add": ["${int:0:9}", 1]}))
+    output = tmp_path / "report.json"
+
+    assert (
+        main(
+            [
+                "--lib",
+                f"{__name__}:lib",
+                "--templates",
+                str(templates),
+                "--requests",
+                "50",
+                "--concurrency",
+                "2",
+                "--json",
+                str(output),
+            ]
+        )
+        == 0
+    )
+    assert "p999" in capsys.readouterr().out
+    report = json.loads(output.read_text())
+    assert report["requests"] == 50
+    assert report["calls"]["add"] + report["calls"]["ping"] == 50
@@ -0,0 +1,101 @@
+import threading
+from typing import Callable, Iterator
+import pytest
+from verlib.notifications import NotificationExecutor, OverflowPolicy
+
+
+def test_executor_runs_tasks_in_background():
+    executor = NotificationExecutor(2)
+    ran: list[int] = []
+
+    for i in range(10):
+        assert executor.submit(lambda i=i: ran.append(i))
+
+    assert executor.flush(5)
+    assert sorted(ran) == list(range(10))
+    stats = executor.stats
+    assert stats.submitted == 10
+    assert stats.completed == 10
+    assert stats.queue_depth == 0
+    executor.shutdown()
+
+
+def test_executor_counts_failures():
+    executor = NotificationExecutor(1)
+
+    def fail():
+        raise ValueError()
+
+    executor.submit(fail)
+    assert executor.flush(5)
+    assert executor.stats.failed == 1
+    executor.shutdown()
+
+
+MakeExecutor = Callable[[OverflowPolicy], NotificationExecutor]
+
+
+@pytest.fixture
+def blocked_executor() -> Iterator[MakeExecutor]:
+    unblock = threading.Event()
+    started = threading.Event()
+
+    def make(overflow: OverflowPolicy) -> NotificationExecutor:
+        executor = NotificationExecutor(1, max_queue=1, overflow=overflow)
+
+        def block():
+            started.set()
+            unblock.wait(5)
+
+        executor.submit(block)
+        started.wait(5)
+        return executor
+
+    yield make
+    unblock.set()
+
+
+def test_executor_drops_new_on_overflow(blocked_executor: MakeExecutor):
+    executor = blocked_executor(OverflowPolicy.DROP_NEW)
+    ran: list[str] = []
+
+    assert executor.submit(lambda: ran.append("first"))
+    assert not executor.submit(lambda: ran.append("second"))
+
+    stats = executor.stats
+    assert stats.dropped == 1
+    assert stats.queue_depth == 1
+    assert stats.running == 1
+
+
+def test_executor_drops_oldest_on_overflow(blocked_executor: MakeExecutor):
+    executor = blocked_executor(OverflowPolicy.DROP_OLDEST)
+    ran: list[str] = []
+
+    assert executor.submit(lambda: ran.append("first"))
+    assert executor.submit(lambda: ran.append("second"))
+    assert executor.stats.dropped == 1
+
+    executor._queue[0]()
+    assert ran == ["second"]
+
+
+def test_executor_runs_inline_on_overflow(blocked_executor: MakeExecutor):
+    executor = blocked_executor(OverflowPolicy.RUN_INLINE)
+    ran: list[str] = []
+
+    assert executor.submit(lambda: ran.append("first"))
+    assert executor.submit(lambda: ran.append(threading.current_thread().name))
+    assert ran == [threading.current_thread().name]
+
+
+def test_executor_flush_times_out(blocked_executor: MakeExecutor):
+    executor = blocked_executor(OverflowPolicy.DROP_NEW)
+    assert not executor.flush(0.01)
+
+
+def test_executor_rejects_after_shutdown():
+    executor = NotificationExecutor(1)
+    executor.shutdown()
+    with pytest.raises(RuntimeError):
+        executor.submit(lambda: None)
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from typing import Any
+import pytest
+from verlib import VerLib
+from verlib.jsonrpc import Request
+from verlib.profiling import Profiler
+
+
+def busy(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+@pytest.fixture
+def profiled_lib() -> VerLib:
+    verlib = VerLib("profiled")
+
+    @verlib.verproc
+    def crunch(n: int) -> int:
+        return busy(n)
+
+    @verlib.verproc
+    def other() -> int:
+        return 1
+
+    return verlib
+
+
+def test_profiler_is_off_by_default(profiled_lib: VerLib):
+    profiled_lib.execute_rpc(Request(method="crunch", id=1, params=[10]))
+    assert profiled_lib.profiler.results() == {}
+
+
+def test_profiler_aggregates_per_procedure(profiled_lib: VerLib):
+    profiled_lib.profiler.start(methods=["crunch"])
+    for _ in range(3):
+        res = profiled_lib.execute_rpc(
+            Request(method="crunch", id=1, params=[10_000])
+        )
+        assert res.result_data() == busy(10_000)
+    profiled_lib.execute_rpc(Request(method="other", id=1))
+    profiled_lib.profiler.stop()
+    profiled_lib.execute_rpc(Request(method="crunch", id=1, params=[10]))
+
+    results = profiled_lib.profiler.results()
+    assert set(results) == {"crunch"}
+    assert results["crunch"].calls == 3
+    assert any(
+        name == "busy" for _, _, name in results["crunch"].stats.stats  # type: ignore
+    )
+
+    profiled_lib.profiler.reset()
+    assert profiled_lib.profiler.results() == {}
+
+
+def test_profiler_samples_calls():
+    profiler = Profiler()
+    profiler.start(sample_rate=0.5)
+    sampled = sum(profiler.should_profile("foo") for _ in range(2000))
+    assert 800 < sampled < 1200
+
+    profiler.start(sample_rate=1.0, methods=["bar"])
+    assert not profiler.should_profile("foo")
+    assert profiler.should_profile("bar")
+
+    with pytest.raises(ValueError):
+        profiler.start(sample_rate=0)
+
+
+def test_profiler_collapsed_stacks(profiled_lib: VerLib):
+    profiled_lib.profiler.start()
+    profiled_lib.execute_rpc(Request(method="crunch", id=1, params=[50_000]))
+    profiled_lib.profiler.stop()
+
+    lines = profiled_lib.profiler.collapsed().splitlines()
+    assert lines
+    for line in lines:
+        stack, _, micros = line.rpartition(" ")
+        assert stack.startswith("crunch;")
+        assert int(micros) > 0
+    assert any("busy (" in line for line in lines)
+
+    lines = profiled_lib.profiler.collapsed("crunch").splitlines()
+    assert lines and not lines[0].startswith("crunch;")
+
+
+def test_profiler_skips_concurrent_calls():
+    profiler = Profiler()
+    entered = threading.Event()
+    release = threading.Event()
+
+    def slow() -> int:
+        entered.set()
+        release.wait(5)
+        return 1
+
+    thread = threading.Thread(target=profiler.run, args=("slow", slow))
+    thread.start()
+    assert entered.wait(5)
+    # Runs unprofiled while the first call holds the profiler
+    assert profiler.run("fast", lambda: 2) == 2
+    release.set()
+    thread.join(5)
+
+    assert set(profiler.results()) == {"slow"}
+
+
+def test_profiler_profiles_sync_procedures_of_async_calls(
+    profiled_lib: VerLib,
+):
+    @profiled_lib.verproc
+    async def wait() -> int:
+        await asyncio.sleep(0)
+        return 1
+
+    async def run_sync(fn: Any) -> Any:
+        return await asyncio.to_thread(fn)
+
+    async def run():
+        for req in (
+            Request(method="crunch", id=1, params=[10_000]),
+            Request(method="wait", id=2),
+        ):
+            await profiled_lib.execute_rpc_async(req, run_sync=run_sync)
+
+    profiled_lib.profiler.start()
+    asyncio.run(run())
+    profiled_lib.profiler.stop()
+
+    results = profiled_lib.profiler.results()
+    assert set(results) == {"crunch"}
+    assert any(
+        name == "busy" for _, _, name in results["crunch"].stats.stats  # type: ignore
+    )
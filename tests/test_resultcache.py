@@ -0,0 +1,136 @@
+import multiprocessing
+import time
+from pathlib import Path
+from typing import cast
+import pytest
+from verlib import VerLib
+from verlib.call import Context
+from verlib.jsonrpc import JSONRPCParams, Request
+from verlib.resultcache import result_key
+from verlib.sharedcache import SharedMemoryCache
+
+
+@pytest.fixture
+def cache_path(tmp_path: Path) -> str:
+    return str(tmp_path / "results.cache")
+
+
+def test_result_key_ignores_named_params_order():
+    assert result_key("add", {"a": 1, "b": 2}) == result_key(
+        "add", {"b": 2, "a": 1}
+    )
+    assert result_key("add", [1, 2]) != result_key("add", [2, 1])
+    assert result_key("add", [1, 2]) != result_key("sub", [1, 2])
+
+
+def test_shared_cache_get_set_and_expiry(cache_path: str):
+    cache = SharedMemoryCache(cache_path, max_bytes=64 * 1024)
+    assert cache.get(b"a") is None
+    cache.set(b"a", b"1", ttl=60)
+    cache.set(b"b", b"2", ttl=0)
+    cache.set(b"big", b"x" * (cache.max_value_size + 1), ttl=60)
+    assert cache.get(b"a") == b"1"
+    assert cache.get(b"b") is None
+    assert cache.get(b"big") is None
+    cache.set(b"a", b"11", ttl=60)
+    assert cache.get(b"a") == b"11"
+    cache.clear()
+    assert cache.get(b"a") is None
+    cache.close()
+
+
+def test_shared_cache_evicts_least_recently_used(cache_path: str):
+    # A single set of two slots
+    cache = SharedMemoryCache(cache_path, max_bytes=0, slot_size=128, ways=2)
+    cache.set(b"a", b"1", ttl=60)
+    time.sleep(0.001)
+    cache.set(b"b", b"2", ttl=60)
+    time.sleep(0.001)
+    assert cache.get(b"a") == b"1"
+    cache.set(b"c", b"3", ttl=60)
+    assert (cache.get(b"a"), cache.get(b"b"), cache.get(b"c")) == (
+        b"1",
+        None,
+        b"3",
+    )
+    cache.close()
+
+
+def test_shared_cache_rejects_other_geometry(cache_path: str):
+    SharedMemoryCache(cache_path, max_bytes=64 * 1024).close()
+    with pytest.raises(ValueError):
+        SharedMemoryCache(cache_path, max_bytes=128 * 1024)
+
+
+def write_and_read(path: str, worker: int, rounds: int) -> int:
+    # Every value is its key repeated, so torn writes would show up
+    cache = SharedMemoryCache(path, max_bytes=64 * 1024, slot_size=256)
+    bad = 0
+    for i in range(rounds):
+        key = f"key-{(i + worker) % 50}".encode()
+        cache.set(key, key * 8, ttl=60)
+        value = cache.get(f"key-{i % 50}".encode())
+        if value is not None and value != f"key-{i % 50}".encode() * 8:
+            bad += 1
+    cache.close()
+    return bad
+
+
+def test_shared_cache_across_processes(cache_path: str):
+    SharedMemoryCache(cache_path, max_bytes=64 * 1024, slot_size=256).close()
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(4) as pool:
+        bad = pool.starmap(
+            write_and_read, [(cache_path, worker, 500) for worker in range(4)]
+        )
+    assert bad == [0, 0, 0, 0]
+
+    cache = SharedMemoryCache(cache_path, max_bytes=64 * 1024, slot_size=256)
+    assert cache.get(b"key-7") == b"key-7" * 8
+    cache.close()
+
+
+def test_verlib_caches_results_between_libs(cache_path: str):
+    calls: list[int] = []
+
+    def build() -> VerLib:
+        verlib = VerLib("cached", result_cache=SharedMemoryCache(cache_path))
+
+        @verlib.verproc(cache_ttl=60)
+        def square(n: int) -> int:
+            calls.append(n)
+            return n * n
+
+        @verlib.verproc
+        def fail() -> int:
+            calls.append(-1)
+            raise ValueError()
+
+        return verlib
+
+    # Two libs sharing the file stand in for two worker processes
+    first, second = build(), build()
+
+    def square(verlib: VerLib, params: JSONRPCParams) -> int:
+        res = verlib.execute_rpc(Request(method="square", id=1, params=params))
+        return cast(int, res.result_data())
+
+    assert square(first, [3]) == 9
+    # Named params make another call
+    assert square(second, {"n": 3}) == 9
+    assert square(second, [3]) == 9
+    assert calls == [3, 3]
+
+    for _ in range(2):
+        res = first.execute_rpc(Request(method="fail", id=1))
+        assert not res.is_success()
+    assert calls == [3, 3, -1, -1]
+
+
+def test_cache_ttl_rejects_context_procedures():
+    verlib = VerLib("cached")
+    with pytest.raises(TypeError):
+
+        @verlib.verproc(cache_ttl=60)
+        def whoami(ctx: Context) -> str:
+            return ""
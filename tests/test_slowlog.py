@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Iterator
+import pytest
+from verlib import VerLib
+from verlib.auth import AccessLevel
+from verlib.call import HttpHeaders
+from verlib.jsonrpc import Request
+from verlib.slowlog import CallTiming, SlowCall, SlowCallLog
+import verlib.transport as transport
+
+
+@pytest.fixture
+def records() -> Iterator[list[logging.LogRecord]]:
+    captured: list[logging.LogRecord] = []
+
+    class Capture(logging.Handler):
+        def emit(self, record: logging.LogRecord):
+            captured.append(record)
+
+    handler = Capture()
+    logger = logging.getLogger("verlib.slowcalls")
+    logger.addHandler(handler)
+    yield captured
+    logger.removeHandler(handler)
+
+
+def slow_calls_of(records: list[logging.LogRecord]) -> list[SlowCall]:
+    return [record.slow_call for record in records]  # type: ignore
+
+
+def timed_lib(slow_calls: SlowCallLog) -> VerLib:
+    verlib = VerLib("timed", slow_calls=slow_calls)
+    verlib.auth_provider(lambda *_: AccessLevel.public)
+
+    @verlib.verproc
+    def nap(seconds: float) -> float:
+        time.sleep(seconds)
+        return seconds
+
+    @verlib.verproc
+    async def async_nap(seconds: float) -> float:
+        await asyncio.sleep(seconds)
+        return seconds
+
+    return verlib
+
+
+def test_call_timing_phases_add_up_to_total():
+    timing = CallTiming()
+    timing.lap("parse")
+    time.sleep(0.01)
+    timing.lap("procedure")
+    timing.lap("procedure")
+    assert list(timing.phases) == ["parse", "procedure"]
+    assert timing.phases["procedure"] >= 0.01
+    assert sum(timing.phases.values()) == pytest.approx(timing.total)
+
+
+def test_slow_call_log_only_logs_calls_over_threshold(
+    records: list[logging.LogRecord],
+):
+    slow_calls = SlowCallLog(0.05, thresholds={"fast": 0.001})
+    timing = CallTiming()
+    time.sleep(0.01)
+    timing.lap("procedure")
+    slow_calls.observe("slow", 1, timing)
+    slow_calls.observe("fast", 2, timing, 42)
+    slow_calls.close()
+
+    [call] = slow_calls_of(records)
+    assert (call.method, call.id, call.params_size) == ("fast", 2, 42)
+    assert records[0].levelno == logging.WARNING
+    assert "Slow call to fast" in records[0].getMessage()
+    assert call.to_dict()["phases_ms"]["procedure"] >= 10
+
+
+def test_dispatch_times_every_phase(records: list[logging.LogRecord]):
+    slow_calls = SlowCallLog(0.0, thresholds={"nap": 0.02})
+    verlib = timed_lib(slow_calls)
+    for seconds in (0.0, 0.03):
+        body = json.dumps(
+            {"jsonrpc": "2.0", "method": "nap", "params": [seconds], "id": 7}
+        ).encode()
+        assert transport.dispatch(verlib, body, HttpHeaders({})).status == 200
+    slow_calls.close()
+
+    [call] = slow_calls_of(records)
+    assert call.params_size == len(body)
+    assert list(call.phases) == [
+        "parse",
+        "prepare",
+        "admission",
+        "context",
+        "auth",
+        "procedure",
+        "serialize",
+    ]
+    assert call.phases["procedure"] >= 0.03
+
+
+def test_execute_rpc_logs_its_own_timing(records: list[logging.LogRecord]):
+    slow_calls = SlowCallLog(0.01)
+    verlib = timed_lib(slow_calls)
+    verlib.execute_rpc(Request(method="nap", id=1, params=[0.02]))
+    asyncio.run(
+        verlib.execute_rpc_async(
+            Request(method="async_nap", id=2, params=[0.02])
+        )
+    )
+    slow_calls.close()
+
+    calls = slow_calls_of(records)
+    assert [(call.method, call.id) for call in calls] == [
+        ("nap", 1),
+        ("async_nap", 2),
+    ]
+    assert all(call.params_size is None for call in calls)
+    assert all("serialize" not in call.phases for call in calls)
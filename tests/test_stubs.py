@@ -0,0 +1,158 @@
+from pathlib import Path
+import random
+import threading
+import types
+from typing import Any, Callable, Iterable, Iterator
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+import pytest
+from verlib import VerLib, VerModule
+from verlib.call import Context
+from verlib.client import (
+    HttpTransport,
+    InProcessTransport,
+    RpcError,
+    StubClient,
+    TransportError,
+    envelope_prefix,
+)
+from verlib.stubs import generate_client, main
+from verlib.verlib import VerProcDesc
+
+
+@pytest.fixture
+def stub_lib() -> VerLib:
+    verlib = VerLib("stubs")
+
+    @verlib.verproc
+    def ping() -> str:
+        return "pong"
+
+    @verlib.verproc
+    def echo(msg: str, ctx: Context) -> str:
+        return msg
+
+    @verlib.verproc(name="pass")
+    def skip(value: int) -> int:
+        return value
+
+    math_ops = VerModule("math_ops")
+
+    @math_ops.verproc
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    @math_ops.verproc
+    def fail() -> int:
+        raise ValueError("failed")
+
+    verlib.declare_module(math_ops)
+    return verlib
+
+
+def load_client(source: str) -> types.ModuleType:
+    module = types.ModuleType("generated_client")
+    exec(compile(source, "generated_client.py", "exec"), module.__dict__)
+    return module
+
+
+def test_generated_client_calls_procedures(stub_lib: VerLib):
+    generated = load_client(
+        generate_client(stub_lib.describe().response.result)
+    )
+    client = generated.Client(InProcessTransport(stub_lib))
+
+    assert client.ping() == "pong"
+    # The context parameter is not part of the stub
+    assert client.echo("hi") == "hi"
+    assert client.pass_(3) == 3
+    assert client.math_ops.add(1, 2) == 3
+    with pytest.raises(RpcError) as exc_info:
+        client.math_ops.fail()
+    assert exc_info.value.code == -32500
+    with pytest.raises(AttributeError):
+        client.math_ops.sub(1, 2)
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args: Any):
+        pass
+
+
+@pytest.fixture
+def http_responses() -> Iterator[tuple[str, dict[str, tuple[str, bytes]]]]:
+    # Serves the status and body set for each path
+    responses: dict[str, tuple[str, bytes]] = {}
+
+    def app(
+        environ: dict[str, Any], start_response: Callable[..., Any]
+    ) -> Iterable[bytes]:
+        status, body = responses[environ["PATH_INFO"]]
+        start_response(status, [("Content-Length", str(len(body)))])
+        return [body]
+
+    server = make_server("127.0.0.1", 0, app, handler_class=_QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", responses
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_raises_on_http_errors(
+    http_responses: tuple[str, dict[str, tuple[str, bytes]]],
+):
+    url, responses = http_responses
+    responses["/text"] = ("405 Method Not Allowed", b"Method Not Allowed")
+    responses["/rpc"] = (
+        "503 Service Unavailable",
+        b'{"jsonrpc":"2.0","id":1,"error":{"code":-32001,"message":"Busy"}}',
+    )
+    responses["/ok"] = ("200 OK", b"<html></html>")
+    prefix = envelope_prefix("ping", False)
+
+    with pytest.raises(TransportError) as transport_info:
+        StubClient(f"{url}/text")._call(prefix, None)
+    assert transport_info.value.status == 405
+    assert transport_info.value.body == b"Method Not Allowed"
+    # A JSON-RPC error is passed on whatever the status
+    with pytest.raises(RpcError) as rpc_info:
+        StubClient(HttpTransport(f"{url}/rpc"))._call(prefix, None)
+    assert rpc_info.value.code == -32001
+    with pytest.raises(TransportError) as invalid_info:
+        StubClient(f"{url}/ok")._call(prefix, None)
+    assert invalid_info.value.status is None
+
+
+def test_generated_client_is_deterministic(stub_lib: VerLib):
+    description = stub_lib.describe().response.result
+    source = generate_client(description)
+    shuffled = list(description)
+    random.shuffle(shuffled)
+    assert generate_client(shuffled) == source
+    assert source.startswith("# Generated by `python -m verlib.stubs`")
+    assert '"method":"math_ops.add","params":' in source
+
+
+def test_generate_client_rejects_invalid_names():
+    def proc(module: str | None, name: str) -> VerProcDesc:
+        return {"module": module, "name": name, "num_params": 0}
+
+    with pytest.raises(ValueError):
+        generate_client([proc(None, "not-valid")])
+    with pytest.raises(ValueError):
+        generate_client([proc(None, "_call")])
+    with pytest.raises(ValueError):
+        generate_client([proc(None, "math"), proc("math", "add")])
+
+
+def test_stubs_cli_writes_module(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, stub_lib: VerLib
+):
+    import tests.test_stubs as this_module
+
+    monkeypatch.setattr(this_module, "cli_lib", stub_lib, raising=False)
+    output = tmp_path / "client.py"
+    assert main(["--lib", "tests.test_stubs:cli_lib", "-o", str(output)]) == 0
+    assert output.read_text() == generate_client(
+        stub_lib.describe().response.result
+    )
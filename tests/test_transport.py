@@ -0,0 +1,253 @@
+import json
+import pytest
+from verlib.verlib import VerLib
+from verlib.admission import ConcurrencyLimit
+from verlib.auth import AccessLevel
+from verlib.call import Context, HttpHeaders
+from verlib.jsonrpc import Request
+from verlib.codec import JSONCodec
+from verlib.limits import LimitExceeded, RequestLimits
+from verlib.notifications import NotificationExecutor
+import verlib.transport as transport
+
+
+@pytest.fixture
+def test_lib() -> VerLib:
+    verlib = VerLib("test_lib")
+
+    @verlib.verproc
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    @verlib.verproc(cache_control="public, max-age=30")
+    def concat(items: list[str], sep: str) -> str:
+        return sep.join(items)
+
+    return verlib
+
+
+def test_dispatch_encodes_response(test_lib: VerLib):
+    res = transport.dispatch(
+        test_lib,
+        b'{"jsonrpc": "2.0", "method": "add", "params": [1, 2], "id": 1}',
+        HttpHeaders({}),
+    )
+
+    assert res.status == 200
+    assert res.headers == {"Content-Type": "application/json"}
+    assert json.loads(res.body) == {"id": 1, "jsonrpc": "2.0", "result": 3}
+
+
+def test_dispatch_parse_error(test_lib: VerLib):
+    res = transport.dispatch(test_lib, b"\xff{", HttpHeaders({}))
+
+    assert json.loads(res.body)["error"]["code"] == -32700
+
+
+def test_dispatch_invalid_request_keeps_id_null(test_lib: VerLib):
+    res = transport.dispatch(
+        test_lib, b'{"method": "add", "id": 1}', HttpHeaders({})
+    )
+
+    assert json.loads(res.body) == {
+        "id": None,
+        "jsonrpc": "2.0",
+        "error": {"code": -32600, "message": "Invalid Request", "data": None},
+    }
+
+
+def test_dispatch_overloaded_sets_retry_after(test_lib: VerLib):
+    test_lib.limit = ConcurrencyLimit(1, retry_after=0.2)
+    assert test_lib.limit.try_acquire()
+
+    res = transport.dispatch(
+        test_lib,
+        b'{"jsonrpc": "2.0", "method": "add", "params": [1, 2], "id": 1}',
+        HttpHeaders({}),
+    )
+
+    assert res.status == 503
+    assert res.headers["Retry-After"] == "1"
+
+
+def test_json_codec_round_trip():
+    codec = JSONCodec()
+    assert codec.encode({"a": [1, "é"]}) == '{"a":[1,"é"]}'.encode()
+    assert codec.decode('{"a":[1,"é"]}'.encode()) == {"a": [1, "é"]}
+    with pytest.raises(ValueError):
+        codec.decode(b"{")
+
+
+def test_dispatch_acknowledges_background_notifications(test_lib: VerLib):
+    test_lib.notifications = NotificationExecutor(1)
+
+    res = transport.dispatch(
+        test_lib,
+        b'{"jsonrpc": "2.0", "method": "add", "params": [1, 2]}',
+        HttpHeaders({}),
+    )
+    assert res.status == 204
+    assert res.body == b""
+
+    res = transport.dispatch(
+        test_lib,
+        b'{"jsonrpc": "2.0", "method": "add", "params": [1, 2], "id": 1}',
+        HttpHeaders({}),
+    )
+    assert json.loads(res.body)["result"] == 3
+    test_lib.notifications.shutdown()
+
+
+def test_dispatch_batch_keeps_order_and_skips_notifications(test_lib: VerLib):
+    res = transport.dispatch(
+        test_lib,
+        json.dumps(
+            [
+                {"jsonrpc": "2.0", "method": "add", "params": [1, 2], "id": 1},
+                {"jsonrpc": "2.0", "method": "add", "params": [0, 0]},
+                {"method": "add", "id": 2},
+                {"jsonrpc": "2.0", "method": "add", "params": [3, 4], "id": 3},
+            ]
+        ).encode(),
+        HttpHeaders({}),
+    )
+
+    assert res.status == 200
+    assert json.loads(res.body) == [
+        {"id": 1, "jsonrpc": "2.0", "result": 3},
+        {
+            "id": None,
+            "jsonrpc": "2.0",
+            "error": {
+                "code": -32600,
+                "message": "Invalid Request",
+                "data": None,
+            },
+        },
+        {"id": 3, "jsonrpc": "2.0", "result": 7},
+    ]
+
+
+def test_dispatch_empty_batch_is_invalid(test_lib: VerLib):
+    res = transport.dispatch(test_lib, b"[]", HttpHeaders({}))
+
+    assert json.loads(res.body)["error"]["code"] == -32600
+
+
+def test_dispatch_batch_of_notifications_has_no_body(test_lib: VerLib):
+    res = transport.dispatch(
+        test_lib,
+        b'[{"jsonrpc": "2.0", "method": "add", "params": [1, 2]}]',
+        HttpHeaders({}),
+    )
+
+    assert res.status == 204
+    assert res.body == b""
+
+
+def test_canonical_query_sorts_and_compacts_params():
+    assert (
+        transport.canonical_query({"sep": "-", "items": ["a", "é"]})
+        == "items=%5B%22a%22%2C%22%C3%A9%22%5D&sep=%22-%22"
+    )
+
+
+def test_dispatch_read_caches_successful_calls(test_lib: VerLib):
+    query = transport.canonical_query({"items": ["a", "b"], "sep": "-"})
+    res = transport.dispatch_read(test_lib, "concat", query, HttpHeaders({}))
+
+    assert res.status == 200
+    assert json.loads(res.body) == {
+        "id": None,
+        "jsonrpc": "2.0",
+        "result": "a-b",
+    }
+    assert res.headers["Cache-Control"] == "public, max-age=30"
+    etag = res.headers["ETag"]
+
+    res = transport.dispatch_read(
+        test_lib, "concat", query, HttpHeaders({"If-None-Match": etag})
+    )
+    assert res.status == 304
+    assert res.body == b""
+    assert res.headers["ETag"] == etag
+
+
+def test_dispatch_read_errors_are_not_cached(test_lib: VerLib):
+    for query in ("sep=-", "sep=%22-%22&sep=%22-%22", "sep=%22-%22"):
+        res = transport.dispatch_read(
+            test_lib, "concat", query, HttpHeaders({})
+        )
+        assert res.headers["Cache-Control"] == "no-store"
+        assert "error" in json.loads(res.body)
+
+
+def test_dispatch_read_keeps_private_procedures_out_of_shared_caches():
+    verlib = VerLib("secrets")
+
+    @verlib.private_access
+    @verlib.verproc(cache_control="public, max-age=60, s-maxage=600")
+    def secret() -> str:
+        return "top secret"
+
+    @verlib.auth_provider
+    def auth_provider(
+        headers: HttpHeaders, req: Request, context: Context
+    ) -> AccessLevel:
+        if headers.get("X-API-KEY") == "key":
+            return AccessLevel.private
+        return AccessLevel.public
+
+    res = transport.dispatch_read(
+        verlib, "secret", "", HttpHeaders({"X-API-KEY": "key"})
+    )
+    assert json.loads(res.body)["result"] == "top secret"
+    assert res.headers["Cache-Control"] == "private, max-age=60"
+
+    res = transport.dispatch_read(verlib, "secret", "", HttpHeaders({}))
+    assert "error" in json.loads(res.body)
+    assert res.headers["Cache-Control"] == "no-store"
+
+
+def test_dispatch_read_only_serves_read_procedures(test_lib: VerLib):
+    for method in ("add", "missing"):
+        res = transport.dispatch_read(test_lib, method, "", HttpHeaders({}))
+        assert res.status == 405
+        assert res.headers["Allow"] == "POST"
+
+
+def test_dispatch_rejects_long_batches(test_lib: VerLib):
+    request = {"jsonrpc": "2.0", "method": "add", "params": [1, 2], "id": 1}
+    res = transport.dispatch(
+        test_lib,
+        json.dumps([request] * 3).encode(),
+        HttpHeaders({}),
+        limits=RequestLimits(max_batch_length=2),
+    )
+
+    assert json.loads(res.body) == {
+        "id": None,
+        "jsonrpc": "2.0",
+        "error": {
+            "code": -32600,
+            "message": "Invalid Request",
+            "data": {"limit": "max_batch_length", "maximum": 2},
+        },
+    }
+
+
+def test_dispatch_deeply_nested_body_is_parse_error(test_lib: VerLib):
+    res = transport.dispatch(
+        test_lib, b"[" * 100_000 + b"]" * 100_000, HttpHeaders({})
+    )
+
+    assert json.loads(res.body)["error"]["code"] == -32700
+
+
+def test_limit_exceeded_body_size_status():
+    res = transport.limit_exceeded(LimitExceeded("max_body_size", 10))
+    assert res.status == 413
+    assert json.loads(res.body)["error"]["data"] == {
+        "limit": "max_body_size",
+        "maximum": 10,
+    }
@@ -1,8 +1,20 @@
+from array import array
+import asyncio
+import json
+import sys
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import pytest
-from verlib.verlib import VerLib, VerModule
+from verlib.admission import ConcurrencyLimit
+from verlib.arrays import DoubleArray, encode_array
+from verlib.verlib import VerLib, VerLibDesc, VerModule, LazyVerModule
 from verlib.call import HttpHeaders, Context
-from verlib.verliberr import ErrKind
+from verlib.verliberr import ErrKind, ErrMsg
 from verlib.auth import AccessLevel
+from verlib.deadline import DeadlineHeader
+from verlib.notifications import NotificationExecutor
 from verlib.jsonrpc import Request, Error, ErrorCode
 from typing import cast, Any
 
@@ -296,11 +308,45 @@ def test_verlib_proc_call_notification(test_lib: VerLib):
     assert res.result_data() is None
 
 
-def test_verlib_module_proc_call_propagates_error(test_lib: VerLib):
-    with pytest.raises(TypeError):
-        test_lib.execute_rpc(
-            Request(method="test_module.add", id=1, params=[None, None])
+def test_verlib_module_proc_call_maps_error(test_lib: VerLib):
+    res = test_lib.execute_rpc(
+        Request(method="test_module.add", id=1, params=[None, None])
+    )
+    assert res.is_err()
+    err: Error[None] = cast(Error, res.err_data())
+    assert err.code == ErrKind.PROCEDURE_RAISED_EXCEPTION
+    assert err.message == str(ErrMsg.PROCEDURE_RAISED_EXCEPTION)
+    assert test_lib.errors.stats.counts == {("test_module.add", "TypeError"): 1}
+
+
+def test_verlib_maps_registered_exceptions(verlib: VerLib):
+    class NotFound(LookupError):
+        pass
+
+    verlib.errors.register(LookupError, -32010, "Not found")
+
+    @verlib.verproc
+    def find(key: str) -> str:
+        raise NotFound(key)
+
+    @verlib.verproc
+    async def async_find(key: str) -> str:
+        raise KeyError(key)
+
+    for method in ("find", "async_find"):
+        res = verlib.execute_rpc(Request(method=method, id=1, params=["a"]))
+        assert res.to_dict()["error"] == {
+            "code": -32010,
+            "message": "Not found",
+            "data": None,
+        }
+
+    res = asyncio.run(
+        verlib.execute_rpc_async(
+            Request(method="async_find", id=1, params=["a"])
         )
+    )
+    assert cast(Error, res.err_data()).code == -32010
 
 
 def test_verlib_module_allows_unauthenticated_request(test_lib: VerLib):
@@ -374,3 +420,566 @@ def test_verlib_module_proc_context_fails_if_not_annotated(ctx_lib: VerLib):
     assert res.is_err()
     err: Error[None] = cast(Error, res.err_data())
     assert err.code == ErrorCode.INVALID_PARAMS
+
+
+def test_verlib_sheds_calls_over_procedure_limit(verlib: VerLib):
+    started = threading.Event()
+    unblock = threading.Event()
+
+    @verlib.verproc(limit=ConcurrencyLimit(1, retry_after=2))
+    def slow() -> int:
+        started.set()
+        unblock.wait(5)
+        return 1
+
+    worker = threading.Thread(
+        target=lambda: verlib.execute_rpc(Request(method="slow", id=1))
+    )
+    worker.start()
+    started.wait(5)
+
+    res = verlib.execute_rpc(Request(method="slow", id=2))
+    unblock.set()
+    worker.join()
+
+    assert res.is_err()
+    err: Error[Any] = cast(Error, res.err_data())
+    assert err.code == ErrKind.OVERLOADED
+    assert err.data == {"retry_after": 2}
+
+    res = verlib.execute_rpc(Request(method="slow", id=3))
+    assert res.is_success()
+
+
+def test_verlib_global_and_module_limits_apply():
+    limited = VerLib("limited", limit=ConcurrencyLimit(1))
+    module = VerModule("mod", limit=ConcurrencyLimit(1))
+
+    @module.verproc
+    def foo() -> int:
+        return 1
+
+    limited.declare_module(module)
+    assert limited.limit is not None and module.limit is not None
+
+    assert module.limit.try_acquire()
+    res = limited.execute_rpc(Request(method="mod.foo", id=1))
+    assert cast(Error, res.err_data()).code == ErrKind.OVERLOADED
+    module.limit.release()
+
+    assert limited.limit.try_acquire()
+    res = limited.execute_rpc(Request(method="mod.foo", id=1))
+    assert cast(Error, res.err_data()).code == ErrKind.OVERLOADED
+    assert module.limit.in_flight == 0
+    limited.limit.release()
+
+    res = limited.execute_rpc(Request(method="mod.foo", id=1))
+    assert res.is_success()
+    assert limited.limit.in_flight == 0
+
+
+@pytest.fixture
+def deadline_lib() -> VerLib:
+    return VerLib(
+        "deadline_lib",
+        deadline_header=DeadlineHeader("X-Timeout", relative=True),
+    )
+
+
+def test_verlib_skips_calls_past_their_deadline(deadline_lib: VerLib):
+    calls: list[int] = []
+
+    @deadline_lib.verproc
+    def foo() -> int:
+        calls.append(1)
+        return 1
+
+    res = deadline_lib.execute_rpc(
+        Request(method="foo", id=1),
+        http_headers=HttpHeaders({"X-Timeout": "-1"}),
+    )
+    assert res.is_err()
+    err: Error[None] = cast(Error, res.err_data())
+    assert err.code == ErrKind.DEADLINE_EXCEEDED
+    assert err.message == "The deadline of the request was exceeded."
+    assert calls == []
+
+
+def test_verlib_exposes_deadline_on_context(deadline_lib: VerLib):
+    @deadline_lib.verproc
+    def budget(ctx: Context) -> float:
+        return ctx.deadline.remaining()
+
+    def has_budget(ctx: Context) -> bool:
+        return ctx.deadline is not None
+
+    deadline_lib.verproc(has_budget)
+
+    res = deadline_lib.execute_rpc(
+        Request(method="budget", id=1),
+        http_headers=HttpHeaders({"X-Timeout": "5"}),
+    )
+    assert 4 < cast(float, res.result_data()) <= 5
+
+    res = deadline_lib.execute_rpc(Request(method="has_budget", id=1))
+    assert res.result_data() is False
+
+    # Without a deadline header there is no deadline at all
+    verlib = VerLib("no_deadline")
+    verlib.verproc(has_budget)
+    res = verlib.execute_rpc(Request(method="has_budget", id=1))
+    assert res.result_data() is False
+
+
+def test_verlib_runs_async_procedures(deadline_lib: VerLib):
+    @deadline_lib.verproc
+    async def add(a: int, b: int) -> int:
+        await asyncio.sleep(0)
+        return a + b
+
+    res = deadline_lib.execute_rpc(
+        Request(method="add", id=1, params=[1, 2]),
+        http_headers=HttpHeaders({"X-Timeout": "5"}),
+    )
+    assert res.is_success()
+    assert res.result_data() == 3
+
+    res = deadline_lib.execute_rpc(Request(method="add", id=1, params=[1, 2]))
+    assert res.result_data() == 3
+
+
+def test_verlib_rejects_async_procedures_from_running_loop(
+    deadline_lib: VerLib,
+):
+    @deadline_lib.verproc
+    async def one() -> int:
+        return 1
+
+    async def call():
+        with pytest.raises(RuntimeError, match="execute_rpc_async"):
+            deadline_lib.execute_rpc(Request(method="one", id=1))
+        res = await deadline_lib.execute_rpc_async(Request(method="one", id=1))
+        assert res.result_data() == 1
+
+    with warnings.catch_warnings():
+        # The coroutine that was never awaited must not be left behind
+        warnings.simplefilter("error")
+        asyncio.run(call())
+
+
+def test_verlib_cancels_async_procedures_past_deadline(deadline_lib: VerLib):
+    cancelled: list[bool] = []
+
+    @deadline_lib.verproc
+    async def slow() -> int:
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return 1
+
+    res = deadline_lib.execute_rpc(
+        Request(method="slow", id=1),
+        http_headers=HttpHeaders({"X-Timeout": "0.01"}),
+    )
+    assert res.is_err()
+    assert cast(Error, res.err_data()).code == ErrKind.DEADLINE_EXCEEDED
+    assert cancelled == [True]
+
+
+def test_verlib_description_is_cached_until_registration(
+    test_lib: VerLib, vermodule: VerModule
+):
+    description = test_lib.describe()
+    assert test_lib.describe() is description
+    assert test_lib.import_lib() is description.response
+    assert json.loads(description.body) == description.response.to_dict()
+
+    @vermodule.verproc
+    def late_proc(a: int) -> int:
+        return a
+
+    updated = test_lib.describe()
+    assert updated is not description
+    assert updated.etag != description.etag
+    assert {
+        "module": "test_module",
+        "name": "late_proc",
+        "num_params": 1,
+    } in updated.response.result_data()
+
+    other_module = VerModule("other_module")
+    test_lib.declare_module(other_module)
+    assert test_lib.describe() is not updated
+
+
+@pytest.fixture
+def lazy_module_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> str:
+    (tmp_path / "lazy_rpc_module.py").write_text(
+        "from verlib import VerModule\n"
+        "\n"
+        "module = VerModule('lazy')\n"
+        "\n"
+        "@module.verproc\n"
+        "def add(a: int, b: int) -> int:\n"
+        "    return a + b\n"
+        "\n"
+        "@module.verproc\n"
+        "def foo() -> int:\n"
+        "    return 1\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "lazy_rpc_module", raising=False)
+    return "lazy_rpc_module"
+
+
+def test_verlib_lazy_module_imported_on_first_call(
+    verlib: VerLib, lazy_module_path: str
+):
+    lazy = LazyVerModule("lazy", f"{lazy_module_path}:module", ["add", "foo"])
+    verlib.declare_module(lazy)
+    assert lazy_module_path not in sys.modules
+
+    res = verlib.execute_rpc(Request(method="lazy.baz", id=1))
+    assert cast(Error, res.err_data()).code == ErrorCode.METHOD_NOT_FOUND
+    assert not lazy.loaded
+
+    res = verlib.execute_rpc(Request(method="lazy.add", id=1, params=[1, 2]))
+    assert res.result_data() == 3
+    assert lazy.loaded
+    assert lazy_module_path in sys.modules
+
+
+def test_verlib_lazy_module_finds_module_by_name(
+    verlib: VerLib, lazy_module_path: str
+):
+    lazy = LazyVerModule("lazy", lazy_module_path, ["add", "foo"])
+    verlib.declare_module(lazy)
+    res = verlib.execute_rpc(Request(method="lazy.foo", id=1))
+    assert res.result_data() == 1
+
+
+def test_verlib_lazy_module_description_loads_module(
+    verlib: VerLib, lazy_module_path: str
+):
+    lazy = LazyVerModule("lazy", f"{lazy_module_path}:module", ["add", "foo"])
+    verlib.declare_module(lazy)
+
+    desc = cast(VerLibDesc, verlib.import_lib().result_data())
+    assert lazy.loaded
+    assert {"module": "lazy", "name": "add", "num_params": 2} in desc
+
+
+def test_verlib_preload_lazy_modules(verlib: VerLib, lazy_module_path: str):
+    lazy = LazyVerModule("lazy", f"{lazy_module_path}:module", ["add", "foo"])
+    verlib.declare_module(lazy)
+    verlib.preload_modules()
+    assert lazy.loaded
+
+    eager_lib = VerLib("eager", preload=True)
+    eager_lazy = LazyVerModule("lazy", lazy_module_path, ["add", "foo"])
+    eager_lib.declare_module(eager_lazy)
+    assert eager_lazy.loaded
+
+
+def test_verlib_lazy_module_fails_on_mismatched_procedures(
+    verlib: VerLib, lazy_module_path: str
+):
+    lazy = LazyVerModule("lazy", f"{lazy_module_path}:module", ["add", "bar"])
+    verlib.declare_module(lazy)
+
+    with pytest.raises(
+        TypeError,
+        match="The procedures declared for the module 'lazy' do not match",
+    ):
+        verlib.execute_rpc(Request(method="lazy.add", id=1, params=[1, 2]))
+
+    with pytest.raises(TypeError, match="does not refer to a VerModule"):
+        LazyVerModule("other", lazy_module_path, []).load()
+
+
+def test_verlib_freeze_dispatches_from_snapshot(test_lib: VerLib):
+    # A registry built before the last registration is not kept
+    test_lib.execute_rpc(Request(method="bar", id=1))
+
+    @test_lib.verproc
+    def bar() -> int:
+        return 2
+
+    test_lib.freeze()
+    assert test_lib.frozen
+
+    res = test_lib.execute_rpc(
+        Request(method="test_module.add", id=1, params=[2, 2])
+    )
+    assert res.result_data() == 4
+    res = test_lib.execute_rpc(Request(method="test_module.baz", id=1))
+    assert cast(Error, res.err_data()).code == ErrorCode.METHOD_NOT_FOUND
+    res = test_lib.execute_rpc(Request(method="bar", id=1))
+    assert res.result_data() == 2
+
+
+def test_verlib_freeze_rejects_registration(
+    test_lib: VerLib, test_module: VerModule
+):
+    test_lib.freeze()
+
+    with pytest.raises(TypeError, match="The library 'test_lib' is frozen"):
+        test_lib.declare_module(VerModule("other"))
+
+    with pytest.raises(TypeError, match="belongs to a frozen library"):
+
+        @test_module.verproc
+        def late_proc() -> int:
+            return 1
+
+    with pytest.raises(TypeError, match="belongs to a frozen library"):
+
+        @test_lib.verproc
+        def late_default_proc() -> int:
+            return 1
+
+    foo = test_module._procedures["foo"]._fn
+    with pytest.raises(TypeError, match="belongs to a frozen library"):
+        test_module.private_access(foo)
+
+
+def test_verlib_freeze_loads_lazy_modules(
+    verlib: VerLib, lazy_module_path: str
+):
+    lazy = LazyVerModule("lazy", lazy_module_path, ["add", "foo"])
+    verlib.declare_module(lazy)
+    verlib.freeze()
+    assert lazy.loaded
+
+    res = verlib.execute_rpc(Request(method="lazy.add", id=1, params=[1, 2]))
+    assert res.result_data() == 3
+
+    with pytest.raises(TypeError, match="belongs to a frozen library"):
+
+        @lazy.load().verproc
+        def late_proc() -> int:
+            return 1
+
+    res = verlib.execute_rpc(Request(method="lazy.late_proc", id=1))
+    assert cast(Error, res.err_data()).code == ErrorCode.METHOD_NOT_FOUND
+
+
+def test_verlib_registry_swapped_on_registration(test_lib: VerLib):
+    res = test_lib.execute_rpc(Request(method="bar", id=1))
+    assert res.is_err()
+
+    @test_lib.verproc
+    def bar() -> int:
+        return 2
+
+    res = test_lib.execute_rpc(Request(method="bar", id=1))
+    assert res.result_data() == 2
+
+
+def test_verlib_frozen_concurrent_dispatch(test_lib: VerLib):
+    test_lib.freeze()
+
+    def call(i: int) -> Any:
+        return test_lib.execute_rpc(
+            Request(method="test_module.add", id=i, params=[i, i])
+        ).result_data()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(call, range(200)))
+
+    assert results == [i * 2 for i in range(200)]
+
+
+def test_verlib_execute_rpc_async(deadline_lib: VerLib):
+    ran_sync: list[str] = []
+
+    @deadline_lib.verproc
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    @deadline_lib.verproc
+    async def async_add(a: int, b: int) -> int:
+        await asyncio.sleep(0)
+        return a + b
+
+    async def run_sync(fn: Any) -> Any:
+        ran_sync.append("sync")
+        return fn()
+
+    async def run() -> list[Any]:
+        return [
+            await deadline_lib.execute_rpc_async(
+                Request(method=method, id=1, params=[1, 2]),
+                run_sync=run_sync,
+            )
+            for method in ("add", "async_add", "baz")
+        ]
+
+    add_res, async_add_res, missing_res = asyncio.run(run())
+    assert add_res.result_data() == 3
+    assert async_add_res.result_data() == 3
+    assert (
+        cast(Error, missing_res.err_data()).code == ErrorCode.METHOD_NOT_FOUND
+    )
+    assert ran_sync == ["sync"]
+
+
+def test_verlib_execute_rpc_async_cancels_past_deadline(deadline_lib: VerLib):
+    @deadline_lib.verproc
+    async def slow() -> int:
+        await asyncio.sleep(5)
+        return 1
+
+    res = asyncio.run(
+        deadline_lib.execute_rpc_async(
+            Request(method="slow", id=1),
+            http_headers=HttpHeaders({"X-Timeout": "0.01"}),
+        )
+    )
+    assert cast(Error, res.err_data()).code == ErrKind.DEADLINE_EXCEEDED
+
+
+def test_verlib_execute_rpc_async_sheds_without_blocking(verlib: VerLib):
+    limit = ConcurrencyLimit(1)
+
+    @verlib.verproc(limit=limit)
+    async def foo() -> int:
+        return 1
+
+    assert limit.try_acquire()
+    res = asyncio.run(verlib.execute_rpc_async(Request(method="foo", id=1)))
+    assert cast(Error, res.err_data()).code == ErrKind.OVERLOADED
+    limit.release()
+
+    res = asyncio.run(verlib.execute_rpc_async(Request(method="foo", id=1)))
+    assert res.result_data() == 1
+
+
+def test_verlib_runs_notifications_in_background():
+    executor = NotificationExecutor(1)
+    verlib = VerLib("test_lib", notifications=executor)
+    unblock = threading.Event()
+    ran: list[int] = []
+
+    @verlib.verproc
+    def record(value: int):
+        unblock.wait(5)
+        ran.append(value)
+
+    res = verlib.execute_rpc(Request(method="record", params=[1]))
+    assert res.is_success()
+    assert res.result_data() is None
+    assert ran == []
+
+    unblock.set()
+    assert executor.flush(5)
+    assert ran == [1]
+
+    res = verlib.execute_rpc(Request(method="record", id=1, params=[2]))
+    assert ran == [1, 2]
+    executor.shutdown()
+
+
+def test_verlib_batch_verproc_merges_batch_requests(verlib: VerLib):
+    batches: list[list[tuple[Any, ...]]] = []
+
+    @verlib.verproc
+    def foo() -> int:
+        return 1
+
+    @verlib.batch_verproc(params=["a", "b"])
+    def add(calls: list[tuple[int, int]]) -> list[int]:
+        batches.append(calls)
+        return [a + b for a, b in calls]
+
+    responses = verlib.execute_batch(
+        [
+            Request(method="add", id=1, params=[1, 2]),
+            Request(method="foo", id=2),
+            Request(method="add", id=3, params={"b": 4, "a": 3}),
+            Request(method="add", id=4, params=[1]),
+        ]
+    )
+
+    assert [res.id for res in responses] == [1, 2, 3, 4]
+    assert responses[0].result_data() == 3
+    assert responses[1].result_data() == 1
+    assert responses[2].result_data() == 7
+    assert cast(Error, responses[3].err_data()).code == ErrorCode.INVALID_PARAMS
+    assert batches == [[(1, 2), (3, 4)]]
+
+
+def test_verlib_batch_verproc_single_call(verlib: VerLib):
+    @verlib.batch_verproc(params=["a"])
+    def double(calls: list[tuple[int]]) -> list[int]:
+        return [a * 2 for (a,) in calls]
+
+    res = verlib.execute_rpc(Request(method="double", id=1, params=[21]))
+    assert res.result_data() == 42
+
+    res = asyncio.run(
+        verlib.execute_batch_async([Request(method="double", id=1, params=[1])])
+    )
+    assert res[0].result_data() == 2
+
+
+def test_verlib_batch_verproc_rejects_async(verlib: VerLib):
+    with pytest.raises(TypeError):
+
+        @verlib.batch_verproc(params=["a"])  # type: ignore
+        async def double(calls: list[tuple[int]]) -> list[int]:
+            return [a * 2 for (a,) in calls]
+
+
+def test_verlib_batch_verproc_maps_error_to_every_call(verlib: VerLib):
+    @verlib.batch_verproc(params=["a"])
+    def fail(calls: list[tuple[int]]) -> list[int]:
+        raise ValueError()
+
+    responses = verlib.execute_batch(
+        [Request(method="fail", id=i, params=[i]) for i in range(3)]
+    )
+    assert [cast(Error, res.err_data()).code for res in responses] == [
+        ErrKind.PROCEDURE_RAISED_EXCEPTION
+    ] * 3
+    # A single invocation failed
+    assert verlib.errors.stats.counts == {("fail", "ValueError"): 1}
+
+
+def test_verlib_decodes_typed_array_params(verlib: VerLib):
+    @verlib.verproc
+    def mean(values: DoubleArray, scale: int) -> float:
+        assert isinstance(values, array)
+        return sum(values) / len(values) * scale
+
+    res = verlib.execute_rpc(
+        Request(method="mean", id=1, params=[[1.0, 2.0, 3.0], 2])
+    )
+    assert res.result_data() == 4.0
+
+    encoded = encode_array(array("d", [1.0, 3.0]))
+    res = verlib.execute_rpc(
+        Request(method="mean", id=1, params={"values": encoded, "scale": 1})
+    )
+    assert res.result_data() == 2.0
+
+    res = verlib.execute_rpc(
+        Request(method="mean", id=1, params=[["a", "b"], 1])
+    )
+    assert cast(Error, res.err_data()).code == ErrorCode.INVALID_PARAMS
+
+
+def test_verlib_resolves_postponed_annotations(verlib: VerLib):
+    # As written by modules with `from __future__ import annotations`
+    @verlib.verproc
+    def total(values: "DoubleArray", ctx: "Context") -> float:
+        assert isinstance(values, array)
+        assert isinstance(ctx, Context)
+        return sum(values)
+
+    encoded = encode_array(array("d", [1.0, 3.0]))
+    for values in ([1.0, 3.0], encoded):
+        res = verlib.execute_rpc(Request(method="total", id=1, params=[values]))
+        assert res.result_data() == 4.0
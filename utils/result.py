@@ -6,6 +6,8 @@ E = TypeVar("E")
 
 
 class Result(Generic[T, E]):
+    # Slotted, like its subclasses, so results carry no __dict__
+    __slots__ = ()
     _val: T | E
 
     def is_ok(self) -> bool:
@@ -21,7 +23,7 @@ class Result(Generic[T, E]):
         ...
 
 
-@dataclass
+@dataclass(slots=True)
 class Ok(Result[T, NoReturn]):
     _val: T
 
@@ -38,7 +40,7 @@ class Ok(Result[T, NoReturn]):
         raise TypeError("Result wraps an Ok!")
 
 
-@dataclass
+@dataclass(slots=True)
 class Err(Result[NoReturn, E]):
     _val: E
 
@@ -1,4 +1,17 @@
-from .verlib import VerLib, VerModule
-import verlib.integrations as integrations
+from typing import TYPE_CHECKING, Any
+from .verlib import VerLib, VerModule, LazyVerModule
 
-__all__ = ["VerModule", "VerLib", "integrations"]
+if TYPE_CHECKING:
+    import verlib.integrations as integrations
+
+__all__ = ["VerModule", "VerLib", "LazyVerModule", "integrations"]
+
+
+def __getattr__(name: str) -> Any:
+    # The integrations import their web framework, so they are only imported
+    # on first use
+    if name == "integrations":
+        import verlib.integrations as integrations
+
+        return integrations
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,457 @@
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass
+import heapq
+import itertools
+import math
+import threading
+import time
+from typing import Mapping, Sequence, cast
+
+
+# A threading.Event for calls waiting on an event loop: set from whichever
+# thread releases the slot, waited on without blocking the loop
+class _AsyncEvent:
+    __slots__ = ("_loop", "_future")
+
+    def __init__(self):
+        # asyncio is only imported by libs with async callers
+        import asyncio
+
+        self._loop = asyncio.get_running_loop()
+        self._future: asyncio.Future[None] = self._loop.create_future()
+
+    def set(self):
+        try:
+            self._loop.call_soon_threadsafe(self._set)
+        except RuntimeError:
+            # The loop is closed, its waiting calls were cancelled with it
+            pass
+
+    def _set(self):
+        if not self._future.done():
+            self._future.set_result(None)
+
+    async def wait(self, timeout: float | None):
+        import asyncio
+
+        try:
+            await asyncio.wait_for(self._future, timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class _Waiter:
+    __slots__ = ("event", "admitted")
+
+    def __init__(self, event: threading.Event | _AsyncEvent):
+        self.event = event
+        # Set along with a slot by `release`
+        self.admitted = False
+
+
+# Calls over max_concurrency wait for a free slot while fewer than max_queue
+# calls are already waiting, for at most queue_timeout seconds (forever if
+# None). Everything else is rejected immediately.
+class ConcurrencyLimit:
+    def __init__(
+        self,
+        max_concurrency: int,
+        *,
+        max_queue: int = 0,
+        queue_timeout: float | None = None,
+        retry_after: float = 1.0,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if max_queue < 0:
+            raise ValueError("max_queue cannot be negative")
+        self._limit = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._retry_after = retry_after
+        self._in_flight = 0
+        self._queued = 0
+        self._cond = threading.Condition()
+        # Calls of acquire_async, handed their slot by `release`
+        self._async_waiters: deque[_Waiter] = deque()
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def retry_after(self) -> float:
+        return self._retry_after
+
+    def try_acquire(
+        self, blocking: bool = True, priority_class: str | None = None
+    ) -> bool:
+        # `priority_class` only matters to limits that schedule by class
+        with self._cond:
+            if self._in_flight < self._limit:
+                self._in_flight += 1
+                return True
+            if not blocking or self._queued >= self.max_queue:
+                return False
+
+            self._queued += 1
+            try:
+                admitted = self._cond.wait_for(
+                    lambda: self._in_flight < self._limit, self.queue_timeout
+                )
+            finally:
+                self._queued -= 1
+            if admitted:
+                self._in_flight += 1
+            return admitted
+
+    async def acquire_async(self, priority_class: str | None = None) -> bool:
+        # try_acquire for calls on an event loop: a call that has to queue
+        # waits on the loop, neither blocking it nor holding a thread
+        with self._cond:
+            if self._in_flight < self._limit:
+                self._in_flight += 1
+                return True
+            if self._queued >= self.max_queue:
+                return False
+            event = _AsyncEvent()
+            waiter = _Waiter(event)
+            self._async_waiters.append(waiter)
+            self._queued += 1
+        return await self._wait_async(waiter, event)
+
+    async def _wait_async(self, waiter: _Waiter, event: _AsyncEvent) -> bool:
+        try:
+            await event.wait(self.queue_timeout)
+        except BaseException:
+            # Cancelled, e.g. the client went away
+            with self._cond:
+                admitted = waiter.admitted
+                if not admitted:
+                    self._abandon(waiter, rejected=False)
+            if admitted:
+                self.release()
+            raise
+        with self._cond:
+            if waiter.admitted:
+                return True
+            self._abandon(waiter, rejected=True)
+            return False
+
+    def _abandon(self, waiter: _Waiter, rejected: bool):
+        # Takes a waiter that timed out or was cancelled out of the queue
+        self._async_waiters.remove(waiter)
+        self._queued -= 1
+
+    def release(self, latency: float | None = None):
+        with self._cond:
+            self._in_flight -= 1
+            if latency is not None:
+                self._on_sample(latency)
+            # Calls waiting on an event loop are handed the free slots first,
+            # the threads blocked in try_acquire take what is left
+            while self._async_waiters and self._in_flight < self._limit:
+                waiter = self._async_waiters.popleft()
+                self._in_flight += 1
+                self._queued -= 1
+                waiter.admitted = True
+                waiter.event.set()
+            self._cond.notify(max(1, self._limit - self._in_flight))
+
+    def _on_sample(self, latency: float):
+        pass
+
+
+# The limit shrinks while short-term latency rises above the long-term
+# baseline by more than `tolerance` and grows back while it stays close to it.
+class AdaptiveLimit(ConcurrencyLimit):
+    def __init__(
+        self,
+        initial_concurrency: int = 20,
+        *,
+        min_concurrency: int = 1,
+        max_concurrency: int = 1000,
+        tolerance: float = 1.5,
+        smoothing: float = 0.2,
+        max_queue: int = 0,
+        queue_timeout: float | None = None,
+        retry_after: float = 1.0,
+    ):
+        if not min_concurrency <= initial_concurrency <= max_concurrency:
+            raise ValueError(
+                "initial_concurrency must be between min_concurrency and max_concurrency"
+            )
+        super().__init__(
+            initial_concurrency,
+            max_queue=max_queue,
+            queue_timeout=queue_timeout,
+            retry_after=retry_after,
+        )
+        self.min_concurrency = min_concurrency
+        self.max_limit = max_concurrency
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self._estimate = float(initial_concurrency)
+        self._short_latency: float | None = None
+        self._long_latency: float | None = None
+
+    def _on_sample(self, latency: float):
+        if self._short_latency is None or self._long_latency is None:
+            self._short_latency = self._long_latency = latency
+            return
+        self._short_latency += 0.1 * (latency - self._short_latency)
+        self._long_latency += 0.01 * (latency - self._long_latency)
+        if self._short_latency <= 0:
+            return
+
+        gradient = min(
+            1.0,
+            max(0.5, self.tolerance * self._long_latency / self._short_latency),
+        )
+        target = self._estimate * gradient + math.sqrt(self._estimate)
+        self._estimate += self.smoothing * (target - self._estimate)
+        self._estimate = min(
+            float(self.max_limit),
+            max(float(self.min_concurrency), self._estimate),
+        )
+        self._limit = int(self._estimate)
+
+
+@dataclass(frozen=True)
+class QueueStats:
+    admitted: int
+    rejected: int
+    # Waiting right now
+    queued: int
+    # Seconds spent waiting by the admitted calls, including those that got
+    # a slot right away
+    total_wait: float
+    max_wait: float
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.admitted if self.admitted else 0.0
+
+
+class _ClassState:
+    __slots__ = (
+        "weight",
+        "finish",
+        "admitted",
+        "rejected",
+        "queued",
+        "total_wait",
+        "max_wait",
+    )
+
+    def __init__(self, weight: float):
+        self.weight = weight
+        # Virtual time at which the last queued call of the class finishes
+        self.finish = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def admit(self, waited: float):
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def stats(self) -> QueueStats:
+        return QueueStats(
+            self.admitted,
+            self.rejected,
+            self.queued,
+            self.total_wait,
+            self.max_wait,
+        )
+
+
+class _ClassWaiter(_Waiter):
+    __slots__ = ("state", "enqueued", "cancelled")
+
+    def __init__(
+        self, event: threading.Event | _AsyncEvent, state: _ClassState
+    ):
+        super().__init__(event)
+        self.state = state
+        self.enqueued = time.perf_counter()
+        self.cancelled = False
+
+
+# Hands out free slots to the waiting calls by weighted fair queuing across
+# priority classes, instead of first come first served: while calls are
+# waiting, each class gets slots in proportion to its weight in `weights`,
+# so a flood of calls in one class only delays the calls of the others by
+# their share. Classes not in `weights` (e.g. one per tenant) get
+# `default_weight`, calls without a class are in `default_class`.
+#
+# Queue wait times are kept per class, see `stats`.
+class FairShareLimit(ConcurrencyLimit):
+    def __init__(
+        self,
+        max_concurrency: int,
+        *,
+        weights: Mapping[str, float] | None = None,
+        default_weight: float = 1.0,
+        default_class: str = "default",
+        max_queue: int = 0,
+        queue_timeout: float | None = None,
+        retry_after: float = 1.0,
+    ):
+        super().__init__(
+            max_concurrency,
+            max_queue=max_queue,
+            queue_timeout=queue_timeout,
+            retry_after=retry_after,
+        )
+        weights = dict(weights or {})
+        if any(weight <= 0 for weight in (default_weight, *weights.values())):
+            raise ValueError("weights must be positive")
+        self.default_weight = default_weight
+        self.default_class = default_class
+        self._classes = {
+            name: _ClassState(weight) for name, weight in weights.items()
+        }
+        self._virtual_time = 0.0
+        self._waiters: list[tuple[float, int, _ClassWaiter]] = []
+        self._sequence = itertools.count()
+
+    def _state(self, priority_class: str | None) -> _ClassState:
+        name = self.default_class if priority_class is None else priority_class
+        state = self._classes.get(name)
+        if state is None:
+            state = self._classes[name] = _ClassState(self.default_weight)
+        return state
+
+    def _admit_now(self, state: _ClassState, queue: bool) -> bool | None:
+        # Whether the call is admitted or rejected right away, None if it
+        # joins the queue
+        if self._in_flight < self._limit and self._queued == 0:
+            self._in_flight += 1
+            state.admit(0.0)
+            return True
+        if not queue or self._queued >= self.max_queue:
+            state.rejected += 1
+            return False
+        return None
+
+    def _enqueue(
+        self, state: _ClassState, event: threading.Event | _AsyncEvent
+    ) -> _ClassWaiter:
+        # The call finishes one request of the class later in virtual time,
+        # scaled down by the weight of the class
+        tag = max(self._virtual_time, state.finish) + 1.0 / state.weight
+        state.finish = tag
+        waiter = _ClassWaiter(event, state)
+        heapq.heappush(self._waiters, (tag, next(self._sequence), waiter))
+        self._queued += 1
+        state.queued += 1
+        return waiter
+
+    def try_acquire(
+        self, blocking: bool = True, priority_class: str | None = None
+    ) -> bool:
+        with self._cond:
+            state = self._state(priority_class)
+            admitted = self._admit_now(state, blocking)
+            if admitted is not None:
+                return admitted
+            event = threading.Event()
+            waiter = self._enqueue(state, event)
+
+        event.wait(self.queue_timeout)
+        with self._cond:
+            if waiter.admitted:
+                return True
+            self._abandon(waiter, rejected=True)
+            return False
+
+    async def acquire_async(self, priority_class: str | None = None) -> bool:
+        with self._cond:
+            state = self._state(priority_class)
+            admitted = self._admit_now(state, True)
+            if admitted is not None:
+                return admitted
+            event = _AsyncEvent()
+            waiter = self._enqueue(state, event)
+        return await self._wait_async(waiter, event)
+
+    def _abandon(self, waiter: _Waiter, rejected: bool):
+        waiter = cast(_ClassWaiter, waiter)
+        # Left in the heap, and skipped once it reaches the top
+        waiter.cancelled = True
+        self._queued -= 1
+        waiter.state.queued -= 1
+        if rejected:
+            waiter.state.rejected += 1
+
+    def release(self, latency: float | None = None):
+        with self._cond:
+            self._in_flight -= 1
+            if latency is not None:
+                self._on_sample(latency)
+            while self._waiters and self._in_flight < self._limit:
+                tag, _, waiter = heapq.heappop(self._waiters)
+                if waiter.cancelled:
+                    continue
+                self._virtual_time = tag
+                self._in_flight += 1
+                self._queued -= 1
+                waiter.state.queued -= 1
+                waiter.admitted = True
+                waiter.state.admit(time.perf_counter() - waiter.enqueued)
+                waiter.event.set()
+
+    def stats(self) -> dict[str, QueueStats]:
+        with self._cond:
+            return {
+                name: state.stats() for name, state in self._classes.items()
+            }
+
+
+def acquire_all(
+    limits: Sequence[ConcurrencyLimit],
+    blocking: bool = True,
+    priority_class: str | None = None,
+) -> ConcurrencyLimit | None:
+    # Returns the limit that rejected the call, if any
+    for i, limit in enumerate(limits):
+        if not limit.try_acquire(blocking, priority_class):
+            for acquired in limits[:i]:
+                acquired.release()
+            return limit
+    return None
+
+
+async def acquire_all_async(
+    limits: Sequence[ConcurrencyLimit], priority_class: str | None = None
+) -> ConcurrencyLimit | None:
+    # acquire_all for calls on an event loop
+    for i, limit in enumerate(limits):
+        try:
+            admitted = await limit.acquire_async(priority_class)
+        except BaseException:
+            for acquired in limits[:i]:
+                acquired.release()
+            raise
+        if not admitted:
+            for acquired in limits[:i]:
+                acquired.release()
+            return limit
+    return None
+
+
+def release_all(limits: Sequence[ConcurrencyLimit], latency: float):
+    for limit in limits:
+        limit.release(latency)
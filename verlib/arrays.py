@@ -0,0 +1,101 @@
+from __future__ import annotations
+from array import array
+import base64
+import binascii
+from dataclasses import dataclass
+import sys
+from typing import (
+    TYPE_CHECKING,
+    Annotated,
+    Any,
+    Literal,
+    get_args,
+    get_origin,
+)
+
+# Numeric array.array typecodes
+_typecodes = frozenset("bBhHiIlLqQfd")
+
+ArrayKind = Literal["array", "memoryview", "numpy"]
+
+
+@dataclass(frozen=True)
+class TypedArray:
+    # Marks a parameter as a typed numeric array, e.g.
+    # `values: Annotated[array, TypedArray("d")]`. The argument is decoded
+    # into a contiguous buffer of `typecode` items instead of being passed as
+    # a list of Python objects. It may be sent as a JSON list of numbers, as
+    # a base64 string of the little-endian items, or as bytes by codecs with
+    # a binary type.
+    typecode: str
+    # What the procedure receives: an array.array, a memoryview over one, or
+    # a NumPy array sharing its buffer
+    kind: ArrayKind = "array"
+
+    def __post_init__(self):
+        if self.typecode not in _typecodes:
+            raise TypeError(
+                f"'{self.typecode}' is not a numeric array typecode"
+            )
+        if self.kind not in ("array", "memoryview", "numpy"):
+            raise TypeError(f"Unknown typed array kind '{self.kind}'")
+        if self.kind == "numpy":
+            # Fails at registration instead of on the first call
+            import numpy  # noqa: F401  # pyright: ignore[reportMissingImports]
+
+    def decode(self, value: Any) -> Any:
+        # Raises TypeError, ValueError or OverflowError on invalid values
+        if isinstance(value, str):
+            try:
+                value = base64.b64decode(value, validate=True)
+            except binascii.Error as exc:
+                raise ValueError(str(exc)) from exc
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            items = array(self.typecode)
+            items.frombytes(value)
+            if sys.byteorder == "big":
+                items.byteswap()
+        elif isinstance(value, list):
+            items = array(self.typecode, value)
+        else:
+            raise TypeError(f"Cannot decode {type(value).__name__} as array")
+
+        if self.kind == "memoryview":
+            return memoryview(items)
+        if self.kind == "numpy":
+            import numpy  # pyright: ignore[reportMissingImports]
+
+            return numpy.frombuffer(items, dtype=items.typecode)
+        return items
+
+
+def encode_array(values: Any) -> str:
+    # The base64 form of a buffer of numbers, as accepted by TypedArray
+    view = memoryview(values)
+    if sys.byteorder == "big" and view.itemsize > 1:
+        swapped = array(view.format, view.tobytes())
+        swapped.byteswap()
+        view = memoryview(swapped)
+    return base64.b64encode(view).decode("ascii")
+
+
+def typed_array_of(annotation: Any) -> TypedArray | None:
+    if get_origin(annotation) is not Annotated:
+        return None
+    return next(
+        (arg for arg in get_args(annotation) if isinstance(arg, TypedArray)),
+        None,
+    )
+
+
+if TYPE_CHECKING:
+    # array is only subscriptable at runtime from Python 3.12
+    DoubleArray = Annotated[array[float], TypedArray("d")]
+    FloatArray = Annotated[array[float], TypedArray("f")]
+    Int32Array = Annotated[array[int], TypedArray("i")]
+    Int64Array = Annotated[array[int], TypedArray("q")]
+else:
+    DoubleArray = Annotated[array, TypedArray("d")]
+    FloatArray = Annotated[array, TypedArray("f")]
+    Int32Array = Annotated[array, TypedArray("i")]
+    Int64Array = Annotated[array, TypedArray("q")]
@@ -0,0 +1,93 @@
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Sequence
+
+# Takes the argument tuples of the merged calls, e.g. list[tuple[int, int]]
+BatchFn = Callable[[list[Any]], Sequence[Any]]
+
+
+class _PendingCall:
+    __slots__ = ("args", "result", "exc", "done")
+
+    def __init__(self, args: tuple[Any, ...]):
+        self.args = args
+        self.result: Any = None
+        self.exc: BaseException | None = None
+        self.done = threading.Event()
+
+
+class _Batch:
+    __slots__ = ("calls", "full")
+
+    def __init__(self):
+        self.calls: list[_PendingCall] = []
+        self.full = threading.Event()
+
+
+def invoke_batch(fn: BatchFn, arg_sets: list[tuple[Any, ...]]) -> Sequence[Any]:
+    results = fn(arg_sets)
+    if len(results) != len(arg_sets):
+        raise ValueError(
+            f"The batch function returned {len(results)} results for {len(arg_sets)} calls"
+        )
+    return results
+
+
+class BatchCollector:
+    # Merges calls made from different threads within `window` seconds into
+    # a single invocation of the batch function. The first caller of a
+    # batch waits for the window to close (or for the batch to fill up),
+    # invokes the function and hands each caller its own result.
+    def __init__(
+        self,
+        fn: BatchFn,
+        window: float,
+        max_batch_size: int | None = None,
+    ):
+        self._fn = fn
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._open: _Batch | None = None
+
+    def submit(self, args: tuple[Any, ...]) -> Any:
+        call = _PendingCall(args)
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if batch is None:
+                batch = self._open = _Batch()
+            batch.calls.append(call)
+            if (
+                self.max_batch_size is not None
+                and len(batch.calls) >= self.max_batch_size
+            ):
+                self._open = None
+                batch.full.set()
+
+        if leader:
+            if self.window > 0:
+                batch.full.wait(self.window)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            self._run(batch)
+        else:
+            call.done.wait()
+
+        if call.exc is not None:
+            raise call.exc
+        return call.result
+
+    def _run(self, batch: _Batch):
+        try:
+            results = invoke_batch(self._fn, [c.args for c in batch.calls])
+        except BaseException as exc:
+            for call in batch.calls:
+                call.exc = exc
+                call.done.set()
+            return
+
+        for call, result in zip(batch.calls, results):
+            call.result = result
+            call.done.set()
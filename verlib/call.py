@@ -1,27 +1,164 @@
-from typing import Callable, Any, ClassVar
+from __future__ import annotations
+from typing import (
+    Callable,
+    Any,
+    Iterable,
+    Iterator,
+    Mapping,
+    Protocol,
+    Sequence,
+    cast,
+)
 from types import SimpleNamespace
 from verlib.jsonrpc import Request
 from verlib.auth import AccessLevel
 
+_missing: Any = object()
 
-class HttpHeaders(dict[str, Any]):
-    def __init__(self, initial_data: dict[str, Any]):
-        super().__init__(
-            map(
-                lambda item: (item[0].casefold(), item[1]), initial_data.items()
+HeaderPairs = Iterable[tuple[bytes, bytes]] | Iterable[tuple[str, str]]
+_HeaderPair = tuple[bytes, bytes] | tuple[str, str]
+
+
+class _CaseInsensitiveSource(Protocol):
+    # e.g. a werkzeug or Django headers object
+    def get(self, key: str, default: Any = None) -> Any:
+        ...
+
+    def items(self) -> Iterable[tuple[str, Any]]:
+        ...
+
+
+def _decode(value: bytes | str) -> str:
+    # HTTP header bytes are latin-1, as in ASGI and WSGI
+    return value.decode("latin-1") if isinstance(value, bytes) else value
+
+
+class _WSGIHeaders:
+    # Case-insensitive access to the HTTP_* variables of a WSGI environ
+    __slots__ = ("_environ",)
+
+    _unprefixed = ("CONTENT_TYPE", "CONTENT_LENGTH")
+
+    def __init__(self, environ: Mapping[str, Any]):
+        self._environ = environ
+
+    def get(self, key: str, default: Any = None) -> Any:
+        name = key.upper().replace("-", "_")
+        if name not in self._unprefixed:
+            name = f"HTTP_{name}"
+        value = self._environ.get(name)
+        return default if value in (None, "") else value
+
+    def items(self) -> Iterator[tuple[str, Any]]:
+        for name, value in self._environ.items():
+            if name.startswith("HTTP_"):
+                yield (name[5:].replace("_", "-"), value)
+            elif name in self._unprefixed and value:
+                yield (name.replace("_", "-"), value)
+
+
+class HttpHeaders(Mapping[str, Any]):
+    # A read-only, case-insensitive view over the headers of the transport.
+    # Nothing is copied up front: keys are only casefolded on lookup and the
+    # looked up keys are memoized.
+    #
+    # `source` is a mapping (or any object with `get` and `items` if
+    # `case_insensitive` is set, e.g. a werkzeug or Django headers object)
+    # or a sequence of raw header pairs, as found in an ASGI scope.
+    __slots__ = ("_mapping", "_lookup_source", "_pairs", "_memo")
+
+    def __init__(
+        self,
+        source: Mapping[str, Any] | HeaderPairs | Any = (),
+        *,
+        case_insensitive: bool = False,
+    ):
+        # Exactly one of the sources is set, or none for no headers
+        self._mapping: Mapping[str, Any] | None = None
+        self._lookup_source: _CaseInsensitiveSource | None = None
+        self._pairs: Sequence[_HeaderPair] = ()
+        if case_insensitive:
+            self._lookup_source = cast(_CaseInsensitiveSource, source)
+        elif isinstance(source, Mapping):
+            self._mapping = cast(Mapping[str, Any], source)
+        else:
+            self._pairs = (
+                source if isinstance(source, (list, tuple)) else tuple(source)
             )
-        )
+        self._memo: dict[str, Any] | None = None
+
+    @classmethod
+    def from_asgi(cls, scope: Mapping[str, Any]) -> HttpHeaders:
+        return cls(scope.get("headers", ()))
+
+    @classmethod
+    def from_wsgi(cls, environ: Mapping[str, Any]) -> HttpHeaders:
+        return cls(_WSGIHeaders(environ), case_insensitive=True)
+
+    def _items(self) -> Iterator[tuple[str, Any]]:
+        if self._lookup_source is not None:
+            yield from self._lookup_source.items()
+        elif self._mapping is not None:
+            yield from self._mapping.items()
+        else:
+            for name, value in self._pairs:
+                yield (_decode(name), _decode(value))
+
+    def _find(self, key: str, folded: str) -> Any:
+        if self._lookup_source is not None:
+            return self._lookup_source.get(key, _missing)
+
+        mapping = self._mapping
+        if mapping is not None:
+            value = mapping.get(key, _missing)
+            if value is not _missing:
+                return value
+            for name, value in mapping.items():
+                if name.casefold() == folded:
+                    return value
+            return _missing
+
+        for name, value in self._pairs:
+            if _decode(name).casefold() == folded:
+                return _decode(value)
+        return _missing
+
+    def _lookup(self, key: str) -> Any:
+        folded = key.casefold()
+        memo = self._memo
+        if memo is None:
+            memo = self._memo = {}
+        elif folded in memo:
+            return memo[folded]
+
+        value = self._find(key, folded)
+        memo[folded] = value
+        return value
 
     def __getitem__(self, key: str) -> Any:
-        return super().__getitem__(key.casefold())
+        value = self._lookup(key)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._lookup(key) is not _missing
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _missing else value
+
+    def __iter__(self) -> Iterator[str]:
+        return (name.casefold() for name, _ in self._items())
 
-    def __contains__(self, key: str) -> bool:
-        return super().__contains__(key.casefold())
+    def __len__(self) -> int:
+        return sum(1 for _ in self._items())
 
-    def get(self, key: str) -> str | None:
-        return super().get(key.casefold())
+    def __repr__(self) -> str:
+        return f"HttpHeaders({dict(self.items())!r})"
 
 
 Context = SimpleNamespace
 ContextBuilder = Callable[[HttpHeaders, Request], Context]
 AuthProvider = Callable[[HttpHeaders, Request, Context], AccessLevel]
+PriorityClassifier = Callable[[Context, Request], "str | None"]
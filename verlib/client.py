@@ -0,0 +1,154 @@
+from __future__ import annotations
+import http.client
+import itertools
+import json
+import threading
+from typing import TYPE_CHECKING, Any, Protocol
+from urllib.parse import urlsplit
+from verlib.jsonrpc import JSONValues
+
+if TYPE_CHECKING:
+    from verlib.verlib import VerLib
+
+_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+class RpcError(Exception):
+    # Raised by stub methods when the call returns a JSON-RPC error
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class TransportError(Exception):
+    # Raised when the server does not answer with a JSON-RPC response, e.g.
+    # a plain-text 404 from a proxy in front of it
+    def __init__(self, status: int | None, body: bytes):
+        super().__init__(
+            f"HTTP {status}" if status is not None else "Invalid response"
+        )
+        self.status = status
+        self.body = body
+
+
+def _is_rpc_response(body: bytes) -> bool:
+    try:
+        res = json.loads(body)
+    except ValueError:
+        return False
+    return isinstance(res, dict) and ("result" in res or "error" in res)
+
+
+class Transport(Protocol):
+    # Sends an encoded request and returns the encoded response
+    def send(self, body: bytes) -> bytes:
+        ...
+
+
+class HttpTransport:
+    # Keeps one connection per thread alive across calls. Also the base of
+    # the HTTP target of verlib.loadtest.
+    def __init__(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+        timeout: float = 30.0,
+    ):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL '{url}'")
+        self._conn_type = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self._netloc = parts.netloc
+        self._path = parts.path or "/"
+        self._headers = {"Content-Type": "application/json", **(headers or {})}
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def _request(
+        self, method: str, path: str, body: bytes | None
+    ) -> tuple[int, bytes]:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._conn_type(
+                self._netloc, timeout=self._timeout
+            )
+        try:
+            conn.request(method, path, body, self._headers)
+            response = conn.getresponse()
+            return (response.status, response.read())
+        except (OSError, http.client.HTTPException):
+            # Reconnect on the next call
+            conn.close()
+            self._local.conn = None
+            raise
+
+    def send(self, body: bytes) -> bytes:
+        status, res = self._request("POST", self._path, body)
+        # Errors such as overload come with a JSON-RPC error in the body, the
+        # other failed responses are not meant for the client
+        if not 200 <= status < 300 and not _is_rpc_response(res):
+            raise TransportError(status, res)
+        return res
+
+
+class InProcessTransport:
+    # Dispatches the requests to a lib in the same process, e.g. in tests
+    def __init__(self, verlib: VerLib):
+        self.verlib = verlib
+
+    def send(self, body: bytes) -> bytes:
+        from verlib import transport
+        from verlib.call import HttpHeaders
+
+        return transport.dispatch(self.verlib, body, HttpHeaders({})).body
+
+
+def envelope_prefix(method: str, has_params: bool) -> bytes:
+    # The start of every request to `method`, up to the encoded params, or up
+    # to the id if the request has no params
+    prefix = f'{{"jsonrpc":"2.0","method":{_encoder.encode(method)},'
+    return (prefix + ('"params":' if has_params else '"id":')).encode()
+
+
+class StubClient:
+    # Base class of the clients generated by verlib.stubs. Each stub method
+    # holds the pre-encoded start of its requests, so a call only encodes
+    # its params and id.
+    def __init__(self, transport: Transport | str):
+        self._transport = (
+            HttpTransport(transport)
+            if isinstance(transport, str)
+            else transport
+        )
+        self._ids = itertools.count(1)
+
+    def _call(self, prefix: bytes, params: list[JSONValues] | None) -> Any:
+        # `prefix` is envelope_prefix(method, params is not None)
+        id = next(self._ids)
+        if params is None:
+            body = b"%s%d}" % (prefix, id)
+        else:
+            body = b'%s%s,"id":%d}' % (
+                prefix,
+                _encoder.encode(params).encode(),
+                id,
+            )
+        encoded = self._transport.send(body)
+        try:
+            res = json.loads(encoded)
+        except ValueError:
+            raise TransportError(None, encoded) from None
+        if not isinstance(res, dict):
+            raise TransportError(None, encoded)
+        error = res.get("error")
+        if error is not None:
+            raise RpcError(error["code"], error["message"], error.get("data"))
+        if "result" not in res:
+            raise TransportError(None, encoded)
+        return res["result"]
@@ -0,0 +1,34 @@
+from __future__ import annotations
+import json
+from typing import Any, Protocol
+
+
+class Codec(Protocol):
+    content_type: str
+
+    # Raises ValueError if the data cannot be decoded
+    def decode(self, data: bytes) -> Any:
+        ...
+
+    def encode(self, value: Any) -> bytes:
+        ...
+
+
+class JSONCodec:
+    content_type = "application/json"
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._encoder = json.JSONEncoder(
+            separators=(",", ":"), ensure_ascii=False
+        )
+
+    def decode(self, data: bytes) -> Any:
+        # Also raises ValueError (UnicodeDecodeError) on invalid utf-8
+        return self._decoder.decode(data.decode("utf-8"))
+
+    def encode(self, value: Any) -> bytes:
+        return self._encoder.encode(value).encode("utf-8")
+
+
+json_codec = JSONCodec()
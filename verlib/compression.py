@@ -0,0 +1,102 @@
+from __future__ import annotations
+from dataclasses import dataclass, replace
+from typing import Iterable, Iterator
+import zlib
+from verlib.transport import TransportResponse
+
+# zlib window bits of each content coding, "deflate" is the zlib format
+_wbits: dict[str, int] = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+}
+
+
+def negotiate(
+    accept_encoding: str | None, encodings: Iterable[str]
+) -> str | None:
+    # Picks the supported coding with the highest q-value, in the server's
+    # order of preference on ties. None means the body is sent as is.
+    if not accept_encoding:
+        return None
+
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding] = q
+
+    best: str | None = None
+    best_q = 0.0
+    for encoding in encodings:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+@dataclass(frozen=True)
+class Compression:
+    # Bodies smaller than `min_size` bytes are not worth the CPU time
+    min_size: int = 1024
+    # zlib compression level, from 1 (fastest) to 9 (smallest)
+    level: int = 6
+    encodings: tuple[str, ...] = ("gzip", "deflate")
+
+    def __post_init__(self):
+        if not 0 <= self.level <= 9:
+            raise ValueError("level must be between 0 and 9")
+        for encoding in self.encodings:
+            if encoding not in _wbits:
+                raise ValueError(f"Unsupported content coding '{encoding}'")
+
+    def _compressor(self, encoding: str) -> zlib._Compress:
+        return zlib.compressobj(self.level, zlib.DEFLATED, _wbits[encoding])
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        compressor = self._compressor(encoding)
+        return compressor.compress(body) + compressor.flush()
+
+    def stream(self, chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+        # Each chunk is flushed as soon as it is compressed, so a streamed
+        # result reaches the client without waiting for the end of it
+        compressor = self._compressor(encoding)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            compressed += compressor.flush(zlib.Z_SYNC_FLUSH)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def apply(
+        self, response: TransportResponse, accept_encoding: str | None
+    ) -> TransportResponse:
+        if (
+            len(response.body) < self.min_size
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+
+        # The body depends on Accept-Encoding from here on, even when it is
+        # sent uncompressed
+        headers = {**response.headers, "Vary": "Accept-Encoding"}
+        encoding = negotiate(accept_encoding, self.encodings)
+        if encoding is None:
+            return replace(response, headers=headers)
+
+        headers["Content-Encoding"] = encoding
+        # The compressed body is not byte for byte the one the ETag was
+        # computed from
+        etag = headers.get("ETag")
+        if etag is not None and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        return TransportResponse(
+            self.compress(response.body, encoding), response.status, headers
+        )
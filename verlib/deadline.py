@@ -0,0 +1,52 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import time
+from verlib.call import HttpHeaders
+
+
+class Deadline:
+    # Deadlines are kept on the monotonic clock, so they are not affected by
+    # wall clock adjustments once parsed
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> Deadline:
+        return cls(time.monotonic() + seconds)
+
+    @classmethod
+    def at_timestamp(cls, timestamp: float) -> Deadline:
+        return cls.after(timestamp - time.time())
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.3f})"
+
+
+@dataclass(frozen=True)
+class DeadlineHeader:
+    name: str = "X-Request-Deadline"
+    # If True the header carries a timeout in seconds, otherwise
+    # a unix timestamp
+    relative: bool = False
+
+    def parse(self, headers: HttpHeaders) -> Deadline | None:
+        value = headers.get(self.name)
+        if value is None:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            return None
+        if seconds != seconds:  # NaN
+            return None
+        return (
+            Deadline.after(seconds)
+            if self.relative
+            else Deadline.at_timestamp(seconds)
+        )
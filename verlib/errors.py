@@ -0,0 +1,117 @@
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass
+import random
+import threading
+import time
+import traceback
+from verlib.jsonrpc import Error, JSONValues
+from verlib.verliberr import ErrKind, ErrMsg
+
+_default_error: Error[JSONValues] = Error(
+    ErrKind.PROCEDURE_RAISED_EXCEPTION,
+    str(ErrMsg.PROCEDURE_RAISED_EXCEPTION),
+    None,
+)
+
+
+@dataclass(frozen=True)
+class CapturedTraceback:
+    procedure: str
+    exc_type: str
+    traceback: str
+    timestamp: float
+
+
+@dataclass(frozen=True)
+class ErrorStats:
+    # Number of exceptions raised, by procedure and exception type name
+    counts: dict[tuple[str, str], int]
+    tracebacks: tuple[CapturedTraceback, ...]
+
+
+class ErrorRegistry:
+    # Maps the exceptions raised by procedures to JSON-RPC errors. The errors
+    # are built at registration, so handling an exception is a lookup on its
+    # type. Formatting tracebacks is expensive, so only a sample of them
+    # (`traceback_sample_rate`, from 0 to 1) is captured, and only the latest
+    # `max_tracebacks` are kept.
+    def __init__(
+        self,
+        *,
+        traceback_sample_rate: float = 0.0,
+        max_tracebacks: int = 100,
+    ):
+        if not 0.0 <= traceback_sample_rate <= 1.0:
+            raise ValueError("traceback_sample_rate must be between 0 and 1")
+        self.traceback_sample_rate = traceback_sample_rate
+        self._mappings: dict[type[BaseException], Error[JSONValues]] = {}
+        # Resolved errors by concrete exception type, cleared on registration
+        self._resolved: dict[type[BaseException], Error[JSONValues]] = {}
+        self._lock = threading.Lock()
+        self._counts: dict[tuple[str, str], int] = {}
+        self._tracebacks: deque[CapturedTraceback] = deque(
+            maxlen=max_tracebacks
+        )
+
+    def register(
+        self,
+        exc_type: type[Exception],
+        code: int,
+        message: str,
+        data: JSONValues = None,
+    ):
+        if not isinstance(exc_type, type) or not issubclass(
+            exc_type, Exception
+        ):
+            raise TypeError(f"'{exc_type}' is not an exception type")
+        with self._lock:
+            self._mappings[exc_type] = Error(code, message, data)
+            self._resolved = {}
+
+    def resolve(self, exc_type: type[BaseException]) -> Error[JSONValues]:
+        error = self._resolved.get(exc_type)
+        if error is not None:
+            return error
+
+        # The closest registered base class wins
+        error = next(
+            (
+                self._mappings[base]
+                for base in exc_type.__mro__
+                if base in self._mappings
+            ),
+            _default_error,
+        )
+        self._resolved[exc_type] = error
+        return error
+
+    def handle(self, procedure: str, exc: BaseException) -> Error[JSONValues]:
+        exc_type = type(exc)
+        key = (procedure, exc_type.__name__)
+        capture = (
+            self.traceback_sample_rate > 0.0
+            and random.random() < self.traceback_sample_rate
+        )
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+        if capture:
+            captured = CapturedTraceback(
+                procedure,
+                exc_type.__name__,
+                "".join(traceback.format_exception(exc)),
+                time.time(),
+            )
+            with self._lock:
+                self._tracebacks.append(captured)
+        return self.resolve(exc_type)
+
+    @property
+    def stats(self) -> ErrorStats:
+        with self._lock:
+            return ErrorStats(dict(self._counts), tuple(self._tracebacks))
+
+    def reset_stats(self):
+        with self._lock:
+            self._counts = {}
+            self._tracebacks.clear()
@@ -0,0 +1,178 @@
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import threading
+import time
+from typing import Literal, Protocol, Sequence
+
+ConflictReason = Literal["invalid_key", "in_progress", "key_reused"]
+
+_conflict_status: dict[ConflictReason, int] = {
+    "invalid_key": 400,
+    "in_progress": 409,
+    "key_reused": 422,
+}
+
+
+class IdempotencyConflict(ValueError):
+    # The request cannot be run or replayed under its idempotency key
+    def __init__(self, reason: ConflictReason, key: str):
+        super().__init__(f"Idempotency key '{key[:64]}': {reason}")
+        self.reason: ConflictReason = reason
+        self.key = key
+
+    @property
+    def status(self) -> int:
+        return _conflict_status[self.reason]
+
+
+def fingerprint(body: bytes, scope: Sequence[str | None] = ()) -> bytes:
+    # Covers the body and the `scope` of the caller, e.g. the values of its
+    # auth headers, where missing values leave the digest as it is
+    digest = hashlib.blake2b(body, digest_size=16)
+    for i, value in enumerate(scope):
+        if value is not None:
+            encoded = value.encode("utf-8", "surrogateescape")
+            digest.update(b"%d:%d:%s" % (i, len(encoded), encoded))
+    return digest.digest()
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    # The encoded response to the first request sent with a key, replayed
+    # as is to the requests retried with the same key
+    fingerprint: bytes
+    body: bytes
+    status: int
+    headers: tuple[tuple[str, str], ...]
+
+
+class IdempotencyStore(Protocol):
+    # Where responses are kept between retries. Implementations must be
+    # thread safe; a shared store (e.g. Redis) lets retries that reach
+    # another process be replayed too.
+    def get(self, key: str) -> StoredResponse | None:
+        ...
+
+    def set(self, key: str, response: StoredResponse, ttl: float):
+        ...
+
+
+class MemoryStore:
+    # Keeps up to `max_entries` responses in the process, evicting the
+    # oldest ones first
+    def __init__(self, max_entries: int = 10_000):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, StoredResponse]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> StoredResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            return response
+
+    def set(self, key: str, response: StoredResponse, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class IdempotencyCache:
+    # Runs the requests sent with an idempotency key at most once per key
+    # and `ttl` seconds. Retries get the stored response of the first
+    # request, and retries that arrive while it is still running wait up to
+    # `wait_timeout` seconds for it instead of running it again.
+    #
+    # Keys are shared by all callers, so clients should use random keys
+    # (e.g. UUIDs). A key reused for a different request body, or with other
+    # values of the `vary` headers (the credentials of the caller), is
+    # rejected. Before replaying, the transport also checks that the caller
+    # may call the procedures of the request, so credentials sent in other
+    # headers are checked too.
+    # Waiting on running requests only spans the current process; the store
+    # decides whether finished ones are replayed across processes.
+    def __init__(
+        self,
+        store: IdempotencyStore | None = None,
+        *,
+        header: str = "Idempotency-Key",
+        ttl: float = 24 * 3600.0,
+        wait_timeout: float = 30.0,
+        max_key_length: int = 255,
+        vary: Sequence[str] = ("Authorization", "Cookie"),
+    ):
+        self.store: IdempotencyStore = (
+            store if store is not None else MemoryStore()
+        )
+        self.header = header
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.max_key_length = max_key_length
+        self.vary = tuple(vary)
+        self._in_flight: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def _replay(
+        self, key: str, stored: StoredResponse, digest: bytes
+    ) -> StoredResponse:
+        if stored.fingerprint != digest:
+            raise IdempotencyConflict("key_reused", key)
+        return stored
+
+    def begin(
+        self, key: str, digest: bytes, timeout: float | None = None
+    ) -> StoredResponse | None:
+        # Returns the stored response to replay, or None if the caller is now
+        # running the request for `key` and must call `finish`. Raises
+        # IdempotencyConflict when the request cannot go ahead.
+        if not 0 < len(key) <= self.max_key_length:
+            raise IdempotencyConflict("invalid_key", key)
+        timeout = self.wait_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            stored = self.store.get(key)
+            if stored is not None:
+                return self._replay(key, stored, digest)
+            with self._lock:
+                running = self._in_flight.get(key)
+                if running is None:
+                    self._in_flight[key] = threading.Event()
+                    break
+            if not running.wait(max(0.0, deadline - time.monotonic())):
+                raise IdempotencyConflict("in_progress", key)
+            # Not stored if it failed transiently, in which case it is run
+            # again by one of the waiting retries
+
+        # The first request may have finished between the lookup and the
+        # reservation
+        stored = self.store.get(key)
+        if stored is not None:
+            self.finish(key, None)
+            return self._replay(key, stored, digest)
+        return None
+
+    def finish(self, key: str, response: StoredResponse | None):
+        # Stores the response, if any, and wakes up the waiting retries
+        try:
+            if response is not None:
+                self.store.set(key, response, self.ttl)
+        finally:
+            with self._lock:
+                running = self._in_flight.pop(key)
+            running.set()
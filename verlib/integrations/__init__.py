@@ -1,3 +1,27 @@
-from .flask import FlaskVerLib
+import importlib
+from typing import TYPE_CHECKING, Any
 
-__all__ = ["FlaskVerLib"]
+if TYPE_CHECKING:
+    from .django import DjangoVerLib
+    from .flask import FlaskVerLib
+    from .wsgi import WSGIVerLib
+
+__all__ = ["DjangoVerLib", "FlaskVerLib", "WSGIVerLib"]
+
+# Each integration is imported on first use, so only the frameworks that are
+# actually used need to be installed
+_integrations = {
+    "DjangoVerLib": ".django",
+    "FlaskVerLib": ".flask",
+    "WSGIVerLib": ".wsgi",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _integrations:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(
+        importlib.import_module(_integrations[name], __name__), name
+    )
+    globals()[name] = value
+    return value
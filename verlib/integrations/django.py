@@ -0,0 +1,151 @@
+from __future__ import annotations
+from typing import Any, Callable
+from verlib.verlib import VerLib
+from verlib.call import HttpHeaders
+from verlib.codec import Codec, json_codec
+from verlib.compression import Compression
+from verlib.limits import LimitExceeded, RequestLimits
+import verlib.transport as transport
+from verlib.transport import TransportResponse
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponse, HttpResponseNotAllowed
+from django.urls import URLPattern, URLResolver, path
+
+
+def _headers(request: HttpRequest) -> HttpHeaders:
+    return HttpHeaders(request.headers, case_insensitive=True)
+
+
+def _read_body(request: HttpRequest, limits: RequestLimits | None) -> bytes:
+    if limits is None:
+        return request.body
+    # Chunked bodies have no length and are read until the end
+    try:
+        length = int(request.META["CONTENT_LENGTH"])
+    except (KeyError, ValueError):
+        length = None
+    # Reading the stream directly skips the copy Django keeps in request.body
+    return limits.read_body(request.read, length)
+
+
+class DjangoVerLib:
+    def __init__(
+        self,
+        verlib: VerLib,
+        *,
+        codec: Codec = json_codec,
+        compression: Compression | None = None,
+        limits: RequestLimits | None = None,
+        thread_sensitive: bool = False,
+    ):
+        self._verlib: VerLib = verlib
+        self.codec = codec
+        self.compression = compression
+        self.limits = limits
+        # Sync procedures called from the async view run in a thread pool,
+        # so they run concurrently. Thread sensitive ones all share Django's
+        # single thread instead, as code that is not thread safe requires.
+        self.thread_sensitive = thread_sensitive
+
+        # The views are plain functions so Django can tell the async one
+        # apart and so they can be exempted from CSRF checks
+        def view(request: HttpRequest) -> HttpResponse:
+            if request.method != "POST":
+                return HttpResponseNotAllowed(["POST"])
+            try:
+                body = _read_body(request, self.limits)
+            except LimitExceeded as exc:
+                return self._into_http_response(
+                    transport.limit_exceeded(exc, self.codec), request
+                )
+            return self._into_http_response(
+                transport.dispatch(
+                    self._verlib,
+                    body,
+                    _headers(request),
+                    self.codec,
+                    limits=self.limits,
+                ),
+                request,
+            )
+
+        async def async_view(request: HttpRequest) -> HttpResponse:
+            if request.method != "POST":
+                return HttpResponseNotAllowed(["POST"])
+            try:
+                body = _read_body(request, self.limits)
+            except LimitExceeded as exc:
+                return self._into_http_response(
+                    transport.limit_exceeded(exc, self.codec), request
+                )
+            return self._into_http_response(
+                await transport.dispatch_async(
+                    self._verlib,
+                    body,
+                    _headers(request),
+                    self.codec,
+                    run_sync=self._run_sync,
+                    limits=self.limits,
+                ),
+                request,
+            )
+
+        def import_view(request: HttpRequest) -> HttpResponse:
+            if request.method != "GET":
+                return HttpResponseNotAllowed(["GET"])
+            return self._into_http_response(
+                transport.describe(self._verlib, _headers(request)), request
+            )
+
+        def read_view(request: HttpRequest, method: str) -> HttpResponse:
+            if request.method != "GET":
+                return HttpResponseNotAllowed(["GET"])
+            return self._into_http_response(
+                transport.dispatch_read(
+                    self._verlib,
+                    method,
+                    request.META.get("QUERY_STRING", ""),
+                    _headers(request),
+                    self.codec,
+                ),
+                request,
+            )
+
+        for fn in (view, async_view, import_view, read_view):
+            setattr(fn, "csrf_exempt", True)
+        self.view = view
+        self.async_view = async_view
+        self.import_view = import_view
+        self.read_view = read_view
+
+    def _run_sync(self, fn: Callable[[], Any]) -> Any:
+        return sync_to_async(fn, thread_sensitive=self.thread_sensitive)()
+
+    def _into_http_response(
+        self, result: TransportResponse, request: HttpRequest
+    ) -> HttpResponse:
+        if self.compression is not None:
+            result = self.compression.apply(
+                result, request.META.get("HTTP_ACCEPT_ENCODING")
+            )
+        return HttpResponse(
+            result.body, status=result.status, headers=result.headers
+        )
+
+    def urls(
+        self, lib_url: str = "verlib", *, use_async: bool = False
+    ) -> list[URLPattern | URLResolver]:
+        lib_url = lib_url.strip("/")
+        return [
+            path(
+                lib_url,
+                self.async_view if use_async else self.view,
+                name="verlib",
+            ),
+            path(f"{lib_url}/import", self.import_view, name="verlib-import"),
+            path(
+                f"{lib_url}/call/<str:method>",
+                self.read_view,
+                name="verlib-call",
+            ),
+        ]
@@ -1,16 +1,29 @@
 from verlib.verlib import VerLib
-from verlib.jsonrpc import Request, ErrRes, OkRes
 from verlib.call import HttpHeaders
-import verlib.jsonrpc as jsonrpc
-import typing
+from verlib.codec import Codec, json_codec
+from verlib.compression import Compression
+from verlib.limits import LimitExceeded, RequestLimits
+import verlib.transport as transport
+from verlib.transport import TransportResponse
 from flask import Flask, request
 import flask
 
 
 class FlaskVerLib:
-    def __init__(self, verlib: VerLib, lib_url="/verlib"):
+    def __init__(
+        self,
+        verlib: VerLib,
+        lib_url="/verlib",
+        *,
+        codec: Codec = json_codec,
+        compression: Compression | None = None,
+        limits: RequestLimits | None = None,
+    ):
         self._verlib: VerLib = verlib
         self.lib_url = lib_url
+        self.codec = codec
+        self.compression = compression
+        self.limits = limits
 
     def init_app(self, app: Flask):
         self._dispatch_rpc_call = app.post(self.lib_url)(
@@ -18,26 +31,53 @@ class FlaskVerLib:
         )
 
         # TODO: Figure out a safer way to expose procedures
+        @app.get(f"{self.lib_url}/import")
         def import_lib() -> flask.Response:
-            return flask.jsonify(self._verlib.import_lib())
-
-    def _dispatch_rpc_call(self) -> flask.Response:
+            http_headers = HttpHeaders(request.headers, case_insensitive=True)
+            return self._into_response(
+                transport.describe(self._verlib, http_headers), http_headers
+            )
 
-        req_json: dict = request.get_json()
-        req_id = req_json.get("id")
-        rpc_req = jsonrpc.into_rpc_request(request.get_json())
+        @app.get(f"{self.lib_url}/call/<path:method>")
+        def read_call(method: str) -> flask.Response:
+            http_headers = HttpHeaders(request.headers, case_insensitive=True)
+            result = transport.dispatch_read(
+                self._verlib,
+                method,
+                request.query_string.decode("latin-1"),
+                http_headers,
+                self.codec,
+            )
+            return self._into_response(result, http_headers)
 
-        if rpc_req.is_err():
-            return flask.jsonify(ErrRes(req_id, rpc_req.unwrap_err()))
+    def _dispatch_rpc_call(self) -> flask.Response:
+        # Read the raw body once and skip Flask's JSON handling altogether
+        http_headers = HttpHeaders(request.headers, case_insensitive=True)
+        try:
+            body = (
+                self.limits.read_body(
+                    request.stream.read, request.content_length
+                )
+                if self.limits is not None
+                else request.get_data(cache=False)
+            )
+        except LimitExceeded as exc:
+            return self._into_response(
+                transport.limit_exceeded(exc, self.codec), http_headers
+            )
 
-        rpc_call = rpc_req.unwrap()
-        result = self._verlib.execute_rpc(
-            rpc_call, http_headers=HttpHeaders(request.headers)
+        result = transport.dispatch(
+            self._verlib, body, http_headers, self.codec, limits=self.limits
         )
+        return self._into_response(result, http_headers)
 
-        if result.is_err():
-            return flask.jsonify(
-                ErrRes(rpc_call.id, typing.cast(ErrRes, result).err_data())
+    def _into_response(
+        self, result: TransportResponse, http_headers: HttpHeaders
+    ) -> flask.Response:
+        if self.compression is not None:
+            result = self.compression.apply(
+                result, http_headers.get("Accept-Encoding")
             )
-        else:
-            return flask.jsonify(OkRes(rpc_call.id, result.result_data()))
+        return flask.Response(
+            result.body, status=result.status, headers=result.headers
+        )
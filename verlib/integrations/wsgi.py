@@ -0,0 +1,128 @@
+from __future__ import annotations
+from http import HTTPStatus
+from typing import Any, Callable, Iterable
+from verlib.verlib import VerLib
+from verlib.call import HttpHeaders
+from verlib.codec import Codec, json_codec
+from verlib.compression import Compression
+from verlib.limits import LimitExceeded, RequestLimits
+import verlib.transport as transport
+from verlib.transport import TransportResponse
+
+StartResponse = Callable[..., Any]
+
+
+def _status_line(status: int) -> str:
+    return f"{status} {HTTPStatus(status).phrase}"
+
+
+def _read_body(
+    environ: dict[str, Any], limits: RequestLimits | None = None
+) -> bytes:
+    stream = environ["wsgi.input"]
+    try:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    if length > 0:
+        # Never read past the declared length, some servers block on it
+        if limits is not None:
+            return limits.read_body(stream.read, length)
+        return stream.read(length)
+    if environ.get("wsgi.input_terminated"):
+        if limits is not None:
+            return limits.read_body(stream.read, None)
+        return stream.read()
+    return b""
+
+
+def _plain_response(
+    status: int, headers: dict[str, str] | None = None
+) -> TransportResponse:
+    return TransportResponse(
+        HTTPStatus(status).phrase.encode(),
+        status,
+        {"Content-Type": "text/plain; charset=utf-8", **(headers or {})},
+    )
+
+
+class WSGIVerLib:
+    # A bare WSGI application serving a VerLib, with no framework
+    # dependency. It only answers requests under `lib_url`; an empty
+    # `lib_url` serves the library at the root of wherever it is mounted.
+    def __init__(
+        self,
+        verlib: VerLib,
+        lib_url="/verlib",
+        *,
+        codec: Codec = json_codec,
+        compression: Compression | None = None,
+        limits: RequestLimits | None = None,
+    ):
+        self._verlib: VerLib = verlib
+        self.lib_url = lib_url.rstrip("/")
+        self.codec = codec
+        self.compression = compression
+        self.limits = limits
+
+    def __call__(
+        self, environ: dict[str, Any], start_response: StartResponse
+    ) -> Iterable[bytes]:
+        path = environ.get("PATH_INFO", "").rstrip("/")
+        method = environ.get("REQUEST_METHOD", "GET")
+        http_headers = HttpHeaders.from_wsgi(environ)
+
+        if path == self.lib_url:
+            if method != "POST":
+                return self._respond(
+                    start_response,
+                    _plain_response(405, {"Allow": "POST"}),
+                )
+            try:
+                body = _read_body(environ, self.limits)
+            except LimitExceeded as exc:
+                result = transport.limit_exceeded(exc, self.codec)
+            else:
+                result = transport.dispatch(
+                    self._verlib,
+                    body,
+                    http_headers,
+                    self.codec,
+                    limits=self.limits,
+                )
+        elif path == f"{self.lib_url}/import":
+            if method != "GET":
+                return self._respond(
+                    start_response,
+                    _plain_response(405, {"Allow": "GET"}),
+                )
+            result = transport.describe(self._verlib, http_headers)
+        elif path.startswith(f"{self.lib_url}/call/"):
+            if method != "GET":
+                return self._respond(
+                    start_response,
+                    _plain_response(405, {"Allow": "GET"}),
+                )
+            result = transport.dispatch_read(
+                self._verlib,
+                path[len(self.lib_url) + 6 :],
+                environ.get("QUERY_STRING", ""),
+                http_headers,
+                self.codec,
+            )
+        else:
+            result = _plain_response(404)
+
+        if self.compression is not None:
+            result = self.compression.apply(
+                result, http_headers.get("Accept-Encoding")
+            )
+        return self._respond(start_response, result)
+
+    def _respond(
+        self, start_response: StartResponse, result: TransportResponse
+    ) -> Iterable[bytes]:
+        headers = [*result.headers.items()]
+        headers.append(("Content-Length", str(len(result.body))))
+        start_response(_status_line(result.status), headers)
+        return [result.body]
@@ -1,14 +1,24 @@
 from __future__ import annotations
-import dataclasses
 import abc
 from dataclasses import dataclass
-from typing import Literal, Any, TypeVar, Generic, cast, Mapping, Sequence
+from typing import (
+    TYPE_CHECKING,
+    Literal,
+    Any,
+    TypeVar,
+    Generic,
+    cast,
+    Mapping,
+    Sequence,
+)
 from enum import Enum, IntEnum
+import functools
 import json
-from schema import Schema, And, Or, Optional
 from typing_extensions import Self
 from utils.result import Result, Ok, Err
 
+if TYPE_CHECKING:
+    from schema import Schema
 
 JSONValues = (
     int
@@ -27,21 +37,35 @@ V = TypeVar("V")
 
 E = TypeVar("E")
 
-values_schema = Schema(Or(int, str, float, list, dict, lambda x: x is None))
-
-request_schema = Schema(
-    {
-        "jsonrpc": "2.0",
-        Optional("id"): Or(int, str, lambda x: x is None),
-        "method": str,
-        Optional("params"): Or(
-            {str: values_schema}, And([values_schema], lambda l: len(l) > 0)
-        ),
-    }
-)
+
+@functools.cache
+def _schemas() -> dict[str, Schema]:
+    # `schema` is only imported once the first request is validated
+    from schema import Schema, And, Or, Optional
+
+    values_schema = Schema(Or(int, str, float, list, dict, lambda x: x is None))
+    request_schema = Schema(
+        {
+            "jsonrpc": "2.0",
+            Optional("id"): Or(int, str, lambda x: x is None),
+            "method": str,
+            Optional("params"): Or(
+                {str: values_schema},
+                And([values_schema], lambda l: len(l) > 0),
+            ),
+        }
+    )
+    return {"values_schema": values_schema, "request_schema": request_schema}
 
 
-@dataclass(kw_only=True)
+def __getattr__(name: str) -> Any:
+    # Keeps `values_schema` and `request_schema` importable from here
+    if name not in ("values_schema", "request_schema"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return _schemas()[name]
+
+
+@dataclass(kw_only=True, slots=True)
 class Request:
     jsonrpc: Literal["2.0"] = "2.0"
     method: str
@@ -52,6 +76,7 @@ class Request:
     def __init__(
         self, *, method: str, id: JSONRPCId = None, params: JSONRPCParams = None
     ):
+        self.jsonrpc = "2.0"
         self.method = method
         self.id = id
         self.params = params
@@ -59,7 +84,7 @@ class Request:
 
     @classmethod
     def from_dict(cls, req_dict: dict[str, Any]) -> Self:
-        request_schema.validate(req_dict)
+        _schemas()["request_schema"].validate(req_dict)
         req_dict.pop("jsonrpc", None)
         return cls(**req_dict)
 
@@ -80,14 +105,22 @@ class ErrorMsg(Enum):
         return self.value.format(*args, **kwargs)
 
 
-@dataclass
+@dataclass(slots=True)
 class Error(Generic[E]):
     code: ErrorCode | int
     message: str
     data: E
 
+    def to_dict(self) -> dict[str, JSONValues]:
+        # The data of the errors sent to clients is JSON
+        return {
+            "code": self.code,
+            "message": self.message,
+            "data": cast(JSONValues, self.data),
+        }
 
-@dataclass
+
+@dataclass(slots=True)
 class OkRes(Generic[V]):
     id: JSONRPCId
     result: V
@@ -96,6 +129,7 @@ class OkRes(Generic[V]):
     def __init__(self, id: JSONRPCId, result: V):
         self.id = id
         self.result = result
+        self.jsonrpc = "2.0"
 
     def err_data(self) -> None:
         return None
@@ -110,10 +144,14 @@ class OkRes(Generic[V]):
         return True
 
     def to_dict(self) -> dict[str, JSONValues]:
-        return dataclasses.asdict(self)
+        return {
+            "id": self.id,
+            "result": cast(JSONValues, self.result),
+            "jsonrpc": self.jsonrpc,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class ErrRes(Generic[E]):
     id: JSONRPCId
     error: Error[E]
@@ -124,6 +162,7 @@ class ErrRes(Generic[E]):
         if error.code in (ErrorCode.PARSE_ERROR, ErrorCode.INVALID_REQUEST):
             self.id = None
         self.error = error
+        self.jsonrpc = "2.0"
 
     def err_data(self) -> Error[E]:
         return self.error
@@ -138,26 +177,79 @@ class ErrRes(Generic[E]):
         return False
 
     def to_dict(self) -> dict[str, JSONValues]:
-        return dataclasses.asdict(self)
+        return {
+            "id": self.id,
+            "error": self.error.to_dict(),
+            "jsonrpc": self.jsonrpc,
+        }
 
 
 Response = OkRes[V] | ErrRes[E]
 
 
-def into_rpc_request(
-    req: str | dict[str, JSONValues]
-) -> Result[Request, Error[None]]:
+_request_keys = frozenset(("jsonrpc", "id", "method", "params"))
+
+
+def _is_value(value: Any) -> bool:
+    # The types of `values_schema`, where booleans are not numbers
+    return value is None or (
+        isinstance(value, (int, str, float, list, dict))
+        and not isinstance(value, bool)
+    )
+
 
+def is_valid_request(req: Any) -> bool:
+    # Checks what `request_schema` does, without building its validators on
+    # every request
+    if not isinstance(req, dict) or not _request_keys.issuperset(req):
+        return False
+    if req.get("jsonrpc") != "2.0" or not isinstance(req.get("method"), str):
+        return False
+    if "id" in req and not (
+        req["id"] is None
+        or (
+            isinstance(req["id"], (int, str))
+            and not isinstance(req["id"], bool)
+        )
+    ):
+        return False
+    if "params" not in req:
+        return True
+    params = req["params"]
+    if isinstance(params, dict):
+        return bool(params) and all(
+            isinstance(key, str) and _is_value(value)
+            for key, value in params.items()
+        )
+    if isinstance(params, list):
+        return bool(params) and all(_is_value(value) for value in params)
+    return False
+
+
+def parse_request(req: str | dict[str, JSONValues]) -> Request | Error[None]:
+    # `into_rpc_request` without the Result around it, for the dispatch path
     try:
         req_dict: dict[str, Any] = (
             req if isinstance(req, dict) else json.loads(req)
         )
-    except TypeError:
-        return Err(Error(ErrorCode.PARSE_ERROR, "Parse error", None))
+    except (TypeError, ValueError):
+        return Error(ErrorCode.PARSE_ERROR, "Parse error", None)
 
-    is_valid_req = request_schema.is_valid(req_dict)
+    if not is_valid_request(req_dict):
+        return Error(ErrorCode.INVALID_REQUEST, "Invalid Request", None)
 
-    if not is_valid_req:
-        return Err(Error(ErrorCode.INVALID_REQUEST, "Invalid Request", None))
+    # Already validated, so skip the validation in Request.from_dict
+    return Request(
+        method=req_dict["method"],
+        id=req_dict.get("id"),
+        params=req_dict.get("params"),
+    )
 
-    return Ok(Request.from_dict(req_dict))
+
+def into_rpc_request(
+    req: str | dict[str, JSONValues],
+) -> Result[Request, Error[None]]:
+    rpc_req = parse_request(req)
+    if isinstance(rpc_req, Error):
+        return Err(rpc_req)
+    return Ok(rpc_req)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import re
+from typing import Any, Callable
+
+# Structural characters that change the nesting depth or start a string
+_structural = re.compile(rb'[\[\]{}"]')
+# The rest of a string, up to (not including) its closing quote. A backslash
+# at the very end of a chunk is left for the next one.
+_string_body = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+
+_quote = ord('"')
+_opening = frozenset(b"[{")
+
+_chunk_size = 64 * 1024
+
+
+class LimitExceeded(ValueError):
+    def __init__(self, limit: str, maximum: int):
+        super().__init__(f"The request exceeds {limit}={maximum}")
+        self.limit = limit
+        self.maximum = maximum
+
+
+@dataclass(frozen=True)
+class RequestLimits:
+    # None disables a limit
+    max_body_size: int | None = 1024 * 1024
+    max_batch_length: int | None = 100
+    max_depth: int | None = 32
+
+    def scanner(self) -> BodyScanner:
+        return BodyScanner(self)
+
+    def read_body(
+        self, read: Callable[[int], bytes], content_length: int | None
+    ) -> bytes:
+        # Reads a body in chunks from a file-like `read`, failing as soon as
+        # a limit is crossed instead of buffering the whole body first. A
+        # None `content_length` reads until the end of the stream.
+        if (
+            content_length is not None
+            and self.max_body_size is not None
+            and content_length > self.max_body_size
+        ):
+            raise LimitExceeded("max_body_size", self.max_body_size)
+
+        scanner = self.scanner()
+        chunks: list[bytes] = []
+        remaining = content_length
+        while remaining is None or remaining > 0:
+            chunk = read(
+                _chunk_size
+                if remaining is None
+                else min(_chunk_size, remaining)
+            )
+            if not chunk:
+                break
+            scanner.feed(chunk)
+            chunks.append(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def check(self, body: bytes):
+        self.scanner().feed(body)
+
+    def check_batch(self, payload: Any):
+        if (
+            self.max_batch_length is not None
+            and isinstance(payload, list)
+            and len(payload) > self.max_batch_length
+        ):
+            raise LimitExceeded("max_batch_length", self.max_batch_length)
+
+
+class BodyScanner:
+    # Tracks the size and the nesting depth of a JSON body fed chunk by
+    # chunk, without parsing it. Only structural characters outside of
+    # strings are looked at, so the scan stays cheap for large params
+    # arrays. Malformed JSON is left for the decoder to reject.
+    __slots__ = ("limits", "size", "depth", "_in_string", "_escape")
+
+    def __init__(self, limits: RequestLimits):
+        self.limits = limits
+        self.size = 0
+        self.depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: bytes):
+        limits = self.limits
+        self.size += len(chunk)
+        if (
+            limits.max_body_size is not None
+            and self.size > limits.max_body_size
+        ):
+            raise LimitExceeded("max_body_size", limits.max_body_size)
+
+        max_depth = limits.max_depth
+        end = len(chunk)
+        pos = 0
+        if self._escape and end > 0:
+            # The escaped character of a backslash that ended the last chunk
+            self._escape = False
+            pos = 1
+
+        while pos < end:
+            if self._in_string:
+                rest = _string_body.match(chunk, pos)
+                pos = rest.end() if rest is not None else pos
+                if pos >= end:
+                    return
+                if chunk[pos] != _quote:
+                    self._escape = True
+                    return
+                self._in_string = False
+                pos += 1
+                continue
+
+            match = _structural.search(chunk, pos)
+            if match is None:
+                return
+            pos = match.end()
+            char = chunk[pos - 1]
+            if char == _quote:
+                self._in_string = True
+            elif char in _opening:
+                self.depth += 1
+                if max_depth is not None and self.depth > max_depth:
+                    raise LimitExceeded("max_depth", max_depth)
+            else:
+                self.depth -= 1
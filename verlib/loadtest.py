@@ -0,0 +1,410 @@
+# Load generator for VerLib endpoints, either over HTTP or in-process.
+#
+#   python -m verlib.loadtest --url http://localhost:5000/verlib \
+#       --templates templates.json --rate 500 --duration 30
+#   python -m verlib.loadtest --lib myapp.rpc:verlib \
+#       --templates templates.json --concurrency 16 --json report.json
+#
+# The procedures to call are read from the import_lib description. The
+# templates file maps method names to the params of each call, where string
+# values of the form ${...} are generated for every call:
+#
+#   ${seq}            the number of the call
+#   ${int:LO:HI}      a random integer between LO and HI, inclusive
+#   ${float:LO:HI}    a random float between LO and HI
+#   ${choice:a|b|c}   one of the given strings
+#
+# e.g. {"add": ["${int:0:100}", 1], "users.get": {"id": "${seq}"}}.
+# Procedures without params are called even without a template.
+from __future__ import annotations
+import argparse
+from dataclasses import dataclass, field
+import http.client
+import importlib
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Protocol
+from verlib.client import HttpTransport
+from verlib.verlib import VerLib, VerLibDesc
+from verlib.jsonrpc import JSONValues, Request
+
+ParamsFactory = Callable[[int], JSONValues]
+
+PERCENTILES: tuple[tuple[str, float], ...] = (
+    ("p50", 50.0),
+    ("p90", 90.0),
+    ("p99", 99.0),
+    ("p999", 99.9),
+)
+
+
+def _compile_value(value: Any) -> Callable[[int], Any]:
+    if isinstance(value, list):
+        items = [_compile_value(item) for item in value]
+        return lambda seq: [item(seq) for item in items]
+    if isinstance(value, dict):
+        entries = [(key, _compile_value(item)) for key, item in value.items()]
+        return lambda seq: {key: item(seq) for key, item in entries}
+    if not (
+        isinstance(value, str) and value.startswith("${") and value[-1] == "}"
+    ):
+        return lambda seq: value
+
+    kind, _, args = value[2:-1].partition(":")
+    if kind == "seq":
+        return lambda seq: seq
+    if kind == "int":
+        low, high = (int(arg) for arg in args.split(":"))
+        return lambda seq: random.randint(low, high)
+    if kind == "float":
+        low_f, high_f = (float(arg) for arg in args.split(":"))
+        return lambda seq: random.uniform(low_f, high_f)
+    if kind == "choice":
+        choices = args.split("|")
+        return lambda seq: random.choice(choices)
+    raise ValueError(f"Unknown template placeholder '{value}'")
+
+
+def compile_template(template: JSONValues) -> ParamsFactory:
+    # The template is only walked once, calls just run the generators
+    return _compile_value(template)
+
+
+def method_names(description: VerLibDesc) -> list[str]:
+    return [
+        (
+            proc["name"]
+            if proc["module"] in (None, "_default_")
+            else f"{proc['module']}.{proc['name']}"
+        )
+        for proc in description
+    ]
+
+
+def build_calls(
+    description: VerLibDesc, templates: dict[str, JSONValues]
+) -> dict[str, ParamsFactory | None]:
+    # Procedures that take params but have no template can't be called
+    calls: dict[str, ParamsFactory | None] = {}
+    for proc, method in zip(description, method_names(description)):
+        if method in templates:
+            calls[method] = compile_template(templates[method])
+        elif proc["num_params"] == 0:
+            calls[method] = None
+    for method in templates:
+        if method not in calls:
+            raise ValueError(f"The procedure '{method}' is not in the lib")
+    return calls
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    # Nearest-rank percentile of already sorted samples
+    if not ordered:
+        return 0.0
+    rank = max(1, int(-(-pct * len(ordered) // 100)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Target(Protocol):
+    # Returns None on success or a description of the error
+    def call(self, method: str, params: JSONValues, id: int) -> str | None:
+        ...
+
+    def describe(self) -> VerLibDesc:
+        ...
+
+
+class InProcessTarget:
+    def __init__(self, verlib: VerLib):
+        self.verlib = verlib
+
+    def describe(self) -> VerLibDesc:
+        return self.verlib.describe().response.result
+
+    def call(self, method: str, params: JSONValues, id: int) -> str | None:
+        res = self.verlib.execute_rpc(
+            Request(method=method, id=id, params=params)  # type: ignore
+        )
+        error = res.err_data()
+        return None if error is None else f"rpc {int(error.code)}"
+
+
+class HttpTarget(HttpTransport):
+    # Keeps one connection per worker thread alive across calls
+    def __init__(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+        timeout: float = 30.0,
+    ):
+        super().__init__(url, headers, timeout)
+        self._path = self._path.rstrip("/") or "/"
+
+    def describe(self) -> VerLibDesc:
+        path = f"{self._path.rstrip('/')}/import"
+        status, body = self._request("GET", path, None)
+        if status != 200:
+            raise RuntimeError(f"GET {path} returned {status}")
+        return json.loads(body)["result"]
+
+    def call(self, method: str, params: JSONValues, id: int) -> str | None:
+        payload: dict[str, Any] = {"jsonrpc": "2.0", "id": id, "method": method}
+        if params is not None:
+            payload["params"] = params
+        try:
+            status, body = self._request(
+                "POST", self._path, json.dumps(payload).encode()
+            )
+        except (OSError, http.client.HTTPException) as exc:
+            return f"exception {type(exc).__name__}"
+        if status != 200:
+            return f"http {status}"
+        error = json.loads(body).get("error")
+        return None if error is None else f"rpc {error['code']}"
+
+
+@dataclass
+class LoadTestReport:
+    requests: int
+    duration: float
+    latencies: list[float] = field(repr=False)
+    errors: dict[str, int]
+    calls: dict[str, int]
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.duration if self.duration > 0 else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        ordered = sorted(self.latencies)
+        latency: dict[str, float] = {
+            name: percentile(ordered, pct) for name, pct in PERCENTILES
+        }
+        latency["mean"] = sum(ordered) / len(ordered) if ordered else 0.0
+        latency["max"] = ordered[-1] if ordered else 0.0
+        return {
+            "requests": self.requests,
+            "duration": self.duration,
+            "throughput": self.throughput,
+            "latency": latency,
+            "errors": dict(self.errors),
+            "calls": dict(self.calls),
+        }
+
+    def to_text(self) -> str:
+        report = self.to_dict()
+        lines = [
+            f"requests:   {self.requests}",
+            f"duration:   {self.duration:.2f} s",
+            f"throughput: {self.throughput:.1f} calls/s",
+            "latency:",
+        ]
+        for name, value in report["latency"].items():
+            lines.append(f"  {name:5} {value * 1e3:10.3f} ms")
+        error_count = sum(self.errors.values())
+        lines.append(f"errors:     {error_count}")
+        for error, count in sorted(self.errors.items(), key=lambda e: -e[1]):
+            lines.append(f"  {error}: {count}")
+        lines.append("calls:")
+        for method, count in sorted(self.calls.items()):
+            lines.append(f"  {method}: {count}")
+        return "\n".join(lines)
+
+
+class _Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: list[float] = []
+        self.errors: dict[str, int] = {}
+        self.calls: dict[str, int] = {}
+
+    def record(self, method: str, latency: float, error: str | None):
+        with self._lock:
+            self.latencies.append(latency)
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if error is not None:
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+
+class LoadTest:
+    # Drives `target` with the calls of `calls`, picked at random, either
+    # with `concurrency` workers calling back to back (closed loop) or at a
+    # fixed `rate` of calls per second (open loop). In the latter case the
+    # latency counts from when a call was due, so a stalled target cannot
+    # hide its queueing delay.
+    def __init__(
+        self,
+        target: Target,
+        calls: dict[str, ParamsFactory | None],
+        *,
+        concurrency: int = 1,
+        rate: float | None = None,
+        duration: float | None = 10.0,
+        requests: int | None = None,
+    ):
+        if not calls:
+            raise ValueError("There are no procedures to call")
+        if duration is None and requests is None:
+            raise ValueError("Either duration or requests must be given")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+        self.target = target
+        self.calls = list(calls.items())
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.requests = requests
+
+    def _sequence(self, started: float) -> Iterator[int]:
+        for seq in (
+            itertools.count() if self.requests is None else range(self.requests)
+        ):
+            if (
+                self.duration is not None
+                and time.perf_counter() - started >= self.duration
+            ):
+                return
+            yield seq
+
+    def _call(self, recorder: _Recorder, seq: int, due: float):
+        method, factory = random.choice(self.calls)
+        params = factory(seq) if factory is not None else None
+        try:
+            error = self.target.call(method, params, seq)
+        except Exception as exc:
+            error = f"exception {type(exc).__name__}"
+        recorder.record(method, time.perf_counter() - due, error)
+
+    def run(self) -> LoadTestReport:
+        recorder = _Recorder()
+        started = time.perf_counter()
+        if self.rate is None:
+            self._run_closed_loop(recorder, started)
+        else:
+            self._run_open_loop(recorder, started, self.rate)
+        duration = time.perf_counter() - started
+        return LoadTestReport(
+            len(recorder.latencies),
+            duration,
+            recorder.latencies,
+            recorder.errors,
+            recorder.calls,
+        )
+
+    def _run_closed_loop(self, recorder: _Recorder, started: float):
+        sequence = self._sequence(started)
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    seq = next(sequence, None)
+                if seq is None:
+                    return
+                self._call(recorder, seq, time.perf_counter())
+
+        threads = [
+            threading.Thread(target=worker, daemon=True)
+            for _ in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _run_open_loop(self, recorder: _Recorder, started: float, rate: float):
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for seq in self._sequence(started):
+                due = started + seq / rate
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._call, recorder, seq, due)
+
+
+def load_verlib(import_path: str) -> VerLib:
+    module_path, _, attr = import_path.partition(":")
+    verlib = getattr(importlib.import_module(module_path), attr or "verlib")
+    if not isinstance(verlib, VerLib):
+        raise TypeError(f"'{import_path}' is not a VerLib")
+    return verlib
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m verlib.loadtest",
+        description="Load test a VerLib endpoint",
+    )
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument("--url", help="URL the lib is served at")
+    target_group.add_argument(
+        "--lib", help="in-process VerLib to call, as package.module:attr"
+    )
+    parser.add_argument("--templates", help="JSON file of params templates")
+    parser.add_argument("--rate", type=float, help="calls per second")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="workers calling back to back, or the most calls in flight "
+        "with --rate (default: 1, or 64 with --rate)",
+    )
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--requests", type=int, help="stop after N calls")
+    parser.add_argument(
+        "--header",
+        action="append",
+        default=[],
+        help="extra HTTP header, as Name:value",
+    )
+    parser.add_argument(
+        "--json", help="write the report as JSON to a file, or - for stdout"
+    )
+    args = parser.parse_args(argv)
+
+    target: Target
+    if args.url is not None:
+        headers = dict(
+            (name.strip(), value.strip())
+            for name, _, value in (h.partition(":") for h in args.header)
+        )
+        target = HttpTarget(args.url, headers)
+    else:
+        target = InProcessTarget(load_verlib(args.lib))
+
+    templates: dict[str, JSONValues] = {}
+    if args.templates is not None:
+        with open(args.templates) as templates_file:
+            templates = json.load(templates_file)
+
+    concurrency = args.concurrency or (64 if args.rate is not None else 1)
+    load_test = LoadTest(
+        target,
+        build_calls(target.describe(), templates),
+        concurrency=concurrency,
+        rate=args.rate,
+        duration=args.duration if args.requests is None else None,
+        requests=args.requests,
+    )
+    report = load_test.run()
+
+    if args.json == "-":
+        json.dump(report.to_dict(), sys.stdout, indent=2)
+        print()
+    else:
+        print(report.to_text())
+        if args.json is not None:
+            with open(args.json, "w") as report_file:
+                json.dump(report.to_dict(), report_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
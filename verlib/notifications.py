@@ -0,0 +1,155 @@
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class OverflowPolicy(Enum):
+    # Drop the notification being submitted
+    DROP_NEW = "drop_new"
+    # Drop the oldest queued notification to make room
+    DROP_OLDEST = "drop_oldest"
+    # Run the notification in the submitting thread, slowing the caller down
+    RUN_INLINE = "run_inline"
+
+
+@dataclass(frozen=True)
+class NotificationStats:
+    queue_depth: int
+    running: int
+    submitted: int
+    completed: int
+    failed: int
+    dropped: int
+
+
+class NotificationExecutor:
+    # Runs notifications on a bounded pool of background worker threads, so
+    # the transport can acknowledge them without waiting for the procedure.
+    # Workers are started on the first submission.
+    def __init__(
+        self,
+        workers: int = 4,
+        *,
+        max_queue: int = 1000,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_NEW,
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if max_queue < 1:
+            raise ValueError("max_queue must be at least 1")
+        self.workers = workers
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self._queue: deque[Callable[[], Any]] = deque()
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._shutdown = False
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._dropped = 0
+
+    @property
+    def stats(self) -> NotificationStats:
+        with self._cond:
+            return NotificationStats(
+                queue_depth=len(self._queue),
+                running=self._running,
+                submitted=self._submitted,
+                completed=self._completed,
+                failed=self._failed,
+                dropped=self._dropped,
+            )
+
+    def submit(self, task: Callable[[], Any]) -> bool:
+        # Returns False if the notification was dropped
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("The notification executor is shut down")
+            self._submitted += 1
+            if len(self._queue) < self.max_queue:
+                self._enqueue(task)
+                return True
+            if self.overflow == OverflowPolicy.DROP_NEW:
+                self._dropped += 1
+                return False
+            if self.overflow == OverflowPolicy.DROP_OLDEST:
+                self._queue.popleft()
+                self._dropped += 1
+                self._enqueue(task)
+                return True
+            self._running += 1
+
+        self._run(task)
+        return True
+
+    def _enqueue(self, task: Callable[[], Any]):
+        self._queue.append(task)
+        if len(self._threads) < self.workers:
+            self._start_worker()
+        self._cond.notify()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        # Waits until every queued notification has run, returns False
+        # on timeout
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._queue and self._running == 0, timeout
+            )
+
+    def shutdown(self, wait: bool = True, timeout: float | None = None):
+        if wait:
+            self.flush(timeout)
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for thread in self._threads:
+                thread.join(
+                    None
+                    if deadline is None
+                    else max(0.0, deadline - time.monotonic())
+                )
+
+    def _start_worker(self):
+        thread = threading.Thread(
+            target=self._work,
+            name=f"verlib-notifications-{len(self._threads)}",
+            daemon=True,
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._shutdown)
+                if not self._queue:
+                    return
+                task = self._queue.popleft()
+                self._running += 1
+            self._run(task)
+
+    def _run(self, task: Callable[[], Any]):
+        failed = False
+        try:
+            task()
+        except Exception:
+            failed = True
+            logger.exception("A notification raised an exception")
+        with self._cond:
+            self._running -= 1
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+            self._cond.notify_all()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import random
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Iterable, TypeVar
+
+if TYPE_CHECKING:
+    import cProfile
+    import pstats
+
+R = TypeVar("R")
+
+# pstats function key: (file name, line number, function name)
+FunctionKey = tuple[str, int, str]
+
+_profiler_disable: FunctionKey = (
+    "~",
+    0,
+    "<method 'disable' of '_lsprof.Profiler' objects>",
+)
+
+
+@dataclass(frozen=True)
+class ProcedureProfile:
+    method: str
+    calls: int
+    stats: pstats.Stats
+
+
+def _frame_name(key: FunctionKey) -> str:
+    file_name, line, name = key
+    if file_name == "~":
+        # Built-in functions, e.g. "<built-in method time.sleep>"
+        return name
+    return f"{name} ({file_name}:{line})"
+
+
+def collapse_stats(stats: pstats.Stats, prefix: str = "") -> list[str]:
+    # Turns the caller/callee graph of cProfile into collapsed stacks, one
+    # "frame;frame;frame <microseconds>" line per stack, as read by
+    # flamegraph.pl, speedscope or inferno. cProfile only records single
+    # caller edges, so the time of a function called from several places is
+    # split between them in proportion to the time spent through each.
+    entries: dict[FunctionKey, Any] = stats.stats  # type: ignore
+    callees: dict[FunctionKey, list[FunctionKey]] = {}
+    for key, (_, _, _, _, callers) in entries.items():
+        for caller in callers:
+            callees.setdefault(caller, []).append(key)
+
+    lines: dict[str, float] = {}
+
+    def walk(key: FunctionKey, stack: tuple[str, ...], share: float):
+        _, _, self_time, total_time, _ = entries[key]
+        if self_time * share > 0:
+            path = ";".join(stack)
+            lines[path] = lines.get(path, 0.0) + self_time * share
+        for callee in callees.get(key, ()):
+            callee_total = entries[callee][3]
+            # Time spent in the callee when called from `key`
+            edge_time = entries[callee][4][key][3]
+            name = _frame_name(callee)
+            if callee_total <= 0 or name in stack:
+                continue
+            walk(callee, (*stack, name), share * edge_time / callee_total)
+
+    roots = [
+        key
+        for key, entry in entries.items()
+        if not any(caller in entries for caller in entry[4])
+        # Stopping the profiler is recorded too
+        and key != _profiler_disable
+    ]
+    base = (prefix,) if prefix else ()
+    for root in roots:
+        walk(root, (*base, _frame_name(root)), 1.0)
+
+    return [
+        f"{path} {round(seconds * 1e6)}"
+        for path, seconds in sorted(lines.items())
+        if round(seconds * 1e6) > 0
+    ]
+
+
+class Profiler:
+    # Profiles a sample of the calls of a lib with cProfile, aggregating the
+    # stats per procedure. It can be started and stopped at runtime; while
+    # stopped, checking whether to profile a call is a single attribute read.
+    #
+    # Only one call is profiled at a time, as the interpreter only supports
+    # one active profiler. Calls that are picked while another one is being
+    # profiled are simply not profiled.
+    def __init__(self):
+        self.active = False
+        self.sample_rate = 1.0
+        self.methods: frozenset[str] | None = None
+        self._running = threading.Lock()
+        self._lock = threading.Lock()
+        self._profiles: dict[str, tuple[int, pstats.Stats]] = {}
+
+    def start(
+        self,
+        sample_rate: float = 1.0,
+        methods: Iterable[str] | None = None,
+    ):
+        # Profiles `sample_rate` (from 0 to 1) of the calls, only to the
+        # given `methods` if any
+        if not 0.0 < sample_rate <= 1.0:
+            raise ValueError("sample_rate must be in (0, 1]")
+        self.sample_rate = sample_rate
+        self.methods = frozenset(methods) if methods is not None else None
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    def reset(self):
+        with self._lock:
+            self._profiles = {}
+
+    def should_profile(self, method: str) -> bool:
+        if self.methods is not None and method not in self.methods:
+            return False
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def run(self, method: str, fn: Callable[..., R], *args: Any) -> R:
+        if not self._running.acquire(blocking=False):
+            return fn(*args)
+        # Only imported once profiling is started
+        import cProfile
+
+        try:
+            profile = cProfile.Profile()
+            try:
+                result = profile.runcall(fn, *args)
+            finally:
+                self._add(method, profile)
+        finally:
+            self._running.release()
+        return result
+
+    def _add(self, method: str, profile: cProfile.Profile):
+        import pstats
+
+        stats = pstats.Stats(profile)
+        with self._lock:
+            entry = self._profiles.get(method)
+            if entry is None:
+                self._profiles[method] = (1, stats)
+            else:
+                entry[1].add(stats)
+                self._profiles[method] = (entry[0] + 1, entry[1])
+
+    def results(self) -> dict[str, ProcedureProfile]:
+        with self._lock:
+            return {
+                method: ProcedureProfile(method, calls, stats)
+                for method, (calls, stats) in self._profiles.items()
+            }
+
+    def collapsed(self, method: str | None = None) -> str:
+        # Collapsed stacks of one procedure, or of all of them with the
+        # procedure as the root frame
+        lines: list[str] = []
+        with self._lock:
+            for name, (_, stats) in sorted(self._profiles.items()):
+                if method is None:
+                    lines.extend(collapse_stats(stats, name))
+                elif name == method:
+                    lines.extend(collapse_stats(stats))
+        return "\n".join(lines)
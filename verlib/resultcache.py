@@ -0,0 +1,24 @@
+from __future__ import annotations
+import hashlib
+import json
+from typing import Protocol
+from verlib.jsonrpc import JSONValues
+
+
+class ResultCache(Protocol):
+    # Where the results of procedures with a `cache_ttl` are kept. Keys and
+    # values are bytes, so the cache may live outside of the process.
+    # Implementations must be thread safe. verlib.sharedcache has one shared
+    # by the processes of a host, on platforms with mmap and fcntl.
+    def get(self, key: bytes) -> bytes | None:
+        ...
+
+    def set(self, key: bytes, value: bytes, ttl: float):
+        ...
+
+
+def result_key(method: str, params: JSONValues) -> bytes:
+    # The same call always gets the same key, whatever the order of its
+    # named params
+    call = json.dumps([method, params], sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(call.encode(), digest_size=16).digest()
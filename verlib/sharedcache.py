@@ -0,0 +1,147 @@
+from __future__ import annotations
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Iterator
+
+# magic, format version, number of sets, slots per set, slot size
+_file_header = struct.Struct("<4sIIII")
+_magic = b"VLRC"
+_version = 1
+_data_offset = 64
+# key digest, expiry and last use as unix time, value length
+_slot_header = struct.Struct("<16sddI")
+
+
+class SharedMemoryCache:
+    # A cache in a memory-mapped file, shared by every process that opens
+    # the same `path`, e.g. the workers of a server on one host. The file
+    # has a fixed size of about `max_bytes`, split in slots of `slot_size`
+    # bytes. Keys are hashed to a set of `ways` slots, and a full set evicts
+    # its least recently used entry. Values that do not fit in a slot are
+    # not cached.
+    #
+    # Only available where fcntl is, i.e. not on Windows. Each set is
+    # guarded by an fcntl lock on its byte range, so processes
+    # only contend when they use the same set, and by a thread lock, as
+    # fcntl locks do not exclude the threads of one process. Expiry uses the
+    # wall clock, which all processes share.
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        max_bytes: int = 64 * 1024 * 1024,
+        slot_size: int = 4096,
+        ways: int = 8,
+    ):
+        if slot_size <= _slot_header.size:
+            raise ValueError(f"slot_size must be over {_slot_header.size}")
+        if ways < 1:
+            raise ValueError("ways must be at least 1")
+        self.slot_size = slot_size
+        self.ways = ways
+        self.sets = max(1, max_bytes // (slot_size * ways))
+        self.max_value_size = slot_size - _slot_header.size
+        self._set_size = slot_size * ways
+        size = _data_offset + self.sets * self._set_size
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._init_file(size)
+            self._map = mmap.mmap(self._fd, size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+        self._locks = [threading.Lock() for _ in range(min(self.sets, 64))]
+
+    def _init_file(self, size: int):
+        header = _file_header.pack(
+            _magic, _version, self.sets, self.ways, self.slot_size
+        )
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, header, 0)
+            elif os.pread(self._fd, _file_header.size, 0) != header:
+                raise ValueError(
+                    "The cache file was created with another format or size"
+                )
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    @contextmanager
+    def _locked(self, index: int) -> Iterator[int]:
+        # Yields the offset of the set
+        offset = _data_offset + index * self._set_size
+        with self._locks[index % len(self._locks)]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self._set_size, offset)
+            try:
+                yield offset
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._set_size, offset)
+
+    def _digest(self, key: bytes) -> tuple[bytes, int]:
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        return (digest, int.from_bytes(digest[:8], "little") % self.sets)
+
+    def get(self, key: bytes) -> bytes | None:
+        digest, index = self._digest(key)
+        mm = self._map
+        now = time.time()
+        with self._locked(index) as offset:
+            for slot in range(offset, offset + self._set_size, self.slot_size):
+                slot_key, expires_at, _, length = _slot_header.unpack_from(
+                    mm, slot
+                )
+                if slot_key != digest:
+                    continue
+                if expires_at <= now:
+                    return None
+                _slot_header.pack_into(
+                    mm, slot, slot_key, expires_at, now, length
+                )
+                start = slot + _slot_header.size
+                return mm[start : start + length]
+        return None
+
+    def set(self, key: bytes, value: bytes, ttl: float):
+        if len(value) > self.max_value_size:
+            return
+        digest, index = self._digest(key)
+        mm = self._map
+        now = time.time()
+        with self._locked(index) as offset:
+            victim, victim_used = offset, float("inf")
+            for slot in range(offset, offset + self._set_size, self.slot_size):
+                slot_key, expires_at, last_used, _ = _slot_header.unpack_from(
+                    mm, slot
+                )
+                if slot_key == digest:
+                    victim = slot
+                    break
+                # Empty and expired slots are taken first
+                used = -1.0 if expires_at <= now else last_used
+                if used < victim_used:
+                    victim, victim_used = slot, used
+            start = victim + _slot_header.size
+            mm[start : start + len(value)] = value
+            _slot_header.pack_into(
+                mm, victim, digest, now + ttl, now, len(value)
+            )
+
+    def clear(self):
+        for index in range(self.sets):
+            with self._locked(index) as offset:
+                self._map[offset : offset + self._set_size] = bytes(
+                    self._set_size
+                )
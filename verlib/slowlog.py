@@ -0,0 +1,130 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import threading
+import time
+from typing import Any, Mapping
+from verlib.jsonrpc import JSONRPCId
+
+logger = logging.getLogger("verlib.slowcalls")
+
+
+class CallTiming:
+    # Splits the time of a call into consecutive phases. Each lap covers the
+    # time since the previous one, so the phases add up to the total.
+    __slots__ = ("started", "phases", "_last")
+
+    def __init__(self):
+        self.started = self._last = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    def lap(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return self._last - self.started
+
+
+@dataclass(frozen=True)
+class SlowCall:
+    method: str
+    id: JSONRPCId
+    # Size of the request body in bytes, None for in-process calls
+    params_size: int | None
+    total: float
+    phases: dict[str, float]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "method": self.method,
+            "id": self.id,
+            "params_size": self.params_size,
+            "total_ms": round(self.total * 1e3, 3),
+            "phases_ms": {
+                phase: round(seconds * 1e3, 3)
+                for phase, seconds in self.phases.items()
+            },
+        }
+
+
+class _Forward(logging.Handler):
+    # Hands the records over to the `verlib.slowcalls` logger, on the
+    # listener thread
+    def emit(self, record: logging.LogRecord):
+        logger.handle(record)
+
+
+class SlowCallLog:
+    # Logs the calls that take longer than `threshold` seconds (or the
+    # threshold of their method in `thresholds`) to the `verlib.slowcalls`
+    # logger, with the time spent in each phase. Records are put on a queue
+    # and emitted by a background thread, so slow log handlers never add to
+    # the latency of the calls.
+    #
+    # Each record carries the SlowCall in its `slow_call` attribute.
+    def __init__(
+        self,
+        threshold: float = 1.0,
+        *,
+        thresholds: Mapping[str, float] | None = None,
+    ):
+        self.threshold = threshold
+        self.thresholds = dict(thresholds or {})
+        self._queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        self._handler = QueueHandler(self._queue)
+        self._listener: QueueListener | None = None
+        self._lock = threading.Lock()
+
+    def threshold_for(self, method: str) -> float:
+        return self.thresholds.get(method, self.threshold)
+
+    def observe(
+        self,
+        method: str,
+        id: JSONRPCId,
+        timing: CallTiming,
+        params_size: int | None = None,
+    ):
+        if timing.total < self.threshold_for(method):
+            return
+        slow_call = SlowCall(
+            method, id, params_size, timing.total, dict(timing.phases)
+        )
+        if self._listener is None:
+            self._start()
+        record = logger.makeRecord(
+            logger.name,
+            logging.WARNING,
+            __file__,
+            0,
+            "Slow call to %s took %.1f ms: %s",
+            (
+                method,
+                slow_call.total * 1e3,
+                ", ".join(
+                    f"{phase}={seconds * 1e3:.1f}ms"
+                    for phase, seconds in slow_call.phases.items()
+                ),
+            ),
+            None,
+            extra={"slow_call": slow_call},
+        )
+        self._handler.handle(record)
+
+    def _start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = QueueListener(self._queue, _Forward())
+                self._listener.start()
+
+    def close(self):
+        # Emits the queued records and stops the background thread
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener = None
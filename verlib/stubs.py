@@ -0,0 +1,128 @@
+from __future__ import annotations
+import argparse
+import keyword
+import sys
+from verlib.client import StubClient, envelope_prefix
+from verlib.verlib import VerLibDesc, VerProcDesc
+
+HEADER = """\
+# Generated by `python -m verlib.stubs`, do not edit.
+from __future__ import annotations
+from verlib.client import StubClient, Transport
+from verlib.jsonrpc import JSONValues
+"""
+
+# Attributes of the generated clients that procedures cannot shadow
+_reserved = frozenset(dir(StubClient)) | {"_transport", "_ids", "_client"}
+
+
+def _identifier(name: str) -> str:
+    if not name.isidentifier() or name in _reserved:
+        raise ValueError(f"'{name}' cannot be used as a stub method name")
+    return f"{name}_" if keyword.iskeyword(name) else name
+
+
+def _class_name(module: str) -> str:
+    return "".join(part.capitalize() for part in module.split("_")) + "Module"
+
+
+def _method(proc: VerProcDesc, method: str, client: str) -> list[str]:
+    args = [f"arg{i}" for i in range(proc["num_params"])]
+    prefix = envelope_prefix(method, len(args) > 0)
+    params = f"[{', '.join(args)}]" if args else "None"
+    signature = ", ".join(["self", *(f"{arg}: JSONValues" for arg in args)])
+    return [
+        f"    def {_identifier(proc['name'])}({signature}) -> JSONValues:",
+        f"        return {client}._call(",
+        f"            {prefix!r},",
+        f"            {params},",
+        "        )",
+    ]
+
+
+def generate_client(description: VerLibDesc, class_name: str = "Client") -> str:
+    # Turns the description of a lib (VerLib.import_lib) into the source of
+    # a module with a StubClient subclass. Procedures of the default module
+    # are methods of the client, and those of other modules are methods of
+    # an attribute named after the module. The output only depends on the
+    # set of procedures, so it can be checked in and diffed.
+    modules: dict[str, list[VerProcDesc]] = {}
+    for proc in description:
+        module = proc["module"]
+        if module is None:
+            module = "_default_"
+        modules.setdefault(module, []).append(proc)
+    for procs in modules.values():
+        procs.sort(key=lambda proc: proc["name"])
+    default_procs = modules.pop("_default_", [])
+
+    names = [proc["name"] for proc in default_procs] + list(modules)
+    duplicate = next((name for name in names if names.count(name) > 1), None)
+    if duplicate is not None:
+        raise ValueError(f"'{duplicate}' is both a procedure and a module")
+
+    lines = [HEADER]
+    for module, procs in sorted(modules.items()):
+        lines += [
+            "",
+            f"class {_class_name(module)}:",
+            '    __slots__ = ("_client",)',
+            "",
+            "    def __init__(self, client: StubClient):",
+            "        self._client = client",
+        ]
+        for proc in procs:
+            method = f"{module}.{proc['name']}"
+            lines += ["", *_method(proc, method, "self._client")]
+        lines.append("")
+
+    lines += [
+        "",
+        f"class {class_name}(StubClient):",
+        "    def __init__(self, transport: Transport | str):",
+        "        super().__init__(transport)",
+    ]
+    for module in sorted(modules):
+        lines.append(
+            f"        self.{_identifier(module)} = {_class_name(module)}(self)"
+        )
+    for proc in default_procs:
+        lines += ["", *_method(proc, proc["name"], "self")]
+    lines.append("")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    from verlib.loadtest import HttpTarget, load_verlib
+
+    parser = argparse.ArgumentParser(
+        prog="python -m verlib.stubs",
+        description="Generate a typed client module for a VerLib",
+    )
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument("--url", help="URL the lib is served at")
+    source_group.add_argument(
+        "--lib", help="in-process VerLib, as package.module:attr"
+    )
+    parser.add_argument("--class-name", default="Client")
+    parser.add_argument(
+        "-o", "--output", help="file to write the module to (default: stdout)"
+    )
+    args = parser.parse_args(argv)
+
+    description = (
+        HttpTarget(args.url).describe()
+        if args.url is not None
+        else load_verlib(args.lib).describe().response.result
+    )
+    source = generate_client(description, args.class_name)
+    if args.output is None:
+        sys.stdout.write(source)
+    else:
+        with open(args.output, "w") as output:
+            output.write(source)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
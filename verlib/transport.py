@@ -0,0 +1,521 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+import hashlib
+import json
+import math
+from typing import Any, cast
+from urllib.parse import parse_qsl, quote, urlencode
+from verlib.verlib import VerLib, RunSync
+from verlib.call import HttpHeaders
+from verlib.codec import Codec, json_codec
+from verlib.idempotency import (
+    IdempotencyCache,
+    IdempotencyConflict,
+    StoredResponse,
+    fingerprint,
+)
+from verlib.limits import LimitExceeded, RequestLimits
+from verlib.slowlog import CallTiming, SlowCallLog
+from verlib.verliberr import ErrKind
+from verlib.jsonrpc import (
+    Error,
+    ErrorCode,
+    ErrRes,
+    JSONValues,
+    Request,
+    Response,
+    parse_request,
+)
+
+
+# What an HTTP integration has to send back, with the body already encoded
+@dataclass
+class TransportResponse:
+    body: bytes
+    status: int = 200
+    headers: dict[str, str] = field(default_factory=dict)
+    # Set when a call failed for a reason that may be gone on a retry, e.g.
+    # overload, so the response must not be replayed for its idempotency key
+    transient: bool = False
+
+
+# Errors that are worth retrying
+_transient_errors = (ErrKind.OVERLOADED, ErrKind.DEADLINE_EXCEEDED)
+
+
+def encode_response(
+    res: Response[JSONValues, Any], codec: Codec = json_codec
+) -> TransportResponse:
+    response = TransportResponse(
+        codec.encode(res.to_dict()),
+        headers={"Content-Type": codec.content_type},
+    )
+    error = res.err_data()
+    if error is None:
+        return response
+    if error.code == ErrKind.OVERLOADED:
+        response.status = 503
+        response.headers["Retry-After"] = str(
+            math.ceil(error.data["retry_after"])
+        )
+    response.transient = error.code in _transient_errors
+    return response
+
+
+def limit_exceeded(
+    exc: LimitExceeded, codec: Codec = json_codec
+) -> TransportResponse:
+    response = encode_response(
+        ErrRes(
+            None,
+            Error(
+                ErrorCode.INVALID_REQUEST,
+                "Invalid Request",
+                {"limit": exc.limit, "maximum": exc.maximum},
+            ),
+        ),
+        codec,
+    )
+    if exc.limit == "max_body_size":
+        response.status = 413
+    return response
+
+
+def _acknowledge_only(verlib: VerLib, req: Request) -> bool:
+    # Background notifications are answered right away with no body
+    return req.is_notification and verlib.notifications is not None
+
+
+def encode_batch_response(
+    responses: list[Response[JSONValues, Any]], codec: Codec = json_codec
+) -> TransportResponse:
+    # A batch made up only of notifications gets no response at all
+    if not responses:
+        return TransportResponse(b"", 204)
+    return TransportResponse(
+        codec.encode([res.to_dict() for res in responses]),
+        headers={"Content-Type": codec.content_type},
+        transient=any(
+            error is not None and error.code in _transient_errors
+            for error in (res.err_data() for res in responses)
+        ),
+    )
+
+
+def idempotency_conflict(
+    exc: IdempotencyConflict, codec: Codec = json_codec
+) -> TransportResponse:
+    response = encode_response(
+        ErrRes(
+            None,
+            Error(
+                ErrorCode.INVALID_REQUEST,
+                "Invalid Request",
+                {"idempotency": exc.reason},
+            ),
+        ),
+        codec,
+    )
+    response.status = exc.status
+    return response
+
+
+def _replayed(stored: StoredResponse) -> TransportResponse:
+    return TransportResponse(
+        stored.body,
+        stored.status,
+        {**dict(stored.headers), "Idempotent-Replayed": "true"},
+    )
+
+
+def _may_replay(
+    verlib: VerLib,
+    body: bytes,
+    http_headers: HttpHeaders,
+    codec: Codec,
+    limits: RequestLimits | None,
+) -> bool:
+    # Stored responses are only replayed to callers that may make every call
+    # of the request. Other callers get the request run as if it had no key,
+    # so they are answered with the authorization errors.
+    try:
+        rpc_req = _decode_request(body, codec, limits)
+    except LimitExceeded:
+        return True
+    reqs = rpc_req if isinstance(rpc_req, list) else [rpc_req]
+    return all(
+        verlib.is_authorized(req, http_headers)
+        for req in reqs
+        if isinstance(req, Request)
+    )
+
+
+def _to_store(
+    response: TransportResponse | None, digest: bytes
+) -> StoredResponse | None:
+    if response is None or response.transient or response.status >= 500:
+        return None
+    return StoredResponse(
+        digest, response.body, response.status, tuple(response.headers.items())
+    )
+
+
+# An idempotent request, i.e. one that came with a key on a lib that has an
+# idempotency cache
+@dataclass
+class _IdempotentRequest:
+    cache: IdempotencyCache
+    key: str
+    digest: bytes
+    # Set by `begin` when the request was run before
+    stored: StoredResponse | None = None
+
+    @classmethod
+    def of(
+        cls, verlib: VerLib, body: bytes, http_headers: HttpHeaders
+    ) -> _IdempotentRequest | None:
+        cache = verlib.idempotency
+        if cache is None:
+            return None
+        key = http_headers.get(cache.header)
+        if key is None:
+            return None
+        digest = fingerprint(body, [http_headers.get(h) for h in cache.vary])
+        return cls(cache, key, digest)
+
+    def begin(self, timeout: float | None = None):
+        self.stored = self.cache.begin(self.key, self.digest, timeout=timeout)
+
+    async def begin_async(self):
+        try:
+            self.begin(timeout=0.0)
+        except IdempotencyConflict as exc:
+            if exc.reason != "in_progress":
+                raise
+            import asyncio
+
+            # Waits for the running request off the event loop
+            await asyncio.to_thread(self.begin)
+
+    def replay(
+        self,
+        verlib: VerLib,
+        body: bytes,
+        http_headers: HttpHeaders,
+        codec: Codec,
+        limits: RequestLimits | None,
+    ) -> TransportResponse | None:
+        # The stored response, or None if the request has to be run: either it
+        # was not run before, or the caller may not see its response
+        if self.stored is None or not _may_replay(
+            verlib, body, http_headers, codec, limits
+        ):
+            return None
+        return _replayed(self.stored)
+
+    def finish(self, response: TransportResponse | None):
+        # Only the request that was not run before holds the key
+        if self.stored is None:
+            self.cache.finish(self.key, _to_store(response, self.digest))
+
+
+def _batch_responses(
+    decoded: list[Request | Response[JSONValues, Any]],
+    results: list[Response[JSONValues, JSONValues]],
+) -> list[Response[JSONValues, Any]]:
+    # Puts the results of the valid requests back in between the errors of
+    # the invalid ones, leaving out notifications
+    executed = iter(results)
+    responses: list[Response[JSONValues, Any]] = []
+    for item in decoded:
+        if not isinstance(item, Request):
+            responses.append(item)
+            continue
+        res = next(executed)
+        if not item.is_notification:
+            responses.append(res)
+    return responses
+
+
+def dispatch(
+    verlib: VerLib,
+    body: bytes,
+    http_headers: HttpHeaders,
+    codec: Codec = json_codec,
+    *,
+    limits: RequestLimits | None = None,
+) -> TransportResponse:
+    # The body is decoded exactly once and the response encoded exactly once.
+    # The body size and depth `limits` are expected to be enforced while
+    # reading the body (RequestLimits.read_body), only the batch length is
+    # checked here.
+    #
+    # With an idempotency cache on the lib, requests with a key are run once
+    # and their retries are answered with the same encoded response.
+    idempotent = _IdempotentRequest.of(verlib, body, http_headers)
+    if idempotent is None:
+        return _dispatch(verlib, body, http_headers, codec, limits)
+    try:
+        idempotent.begin()
+    except IdempotencyConflict as exc:
+        return idempotency_conflict(exc, codec)
+    replayed = idempotent.replay(verlib, body, http_headers, codec, limits)
+    if replayed is not None:
+        return replayed
+
+    response: TransportResponse | None = None
+    try:
+        response = _dispatch(verlib, body, http_headers, codec, limits)
+        return response
+    finally:
+        idempotent.finish(response)
+
+
+def _dispatch(
+    verlib: VerLib,
+    body: bytes,
+    http_headers: HttpHeaders,
+    codec: Codec,
+    limits: RequestLimits | None,
+) -> TransportResponse:
+    timing = CallTiming() if verlib.slow_calls is not None else None
+    try:
+        rpc_req = _decode_request(body, codec, limits)
+    except LimitExceeded as exc:
+        return limit_exceeded(exc, codec)
+    if isinstance(rpc_req, list):
+        reqs = [item for item in rpc_req if isinstance(item, Request)]
+        return encode_batch_response(
+            _batch_responses(rpc_req, verlib.execute_batch(reqs, http_headers)),
+            codec,
+        )
+    if not isinstance(rpc_req, Request):
+        return encode_response(rpc_req, codec)
+    if timing is not None:
+        timing.lap("parse")
+
+    res = verlib.execute_rpc(rpc_req, http_headers, timing=timing)
+    response = (
+        TransportResponse(b"", 204)
+        if _acknowledge_only(verlib, rpc_req)
+        else encode_response(res, codec)
+    )
+    if timing is not None:
+        _observe(verlib, rpc_req, timing, len(body))
+    return response
+
+
+async def dispatch_async(
+    verlib: VerLib,
+    body: bytes,
+    http_headers: HttpHeaders,
+    codec: Codec = json_codec,
+    *,
+    run_sync: RunSync | None = None,
+    limits: RequestLimits | None = None,
+) -> TransportResponse:
+    idempotent = _IdempotentRequest.of(verlib, body, http_headers)
+    if idempotent is None:
+        return await _dispatch_async(
+            verlib, body, http_headers, codec, run_sync, limits
+        )
+    try:
+        await idempotent.begin_async()
+    except IdempotencyConflict as exc:
+        return idempotency_conflict(exc, codec)
+    replayed = idempotent.replay(verlib, body, http_headers, codec, limits)
+    if replayed is not None:
+        return replayed
+
+    response: TransportResponse | None = None
+    try:
+        response = await _dispatch_async(
+            verlib, body, http_headers, codec, run_sync, limits
+        )
+        return response
+    finally:
+        idempotent.finish(response)
+
+
+async def _dispatch_async(
+    verlib: VerLib,
+    body: bytes,
+    http_headers: HttpHeaders,
+    codec: Codec,
+    run_sync: RunSync | None,
+    limits: RequestLimits | None,
+) -> TransportResponse:
+    timing = CallTiming() if verlib.slow_calls is not None else None
+    try:
+        rpc_req = _decode_request(body, codec, limits)
+    except LimitExceeded as exc:
+        return limit_exceeded(exc, codec)
+    if isinstance(rpc_req, list):
+        reqs = [item for item in rpc_req if isinstance(item, Request)]
+        results = await verlib.execute_batch_async(
+            reqs, http_headers, run_sync=run_sync
+        )
+        return encode_batch_response(_batch_responses(rpc_req, results), codec)
+    if not isinstance(rpc_req, Request):
+        return encode_response(rpc_req, codec)
+    if timing is not None:
+        timing.lap("parse")
+
+    res = await verlib.execute_rpc_async(
+        rpc_req, http_headers, run_sync=run_sync, timing=timing
+    )
+    response = (
+        TransportResponse(b"", 204)
+        if _acknowledge_only(verlib, rpc_req)
+        else encode_response(res, codec)
+    )
+    if timing is not None:
+        _observe(verlib, rpc_req, timing, len(body))
+    return response
+
+
+def _observe(verlib: VerLib, req: Request, timing: CallTiming, size: int):
+    timing.lap("serialize")
+    cast(SlowCallLog, verlib.slow_calls).observe(
+        req.method, req.id, timing, size
+    )
+
+
+def canonical_query(params: dict[str, JSONValues]) -> str:
+    # The query string of a GET call: parameters sorted by name, values as
+    # compact JSON, so every client builds the same URL for the same call
+    return urlencode(
+        [
+            (
+                name,
+                json.dumps(
+                    value,
+                    separators=(",", ":"),
+                    sort_keys=True,
+                    ensure_ascii=False,
+                ),
+            )
+            for name, value in sorted(params.items())
+        ],
+        quote_via=quote,
+    )
+
+
+def _parse_query(query_string: str) -> dict[str, JSONValues] | None:
+    params: dict[str, JSONValues] = {}
+    try:
+        for name, value in parse_qsl(
+            query_string, keep_blank_values=True, strict_parsing=True
+        ):
+            if name in params:
+                return None
+            params[name] = json.loads(value)
+    except ValueError:
+        return None
+    return params
+
+
+def dispatch_read(
+    verlib: VerLib,
+    method: str,
+    query_string: str,
+    http_headers: HttpHeaders,
+    codec: Codec = json_codec,
+) -> TransportResponse:
+    # Calls a read procedure over GET. Successful responses can be stored by
+    # HTTP caches and are revalidated through the ETag of their body.
+    cache_control = verlib.cache_control(method)
+    if cache_control is None:
+        return TransportResponse(
+            b"Method Not Allowed",
+            405,
+            {
+                "Content-Type": "text/plain; charset=utf-8",
+                "Allow": "POST",
+                "Cache-Control": "no-store",
+            },
+        )
+
+    params = _parse_query(query_string) if query_string else {}
+    if params is None:
+        response = encode_response(
+            ErrRes(
+                None, Error(ErrorCode.INVALID_REQUEST, "Invalid Request", None)
+            ),
+            codec,
+        )
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    # There is no request id to echo over GET, so like the import endpoint
+    # the response has a null id
+    res = verlib.execute_rpc(
+        Request(method=method, id=0, params=params or None), http_headers
+    )
+    res.id = None
+    response = encode_response(res, codec)
+    if res.is_err():
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    etag = hashlib.blake2b(response.body, digest_size=16).hexdigest()
+    headers = {"Cache-Control": cache_control, "ETag": f'"{etag}"'}
+    if etag_matches(http_headers.get("If-None-Match"), etag):
+        return TransportResponse(b"", 304, headers)
+    response.headers.update(headers)
+    return response
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate.strip('"') == etag:
+            return True
+    return False
+
+
+def describe(verlib: VerLib, http_headers: HttpHeaders) -> TransportResponse:
+    description = verlib.describe()
+    headers = {"ETag": f'"{description.etag}"'}
+    if etag_matches(http_headers.get("If-None-Match"), description.etag):
+        return TransportResponse(b"", 304, headers)
+    headers["Content-Type"] = "application/json"
+    return TransportResponse(description.body, headers=headers)
+
+
+def _decode_request(
+    body: bytes, codec: Codec, limits: RequestLimits | None = None
+) -> (
+    Request
+    | Response[JSONValues, Any]
+    | list[Request | Response[JSONValues, Any]]
+):
+    try:
+        payload = codec.decode(body)
+    # Deeply nested bodies exhaust the recursion limit of the decoder
+    except (ValueError, RecursionError):
+        return ErrRes(None, Error(ErrorCode.PARSE_ERROR, "Parse error", None))
+
+    if limits is not None:
+        limits.check_batch(payload)
+
+    # Each request of a batch is validated on its own
+    if isinstance(payload, list) and payload:
+        return [_into_request(item) for item in payload]
+    return _into_request(payload)
+
+
+def _into_request(payload: Any) -> Request | Response[JSONValues, Any]:
+    if not isinstance(payload, dict):
+        return ErrRes(
+            None, Error(ErrorCode.INVALID_REQUEST, "Invalid Request", None)
+        )
+
+    rpc_req = parse_request(payload)
+    if isinstance(rpc_req, Error):
+        return ErrRes(payload.get("id"), rpc_req)
+    return rpc_req
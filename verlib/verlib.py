@@ -1,6 +1,13 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
+import functools
+import hashlib
+import importlib
 import inspect
+import json
+import threading
+from types import MappingProxyType
+import time
 from enum import Enum, IntEnum
 from inspect import Signature, BoundArguments, Parameter
 from typing import (
@@ -8,7 +15,13 @@ from typing import (
     Callable,
     ParamSpec,
     TypeVar,
+    Any,
+    Awaitable,
+    Iterable,
+    Mapping,
+    Sequence,
     cast,
+    overload,
 )
 from verlib.verliberr import ErrKind, ErrMsg, VerLibErr
 from verlib.jsonrpc import (
@@ -22,11 +35,34 @@ from verlib.jsonrpc import (
     ErrRes,
 )
 from verlib.auth import AccessLevel
-from verlib.call import HttpHeaders, Context, ContextBuilder, AuthProvider
+from verlib.admission import (
+    ConcurrencyLimit,
+    acquire_all,
+    acquire_all_async,
+    release_all,
+)
+from verlib.deadline import Deadline, DeadlineHeader
+from verlib.notifications import NotificationExecutor
+from verlib.batching import BatchCollector, BatchFn, invoke_batch
+from verlib.errors import ErrorRegistry
+from verlib.arrays import TypedArray, typed_array_of
+from verlib.profiling import Profiler
+from verlib.slowlog import CallTiming, SlowCallLog
+from verlib.idempotency import IdempotencyCache
+from verlib.resultcache import ResultCache, result_key
+from verlib.call import (
+    HttpHeaders,
+    Context,
+    ContextBuilder,
+    AuthProvider,
+    PriorityClassifier,
+)
 from utils.result import Err, Ok, Result
 
 P = ParamSpec("P")
-T = TypeVar("T", bound=JSONValues)
+# Async procedures return an awaitable of the result
+T = TypeVar("T", bound=JSONValues | Awaitable[JSONValues])
+B = TypeVar("B", bound=BatchFn)
 
 
 VerProc = Callable[P, T]
@@ -43,24 +79,155 @@ class VerProcDesc(TypedDict):
 
 
 VerLibDesc = list[VerProcDesc]
+RunSync = Callable[[Callable[[], Any]], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class LibDescription:
+    response: OkRes[VerLibDesc]
+    # The response pre-serialized to JSON and its content hash
+    body: bytes
+    etag: str
+
+    @classmethod
+    def build(cls, desc: VerLibDesc) -> LibDescription:
+        response = OkRes(None, desc)
+        body = json.dumps(response.to_dict(), separators=(",", ":")).encode()
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        return cls(response, body, etag)
+
+
+# What the call path passes around instead of a Result: the value returned by
+# the procedure, or the error that stopped it
+CallOutcome = JSONValues | VerLibErr
+
+
+def _run_awaitable(
+    awaitable: Awaitable[Any], deadline: Deadline | None
+) -> CallOutcome:
+    # asyncio is only imported by libs with async procedures
+    import asyncio
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        # asyncio.run can't be nested in the loop of the caller
+        if inspect.iscoroutine(awaitable):
+            awaitable.close()
+        raise RuntimeError(
+            "Async procedures can't be run by execute_rpc from a running "
+            "event loop, await execute_rpc_async instead"
+        )
+
+    async def await_result():
+        return await asyncio.wait_for(
+            awaitable, deadline.remaining() if deadline else None
+        )
+
+    try:
+        return asyncio.run(await_result())
+    except asyncio.TimeoutError:
+        return VerLibErr(ErrKind.DEADLINE_EXCEEDED, ErrMsg.DEADLINE_EXCEEDED)
+    except Exception as exc:
+        return _raised(exc)
+
+
+def _signature_of(procedure: Callable[..., Any]) -> Signature:
+    # Annotations are resolved, so that array and context parameters are
+    # also found in modules with postponed annotations
+    try:
+        return inspect.signature(procedure, eval_str=True)
+    except Exception:
+        # e.g. names only imported for type checking
+        return inspect.signature(procedure)
+
+
+def _private_cache_control(policy: str) -> str:
+    # The policy restricted to the cache of the caller, as shared caches
+    # can't tell callers apart
+    shared = ("public", "private", "s-maxage", "proxy-revalidate")
+    directives = [
+        directive.strip()
+        for directive in policy.split(",")
+        if directive.strip()
+        and directive.split("=")[0].strip().lower() not in shared
+    ]
+    return ", ".join(["private", *directives])
+
+
+def _raised(exc: Exception) -> VerLibErr:
+    return VerLibErr(
+        ErrKind.PROCEDURE_RAISED_EXCEPTION,
+        ErrMsg.PROCEDURE_RAISED_EXCEPTION,
+        exc,
+    )
 
 
 @dataclass
 class VerProcedure:
     name: str
-    _fn: Callable[..., JSONValues]
+    _fn: Callable[..., JSONValues | Awaitable[JSONValues]]
     _signature: Signature
-    access_level: AccessLevel = AccessLevel.public
+    access_level: AccessLevel = field(
+        default_factory=lambda: AccessLevel.public
+    )
+    limit: ConcurrencyLimit | None = None
+    # Procedures with a Cache-Control policy are idempotent reads, which can
+    # also be called over GET and cached by HTTP caches
+    cache_control: str | None = None
+    # Seconds the results are kept in the result cache of the lib, if any
+    cache_ttl: float | None = None
+    # Scheduling class of the calls in limits that schedule by class
+    priority_class: str | None = None
+    _pos_params: tuple[Parameter, ...] = field(init=False, repr=False)
+    _requires_context: bool = field(init=False, repr=False)
+    # Typed array parameters by name, with their position
+    _array_params: dict[str, tuple[int, TypedArray]] = field(
+        init=False, repr=False
+    )
+    is_async: bool = field(init=False, repr=False)
 
-    def _get_num_params(self) -> int:
-        return len(
-            tuple(
-                filter(
-                    lambda p: p.kind == Parameter.POSITIONAL_OR_KEYWORD,
-                    self._signature.parameters.values(),
-                )
+    def __post_init__(self):
+        self._pos_params = tuple(
+            filter(
+                lambda p: p.kind == Parameter.POSITIONAL_OR_KEYWORD,
+                self._signature.parameters.values(),
             )
         )
+        # A procedure requires the request context if
+        # the last positional parameter is annotated with the Context type
+        self._requires_context = (
+            len(self._pos_params) > 0
+            and self._pos_params[-1].annotation == Context
+        )
+        if self.cache_ttl is not None and self._requires_context:
+            raise TypeError(
+                f"The procedure '{self.name}' takes the request context, so its results cannot be cached"
+            )
+        self._array_params = {}
+        for i, param in enumerate(self._pos_params):
+            typed_array = typed_array_of(param.annotation)
+            if typed_array is not None:
+                self._array_params[param.name] = (i, typed_array)
+        self.is_async = inspect.iscoroutinefunction(self._fn)
+
+    def _decode_arrays(self, pargs: list[Any], pkwargs: dict[str, Any]) -> bool:
+        # Returns False if an array argument cannot be decoded
+        try:
+            for name, (i, typed_array) in self._array_params.items():
+                if i < len(pargs):
+                    pargs[i] = typed_array.decode(pargs[i])
+                elif name in pkwargs:
+                    pkwargs[name] = typed_array.decode(pkwargs[name])
+        except (TypeError, ValueError, OverflowError):
+            return False
+        return True
+
+    def _get_num_params(self) -> int:
+        # The context is not sent by clients, so it is not counted
+        return len(self._pos_params) - int(self._requires_context)
 
     def get_proc_description(self, module: str) -> VerProcDesc:
         return {
@@ -74,48 +241,106 @@ class VerProcedure:
         args: list[JSONValues] | dict[str, JSONValues],
         context: Context,
     ) -> Result[JSONValues, VerLibErr]:
+        result = self._invoke(args, context)
+        return Err(result) if isinstance(result, VerLibErr) else Ok(result)
 
-        pos_params = tuple(
-            filter(
-                lambda p: p.kind == Parameter.POSITIONAL_OR_KEYWORD,
-                self._signature.parameters.values(),
-            )
-        )
+    def _invoke(
+        self,
+        args: list[JSONValues] | dict[str, JSONValues],
+        context: Context,
+    ) -> CallOutcome | Awaitable[JSONValues]:
 
-        # A procedure requires the request context if
-        # the last positional parameter is annotated with the Context type
-        proc_requires_context = (
-            len(pos_params) > 0 and pos_params[-1].annotation == Context
-        )
+        pos_params = self._pos_params
+        proc_requires_context = self._requires_context
 
         # Account for context when getting argument len
         args_len = len(args) + 1 if proc_requires_context else len(args)
 
         if args_len != len(pos_params):
-            return Err(VerLibErr(ErrKind.INVALID_PARAMS, ErrMsg.INVALID_PARAMS))
+            return VerLibErr(ErrKind.INVALID_PARAMS, ErrMsg.INVALID_PARAMS)
 
         pargs: list[JSONValues | Context] = []
         pkwargs: dict[str, JSONValues | Context] = {}
         match args:
             case list(pos_params):
-                pargs = cast(list[JSONValues | Context], pos_params)
+                pargs = cast("list[JSONValues | Context]", pos_params)
                 if proc_requires_context:
                     pargs.append(context)
 
             case dict(dict_params):
-                pkwargs = cast(dict[str, JSONValues | Context], dict_params)
+                pkwargs = cast("dict[str, JSONValues | Context]", dict_params)
                 if proc_requires_context:
                     ctx_param = pos_params[-1]
                     pkwargs[ctx_param.name] = context
 
+        if self._array_params:
+            # Copied so the params of the request are left untouched
+            pargs, pkwargs = list(pargs), dict(pkwargs)
+            if not self._decode_arrays(pargs, pkwargs):
+                return VerLibErr(ErrKind.INVALID_PARAMS, ErrMsg.INVALID_PARAMS)
+
         # TODO: Add type checking for parameters
         try:
             ba = self._signature.bind(*pargs, **pkwargs)
         except TypeError:
-            return Err(VerLibErr(ErrKind.INVALID_PARAMS, ErrMsg.INVALID_PARAMS))
+            return VerLibErr(ErrKind.INVALID_PARAMS, ErrMsg.INVALID_PARAMS)
+
+        # Exceptions are turned into errors by the ErrorRegistry of the lib
+        try:
+            return self._fn(*ba.args, **ba.kwargs)
+        except Exception as exc:
+            return _raised(exc)
+
+
+@dataclass
+class BatchedVerProcedure(VerProcedure):
+    # A procedure backed by a function that takes a list of argument sets,
+    # one tuple per call, and returns a list with one result per call.
+    # Calls from the same JSON-RPC batch, or made concurrently within
+    # `window` seconds, are merged into a single invocation.
+    window: float = 0.0
+    max_batch_size: int | None = None
+
+    def __post_init__(self):
+        super().__post_init__()
+        if self.is_async:
+            raise TypeError(
+                f"The batched procedure '{self.name}' must be synchronous"
+            )
+        self._collector = BatchCollector(
+            cast(BatchFn, self._fn), self.window, self.max_batch_size
+        )
+
+    def bind(
+        self, args: list[JSONValues] | dict[str, JSONValues]
+    ) -> tuple[JSONValues, ...] | None:
+        try:
+            ba = (
+                self._signature.bind(*args)
+                if isinstance(args, list)
+                else self._signature.bind(**args)
+            )
+        except TypeError:
+            return None
+        return ba.args
+
+    def _invoke(
+        self,
+        args: list[JSONValues] | dict[str, JSONValues],
+        context: Context,
+    ) -> CallOutcome:
+        bound = self.bind(args)
+        if bound is None:
+            return VerLibErr(ErrKind.INVALID_PARAMS, ErrMsg.INVALID_PARAMS)
+        try:
+            return self._collector.submit(bound)
+        except Exception as exc:
+            return _raised(exc)
 
-        # TODO: Decide on the best way to deal with exceptions
-        return Ok(self._fn(*ba.args, **ba.kwargs))
+    def call_many(
+        self, arg_sets: list[tuple[JSONValues, ...]]
+    ) -> Sequence[JSONValues]:
+        return invoke_batch(cast(BatchFn, self._fn), arg_sets)
 
 
 @dataclass
@@ -123,16 +348,44 @@ class VerModule:
     name: str
     _procedures: dict[str, VerProcedure]
     default_access_level: AccessLevel
+    limit: ConcurrencyLimit | None
+    priority_class: str | None
+    _listeners: list[Callable[[], None]]
+    _frozen: bool
 
-    def __init__(self, name: str, *, access_level=AccessLevel.public):
+    def __init__(
+        self,
+        name: str,
+        *,
+        access_level=AccessLevel.public,
+        limit: ConcurrencyLimit | None = None,
+        priority_class: str | None = None,
+    ):
         self.name = name
         self._procedures = {}
         self.default_access_level = access_level
+        self.limit = limit
+        # Default scheduling class of the procedures of the module
+        self.priority_class = priority_class
+        self._listeners = []
+        self._frozen = False
+
+    def _on_change(self, listener: Callable[[], None]):
+        self._listeners.append(listener)
+
+    def _check_not_frozen(self):
+        if self._frozen:
+            raise TypeError(
+                f"The module '{self.name}' belongs to a frozen library and can no longer be changed"
+            )
 
     def _register_proc(self, proc: VerProcedure):
+        self._check_not_frozen()
         self._procedures[proc.name] = proc
         proc._fn._vermodule = self.name
         proc._fn._verproc_name = proc.name
+        for listener in self._listeners:
+            listener()
 
     @property
     def module_description(self) -> VerLibDesc:
@@ -149,22 +402,96 @@ class VerModule:
         *,
         name: str = "",
         access_level: AccessLevel | None = None,
+        limit: ConcurrencyLimit | None = None,
+        cache_control: str | None = None,
+        cache_ttl: float | None = None,
+        priority_class: str | None = None,
     ) -> DecoratedVerProc[P, T]:
         def verproc_decorator(procedure: VerProc[P, T]) -> VerProc[P, T]:
-            proc_name = name if name != "" else procedure.__name__
-            if proc_name in self._procedures:
-                raise TypeError(
-                    f"A procedure with the name '{proc_name}' has already been registered to the module '{self.name}'"
+            proc_name = self._new_proc_name(name, procedure)
+            self._register_proc(
+                VerProcedure(
+                    proc_name,
+                    procedure,
+                    _signature_of(procedure),
+                    access_level
+                    if access_level is not None
+                    else self.default_access_level,
+                    limit,
+                    cache_control,
+                    cache_ttl,
+                    priority_class,
                 )
+            )
+            return procedure
 
+        if fn is None:
+            return verproc_decorator
+        else:
+            return verproc_decorator(fn)
+
+    @overload
+    def batch_verproc(
+        self,
+        fn: B,
+        *,
+        params: Sequence[str],
+        name: str = "",
+        access_level: AccessLevel | None = None,
+        limit: ConcurrencyLimit | None = None,
+        window: float = 0.0,
+        max_batch_size: int | None = None,
+        priority_class: str | None = None,
+    ) -> B:
+        ...
+
+    @overload
+    def batch_verproc(
+        self,
+        fn: None = None,
+        *,
+        params: Sequence[str],
+        name: str = "",
+        access_level: AccessLevel | None = None,
+        limit: ConcurrencyLimit | None = None,
+        window: float = 0.0,
+        max_batch_size: int | None = None,
+        priority_class: str | None = None,
+    ) -> Callable[[B], B]:
+        ...
+
+    def batch_verproc(
+        self,
+        fn: B | None = None,
+        *,
+        params: Sequence[str],
+        name: str = "",
+        access_level: AccessLevel | None = None,
+        limit: ConcurrencyLimit | None = None,
+        window: float = 0.0,
+        max_batch_size: int | None = None,
+        priority_class: str | None = None,
+    ) -> Callable[[B], B] | B:
+        # `params` names the parameters of a single call, in order
+        def verproc_decorator(procedure: B) -> B:
+            proc_name = self._new_proc_name(name, procedure)
             self._register_proc(
-                VerProcedure(
+                BatchedVerProcedure(
                     proc_name,
                     procedure,
-                    inspect.signature(procedure),
+                    Signature(
+                        [
+                            Parameter(param, Parameter.POSITIONAL_OR_KEYWORD)
+                            for param in params
+                        ]
+                    ),
                     access_level
                     if access_level is not None
                     else self.default_access_level,
+                    limit,
+                    priority_class=priority_class,
+                    window=window,
+                    max_batch_size=max_batch_size,
                 )
             )
             return procedure
@@ -174,6 +501,14 @@ class VerModule:
         else:
             return verproc_decorator(fn)
 
+    def _new_proc_name(self, name: str, procedure: Callable[..., Any]) -> str:
+        proc_name = name if name != "" else procedure.__name__
+        if proc_name in self._procedures:
+            raise TypeError(
+                f"A procedure with the name '{proc_name}' has already been registered to the module '{self.name}'"
+            )
+        return proc_name
+
     def access_level(
         self, fn: DecoratedVerProc[P, T], access_level: AccessLevel
     ) -> DecoratedVerProc[P, T]:
@@ -191,6 +526,7 @@ class VerModule:
                 f"Procedure '{proc_name}' is not registered to the module '{self.name}'"
             )
 
+        self._check_not_frozen()
         self._procedures[proc_name].access_level = access_level
         return fn
 
@@ -215,66 +551,382 @@ class VerModule:
             return False
         return access_level.clears(self._procedures[procedure].access_level)
 
+    def _get_limits(self, proc_name: str) -> list[ConcurrencyLimit]:
+        # Most specific limits first, so they shed calls before broader
+        # limits hand out their slots
+        limits = [self._procedures[proc_name].limit, self.limit]
+        return [limit for limit in limits if limit is not None]
+
+    def _get_priority_class(self, proc_name: str) -> str | None:
+        priority_class = self._procedures[proc_name].priority_class
+        if priority_class is not None:
+            return priority_class
+        return self.priority_class
+
     def _call_procedure(
         self,
         proc_name: str,
         params: list[JSONValues] | dict[str, JSONValues],
         context: Context,
-    ) -> Result[JSONValues, VerLibErr]:
-        return self._procedures[proc_name].call(params, context)
+    ) -> CallOutcome | Awaitable[JSONValues]:
+        return self._procedures[proc_name]._invoke(params, context)
+
+
+class LazyVerModule:
+    # Declares a module by import path ('package.module:attribute', or just
+    # 'package.module' to pick the VerModule with a matching name) together
+    # with its procedure names. The import happens on the first call to one
+    # of those procedures, or when the library is described or preloaded.
+    def __init__(self, name: str, import_path: str, procedures: Iterable[str]):
+        self.name = name
+        self.import_path = import_path
+        self._procedure_names = frozenset(procedures)
+        self._module: VerModule | None = None
+        self._lock = threading.Lock()
+        self._listeners: list[Callable[[], None]] = []
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    @property
+    def procedure_names(self) -> Iterable[str]:
+        return (
+            self._module._procedures if self._module else self._procedure_names
+        )
+
+    def _on_change(self, listener: Callable[[], None]):
+        self._listeners.append(listener)
+
+    def _contains_proc(self, name: str) -> bool:
+        return name in self._procedure_names
+
+    @property
+    def module_description(self) -> VerLibDesc:
+        return self.load().module_description
+
+    def load(self) -> VerModule:
+        module = self._module
+        if module is not None:
+            return module
+
+        with self._lock:
+            if self._module is None:
+                module = self._import_module()
+                for listener in self._listeners:
+                    module._on_change(listener)
+                self._module = module
+                for listener in self._listeners:
+                    listener()
+        return self._module
+
+    def _import_module(self) -> VerModule:
+        module_path, _, attr = self.import_path.partition(":")
+        imported = importlib.import_module(module_path)
+        if attr:
+            module = getattr(imported, attr, None)
+        else:
+            module = next(
+                (
+                    value
+                    for value in vars(imported).values()
+                    if isinstance(value, VerModule) and value.name == self.name
+                ),
+                None,
+            )
+
+        if not isinstance(module, VerModule):
+            raise TypeError(
+                f"'{self.import_path}' does not refer to a VerModule named '{self.name}'"
+            )
+        if module.name != self.name:
+            raise TypeError(
+                f"'{self.import_path}' refers to the module '{module.name}' instead of '{self.name}'"
+            )
+        if set(module._procedures) != self._procedure_names:
+            raise TypeError(
+                f"The procedures declared for the module '{self.name}' do not match the procedures registered in '{self.import_path}'"
+            )
+        return module
+
+
+# Maps fully qualified method names to the module and procedure name they
+# resolve to
+Registry = Mapping[str, tuple[VerModule | LazyVerModule, str]]
+
+
+@dataclass(slots=True)
+class _Call:
+    # A call in progress, as it goes through the steps shared by execute_rpc
+    # and execute_rpc_async
+    module: VerModule
+    proc_name: str
+    deadline: Deadline | None
+    limits: list[ConcurrencyLimit]
+    priority_class: str | None
+    # Built before admission if the priority classifier needs it
+    context: Context | None
+    params: list[JSONValues] | dict[str, JSONValues] = field(
+        default_factory=list
+    )
+    cache_key: bytes | None = None
+    started: float = 0.0
 
 
 @dataclass
 class VerLib:
     name: str
-    _modules: dict[str, VerModule]
+    _modules: dict[str, VerModule | LazyVerModule]
     _context_builder: ContextBuilder | None
     _auth_provider: AuthProvider | None
+    _priority_classifier: PriorityClassifier | None
+    limit: ConcurrencyLimit | None
+    deadline_header: DeadlineHeader | None
+    notifications: NotificationExecutor | None
+    errors: ErrorRegistry
+    profiler: Profiler
+    slow_calls: SlowCallLog | None
+    idempotency: IdempotencyCache | None
+    result_cache: ResultCache | None
 
-    def __init__(self, name: str):
+    def __init__(
+        self,
+        name: str,
+        *,
+        limit: ConcurrencyLimit | None = None,
+        deadline_header: DeadlineHeader | None = None,
+        preload: bool = False,
+        notifications: NotificationExecutor | None = None,
+        errors: ErrorRegistry | None = None,
+        slow_calls: SlowCallLog | None = None,
+        idempotency: IdempotencyCache | None = None,
+        result_cache: ResultCache | None = None,
+    ):
         self.name = name
         self._default_module: VerModule = VerModule("_default_")
         self._context_builder = None
         self._auth_provider = None
+        self._priority_classifier = None
         self._modules = {}
+        self.limit = limit
+        self.deadline_header = deadline_header
+        # Import lazily declared modules as soon as they are declared
+        self.preload = preload
+        # Runs notifications in the background instead of before the
+        # transport answers
+        self.notifications = notifications
+        # Maps the exceptions raised by procedures to JSON-RPC errors
+        self.errors = errors if errors is not None else ErrorRegistry()
+        # Started and stopped at runtime to profile a sample of the calls
+        self.profiler = Profiler()
+        # Calls are only timed per phase when there is a slow call log
+        self.slow_calls = slow_calls
+        # Replays the responses of requests retried with an idempotency key,
+        # applied by the transport
+        self.idempotency = idempotency
+        # Keeps the results of the procedures with a `cache_ttl`
+        self.result_cache = result_cache
+        self._version = 0
+        self._description: tuple[int, LibDescription] | None = None
+        self._registry: tuple[int, Registry] | None = None
+        self._lock = threading.Lock()
+        self._frozen = False
+        self._default_module._on_change(self._invalidate)
 
-    def declare_module(self, module: VerModule):
+    def _invalidate(self):
+        self._version += 1
+
+    def declare_module(self, module: VerModule | LazyVerModule):
         mod_name = module.name
-        if mod_name in self._modules:
+        if self._frozen:
             raise TypeError(
-                f"A module with the name '{mod_name}' has already been declared"
+                f"The library '{self.name}' is frozen and can no longer declare modules"
             )
-        self._modules[mod_name] = module
+        with self._lock:
+            if mod_name in self._modules:
+                raise TypeError(
+                    f"A module with the name '{mod_name}' has already been declared"
+                )
+            self._modules[mod_name] = module
+        module._on_change(self._invalidate)
+        self._invalidate()
+        if self.preload and isinstance(module, LazyVerModule):
+            module.load()
+
+    def preload_modules(self):
+        for module in self._modules.values():
+            if isinstance(module, LazyVerModule):
+                module.load()
+
+    def freeze(self):
+        # Compiles the registered modules into an immutable registry used for
+        # dispatch. Any later registration raises instead of racing with it.
+        self.preload_modules()
+        with self._lock:
+            self._frozen = True
+            modules = [self._default_module, *self._modules.values()]
+            for module in modules:
+                # Lazy modules are loaded by now, their VerModule is frozen
+                if isinstance(module, LazyVerModule):
+                    module = module.load()
+                module._frozen = True
+            # Built once more below, and never again
+            self._registry = None
+        self._get_registry()
+        self.describe()
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def _get_registry(self) -> Registry:
+        # Rebuilt only after a procedure or module has been registered and
+        # swapped in with a single assignment, so dispatch never sees a
+        # partially built registry
+        version = self._version
+        cached = self._registry
+        if cached is not None and (self._frozen or cached[0] == version):
+            return cached[1]
+
+        registry: dict[str, tuple[VerModule | LazyVerModule, str]] = {}
+        with self._lock:
+            for proc_name in tuple(self._default_module._procedures):
+                registry[proc_name] = (self._default_module, proc_name)
+            for mod_name, module in self._modules.items():
+                proc_names = (
+                    module.procedure_names
+                    if isinstance(module, LazyVerModule)
+                    else module._procedures
+                )
+                for proc_name in tuple(proc_names):
+                    registry[f"{mod_name}.{proc_name}"] = (module, proc_name)
+
+        frozen_registry = MappingProxyType(registry)
+        self._registry = (version, frozen_registry)
+        return frozen_registry
 
     def verproc(
-        self, fn: VerProc[P, T] | None = None, *, name: str = ""
+        self,
+        fn: VerProc[P, T] | None = None,
+        *,
+        name: str = "",
+        limit: ConcurrencyLimit | None = None,
+        cache_control: str | None = None,
+        cache_ttl: float | None = None,
+        priority_class: str | None = None,
     ) -> DecoratedVerProc[P, T]:
 
-        return self._default_module.verproc(fn, name=name)
+        return self._default_module.verproc(
+            fn,
+            name=name,
+            limit=limit,
+            cache_control=cache_control,
+            cache_ttl=cache_ttl,
+            priority_class=priority_class,
+        )
+
+    @overload
+    def batch_verproc(
+        self,
+        fn: B,
+        *,
+        params: Sequence[str],
+        name: str = "",
+        limit: ConcurrencyLimit | None = None,
+        window: float = 0.0,
+        max_batch_size: int | None = None,
+        priority_class: str | None = None,
+    ) -> B:
+        ...
+
+    @overload
+    def batch_verproc(
+        self,
+        fn: None = None,
+        *,
+        params: Sequence[str],
+        name: str = "",
+        limit: ConcurrencyLimit | None = None,
+        window: float = 0.0,
+        max_batch_size: int | None = None,
+        priority_class: str | None = None,
+    ) -> Callable[[B], B]:
+        ...
+
+    def batch_verproc(
+        self,
+        fn: B | None = None,
+        *,
+        params: Sequence[str],
+        name: str = "",
+        limit: ConcurrencyLimit | None = None,
+        window: float = 0.0,
+        max_batch_size: int | None = None,
+        priority_class: str | None = None,
+    ) -> Callable[[B], B] | B:
+        return self._default_module.batch_verproc(
+            fn,
+            params=params,
+            name=name,
+            limit=limit,
+            window=window,
+            max_batch_size=max_batch_size,
+            priority_class=priority_class,
+        )
 
     def _resolve_proc(self, name: str) -> tuple[VerModule | None, str]:
-        components = name.split(".")
-        if len(components) == 1:
-            return (self._default_module, components[0])
-        elif len(components) == 2:
-            return (
-                self._modules.get(components[0]),
-                components[1],
-            )
-        else:
+        entry = self._get_registry().get(name)
+        if entry is None:
             return (None, "")
+        module, proc_name = entry
+        # Lazy modules are only imported once one of their procedures is called
+        if isinstance(module, LazyVerModule):
+            module = module.load()
+        return (module, proc_name)
+
+    def cache_control(self, method: str) -> str | None:
+        # The Cache-Control policy of a read procedure, None if the procedure
+        # does not exist or is not a read
+        module, proc_name = self._resolve_proc(method)
+        if module is None or not module._contains_proc(proc_name):
+            return None
+        proc = module._procedures[proc_name]
+        if proc.cache_control is None or AccessLevel.public.clears(
+            proc.access_level
+        ):
+            return proc.cache_control
+        # The response depends on the credentials of the caller
+        return _private_cache_control(proc.cache_control)
+
+    def describe(self) -> LibDescription:
+        # Rebuilt only after a procedure or module has been registered
+        version = self._version
+        cached = self._description
+        if cached is not None and cached[0] == version:
+            return cached[1]
 
-    def import_lib(self) -> Response[VerLibDesc, None]:
         verlib_desc = self._default_module.module_description
         for module in self._modules.values():
-            verlib_desc = [*verlib_desc, *module.module_description]
+            verlib_desc.extend(module.module_description)
 
-        return OkRes(None, verlib_desc)
+        description = LibDescription.build(verlib_desc)
+        self._description = (version, description)
+        return description
+
+    def import_lib(self) -> Response[VerLibDesc, None]:
+        return self.describe().response
 
     def context_builder(self, f: ContextBuilder) -> ContextBuilder:
         self._context_builder = f
         return f
 
+    def priority_classifier(self, f: PriorityClassifier) -> PriorityClassifier:
+        # Picks the scheduling class of calls from their context (e.g. by
+        # tenant), returning None to keep the class of the procedure. The
+        # context is then built before admission instead of after it.
+        self._priority_classifier = f
+        return f
+
     def access_level(
         self, fn: DecoratedVerProc[P, T], access_level: AccessLevel
     ) -> DecoratedVerProc[P, T]:
@@ -294,9 +946,19 @@ class VerLib:
         self._auth_provider = f
         return f
 
-    def execute_rpc(
-        self, req: Request, http_headers: HttpHeaders = _empty_headers
-    ) -> Response[JSONValues, None]:
+    def is_authorized(self, req: Request, http_headers: HttpHeaders) -> bool:
+        # Whether the caller may call the procedure of `req`, checked without
+        # calling it, e.g. before replaying a stored response. Calls to
+        # unknown procedures are allowed, as they fail anyway.
+        module, proc_name = self._resolve_proc(req.method)
+        if module is None or not module._contains_proc(proc_name):
+            return True
+        context = self._authorize(module, proc_name, req, http_headers, None)
+        return not isinstance(context, ErrRes)
+
+    def _prepare(
+        self, req: Request, http_headers: HttpHeaders
+    ) -> tuple[VerModule, str, Deadline | None] | ErrRes[JSONValues]:
         # Check if module and method both exist
         module, proc_name = self._resolve_proc(req.method)
         if not module or not module._contains_proc(proc_name):
@@ -309,36 +971,557 @@ class VerLib:
                 ),
             )
 
+        deadline = (
+            self.deadline_header.parse(http_headers)
+            if self.deadline_header is not None
+            else None
+        )
+        # Nobody is waiting for the result anymore
+        if deadline is not None and deadline.expired():
+            return VerLibErr(
+                ErrKind.DEADLINE_EXCEEDED, ErrMsg.DEADLINE_EXCEEDED
+            ).into_json_rpc_err(req.id)
+
+        return (module, proc_name, deadline)
+
+    def _get_limits(
+        self, module: VerModule, proc_name: str
+    ) -> list[ConcurrencyLimit]:
+        limits = module._get_limits(proc_name)
+        if self.limit is not None:
+            limits.append(self.limit)
+        return limits
+
+    def _overloaded(
+        self, req: Request, rejected_by: ConcurrencyLimit
+    ) -> ErrRes[JSONValues]:
+        return ErrRes(
+            req.id,
+            Error(
+                ErrKind.OVERLOADED,
+                str(ErrMsg.OVERLOADED),
+                {"retry_after": rejected_by.retry_after()},
+            ),
+        )
+
+    def _build_context(
+        self,
+        req: Request,
+        http_headers: HttpHeaders,
+        deadline: Deadline | None,
+        timing: CallTiming | None,
+    ) -> Context:
         context = (
             self._context_builder(http_headers, req)
             if self._context_builder
             else Context()
         )
+        # None when the lib reads no deadline header, or the call sent none
+        context.deadline = deadline
+        if timing is not None:
+            timing.lap("context")
+        return context
+
+    def _admit(
+        self,
+        module: VerModule,
+        proc_name: str,
+        req: Request,
+        http_headers: HttpHeaders,
+        deadline: Deadline | None,
+        timing: CallTiming | None,
+    ) -> tuple[str | None, Context | None]:
+        # The scheduling class of the call, and its context if it had to be
+        # built to pick the class
+        context = None
+        if self._priority_classifier is not None:
+            context = self._build_context(req, http_headers, deadline, timing)
+            priority_class = self._priority_classifier(context, req)
+            if priority_class is not None:
+                return (priority_class, context)
+        return (module._get_priority_class(proc_name), context)
+
+    def _authorize(
+        self,
+        module: VerModule,
+        proc_name: str,
+        req: Request,
+        http_headers: HttpHeaders,
+        deadline: Deadline | None,
+        timing: CallTiming | None = None,
+        context: Context | None = None,
+    ) -> Context | ErrRes[JSONValues]:
+        if context is None:
+            context = self._build_context(req, http_headers, deadline, timing)
 
         access_level = (
             self._auth_provider(http_headers, req, context)
             if self._auth_provider
             else AccessLevel.public
         )
+        if timing is not None:
+            timing.lap("auth")
 
         if not module.check_procedure_access(proc_name, access_level):
-            return ErrRes(
-                req.id,
-                Error(
-                    ErrKind.NOT_AUTHORIZED,
-                    str(ErrMsg.NOT_AUTHORIZED),
-                    None,
-                ),
+            error: Error[JSONValues] = Error(
+                ErrKind.NOT_AUTHORIZED, str(ErrMsg.NOT_AUTHORIZED), None
+            )
+            return ErrRes(req.id, error)
+
+        # Waiting for admission may have used up the remaining budget
+        if deadline is not None and deadline.expired():
+            return VerLibErr(
+                ErrKind.DEADLINE_EXCEEDED, ErrMsg.DEADLINE_EXCEEDED
+            ).into_json_rpc_err(req.id)
+
+        return context
+
+    def _finish(
+        self, req: Request, result: CallOutcome
+    ) -> Response[JSONValues, JSONValues]:
+        if not isinstance(result, VerLibErr):
+            return OkRes(req.id, result if not req.is_notification else None)
+
+        err = result
+        if err.exc is not None:
+            return ErrRes(req.id, self.errors.handle(req.method, err.exc))
+        return err.into_json_rpc_err(req.id)
+
+    def _submit_notification(
+        self,
+        req: Request,
+        module: VerModule,
+        proc_name: str,
+        params: list[JSONValues] | dict[str, JSONValues],
+        context: Context,
+        deadline: Deadline | None,
+    ) -> Response[JSONValues, JSONValues]:
+        def run_notification():
+            result = module._call_procedure(proc_name, params, context)
+            if inspect.isawaitable(result):
+                result = _run_awaitable(result, deadline)
+            # Nobody gets the error, but it still shows up in the metrics
+            self._finish(req, result)
+
+        # Admission only covers handing the notification over, the executor
+        # bounds how many of them run at once
+        cast(NotificationExecutor, self.notifications).submit(run_notification)
+        return OkRes(req.id, None)
+
+    def _cache_key(
+        self,
+        module: VerModule,
+        proc_name: str,
+        method: str,
+        params: list[JSONValues] | dict[str, JSONValues],
+    ) -> bytes | None:
+        # None if the results of the procedure are not cached
+        if (
+            self.result_cache is None
+            or module._procedures[proc_name].cache_ttl is None
+        ):
+            return None
+        return result_key(method, params)
+
+    def _cached_result(self, cache_key: bytes | None) -> bytes | None:
+        # Still encoded, as a cached result may itself be None
+        if cache_key is None:
+            return None
+        return cast(ResultCache, self.result_cache).get(cache_key)
+
+    def _cache_result(
+        self,
+        module: VerModule,
+        proc_name: str,
+        cache_key: bytes,
+        result: CallOutcome,
+    ):
+        # Only successful results are cached
+        if isinstance(result, VerLibErr):
+            return
+        try:
+            value = json.dumps(result, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return
+        cast(ResultCache, self.result_cache).set(
+            cache_key,
+            value.encode(),
+            cast(float, module._procedures[proc_name].cache_ttl),
+        )
+
+    def _call_timing(
+        self, timing: CallTiming | None
+    ) -> tuple[CallTiming | None, bool]:
+        # Transports pass their own `timing` so that parsing and serializing
+        # are part of it, and report slow calls themselves. Also returns
+        # whether the call reports its own timing.
+        if timing is None and self.slow_calls is not None:
+            return (CallTiming(), True)
+        return (timing, False)
+
+    def _observe(self, req: Request, timing: CallTiming | None):
+        cast(SlowCallLog, self.slow_calls).observe(
+            req.method, req.id, cast(CallTiming, timing)
+        )
+
+    def execute_rpc(
+        self,
+        req: Request,
+        http_headers: HttpHeaders = _empty_headers,
+        *,
+        timing: CallTiming | None = None,
+    ) -> Response[JSONValues, JSONValues]:
+        timing, own_timing = self._call_timing(timing)
+
+        profiler = self.profiler
+        if profiler.active and profiler.should_profile(req.method):
+            res = profiler.run(
+                req.method, self._execute_rpc, req, http_headers, timing
             )
+        else:
+            res = self._execute_rpc(req, http_headers, timing)
+
+        if own_timing:
+            self._observe(req, timing)
+        return res
+
+    def _begin(
+        self,
+        req: Request,
+        http_headers: HttpHeaders,
+        timing: CallTiming | None,
+    ) -> _Call | ErrRes[JSONValues]:
+        # The steps before admission, shared by the sync and async paths
+        prepared = self._prepare(req, http_headers)
+        if timing is not None:
+            timing.lap("prepare")
+        if isinstance(prepared, ErrRes):
+            return prepared
+        module, proc_name, deadline = prepared
+
+        limits = self._get_limits(module, proc_name)
+        priority_class, context = (
+            self._admit(module, proc_name, req, http_headers, deadline, timing)
+            if limits
+            else (None, None)
+        )
+        return _Call(
+            module, proc_name, deadline, limits, priority_class, context
+        )
+
+    def _admitted(
+        self,
+        call: _Call,
+        req: Request,
+        rejected_by: ConcurrencyLimit | None,
+        timing: CallTiming | None,
+    ) -> ErrRes[JSONValues] | None:
+        if timing is not None:
+            timing.lap("admission")
+        if rejected_by is not None:
+            return self._overloaded(req, rejected_by)
+        call.started = time.perf_counter()
+        return None
+
+    def _before_procedure(
+        self,
+        call: _Call,
+        req: Request,
+        http_headers: HttpHeaders,
+        timing: CallTiming | None,
+    ) -> Response[JSONValues, JSONValues] | None:
+        # The steps between admission and the procedure, shared by the sync
+        # and async paths. Returns the response if the procedure is not to
+        # be called.
+        context = self._authorize(
+            call.module,
+            call.proc_name,
+            req,
+            http_headers,
+            call.deadline,
+            timing,
+            call.context,
+        )
+        if isinstance(context, ErrRes):
+            return context
+        call.context = context
 
         params = req.params if req.params != None else []
+        call.params = params
+        if req.is_notification and self.notifications is not None:
+            return self._submit_notification(
+                req, call.module, call.proc_name, params, context, call.deadline
+            )
+
+        call.cache_key = self._cache_key(
+            call.module, call.proc_name, req.method, params
+        )
+        cached = self._cached_result(call.cache_key)
+        if cached is not None:
+            return self._finish(req, json.loads(cached))
+        return None
 
-        result: Result[JSONValues, VerLibErr] = module._call_procedure(
-            proc_name, params, context
+    def _after_procedure(
+        self,
+        call: _Call,
+        req: Request,
+        result: CallOutcome,
+        timing: CallTiming | None,
+    ) -> Response[JSONValues, JSONValues]:
+        if timing is not None:
+            timing.lap("procedure")
+        if call.cache_key is not None:
+            self._cache_result(
+                call.module, call.proc_name, call.cache_key, result
+            )
+        return self._finish(req, result)
+
+    def _release(self, call: _Call):
+        release_all(call.limits, time.perf_counter() - call.started)
+
+    def _execute_rpc(
+        self,
+        req: Request,
+        http_headers: HttpHeaders,
+        timing: CallTiming | None,
+    ) -> Response[JSONValues, JSONValues]:
+        call = self._begin(req, http_headers, timing)
+        if isinstance(call, ErrRes):
+            return call
+        rejected_by = acquire_all(
+            call.limits, priority_class=call.priority_class
         )
+        overloaded = self._admitted(call, req, rejected_by, timing)
+        if overloaded is not None:
+            return overloaded
 
-        ignore_result: bool = req.is_notification
-        if result.is_ok():
-            return OkRes(req.id, result.unwrap() if not ignore_result else None)
+        try:
+            res = self._before_procedure(call, req, http_headers, timing)
+            if res is not None:
+                return res
+            result = call.module._call_procedure(
+                call.proc_name, call.params, cast(Context, call.context)
+            )
+            # Async procedures are cancelled once the deadline passes
+            if inspect.isawaitable(result):
+                result = _run_awaitable(result, call.deadline)
+            return self._after_procedure(call, req, result, timing)
+        finally:
+            self._release(call)
 
-        return result.unwrap_err().into_json_rpc_err(req.id)
+    async def execute_rpc_async(
+        self,
+        req: Request,
+        http_headers: HttpHeaders = _empty_headers,
+        *,
+        run_sync: RunSync | None = None,
+        timing: CallTiming | None = None,
+    ) -> Response[JSONValues, JSONValues]:
+        # Same as execute_rpc, but async procedures are awaited on the running
+        # event loop. Sync procedures are passed to `run_sync` if given (e.g.
+        # to run them in a worker thread), or called inline otherwise.
+        timing, own_timing = self._call_timing(timing)
+        res = await self._execute_rpc_async(req, http_headers, run_sync, timing)
+        if own_timing:
+            self._observe(req, timing)
+        return res
+
+    async def _execute_rpc_async(
+        self,
+        req: Request,
+        http_headers: HttpHeaders,
+        run_sync: RunSync | None,
+        timing: CallTiming | None,
+    ) -> Response[JSONValues, JSONValues]:
+        import asyncio
+
+        call = self._begin(req, http_headers, timing)
+        if isinstance(call, ErrRes):
+            return call
+        # Queued calls wait on the event loop, without holding a thread
+        rejected_by = await acquire_all_async(call.limits, call.priority_class)
+        overloaded = self._admitted(call, req, rejected_by, timing)
+        if overloaded is not None:
+            return overloaded
+
+        try:
+            res = self._before_procedure(call, req, http_headers, timing)
+            if res is not None:
+                return res
+            invoke = functools.partial(
+                call.module._call_procedure,
+                call.proc_name,
+                call.params,
+                cast(Context, call.context),
+            )
+            if call.module._procedures[call.proc_name].is_async:
+                result = invoke()
+            else:
+                # Only the sync procedures are profiled, as cProfile can't
+                # attribute time across awaits
+                profiler = self.profiler
+                if profiler.active and profiler.should_profile(req.method):
+                    invoke = functools.partial(profiler.run, req.method, invoke)
+                result = await run_sync(invoke) if run_sync else invoke()
+            if inspect.isawaitable(result):
+                try:
+                    result = await asyncio.wait_for(
+                        result,
+                        call.deadline.remaining() if call.deadline else None,
+                    )
+                except asyncio.TimeoutError:
+                    result = VerLibErr(
+                        ErrKind.DEADLINE_EXCEEDED, ErrMsg.DEADLINE_EXCEEDED
+                    )
+                except Exception as exc:
+                    result = _raised(exc)
+            return self._after_procedure(call, req, result, timing)
+        finally:
+            self._release(call)
+
+    def _split_batch(self, reqs: Sequence[Request]) -> tuple[
+        list[tuple[int, Request]],
+        list[tuple[VerModule, str, list[tuple[int, Request]]]],
+    ]:
+        # Calls to batched procedures are grouped by procedure, all other
+        # calls are executed one by one
+        singles: list[tuple[int, Request]] = []
+        groups: dict[str, tuple[VerModule, str, list[tuple[int, Request]]]] = {}
+        for i, req in enumerate(reqs):
+            module, proc_name = self._resolve_proc(req.method)
+            if module is None or not isinstance(
+                module._procedures.get(proc_name), BatchedVerProcedure
+            ):
+                singles.append((i, req))
+                continue
+            if req.method not in groups:
+                groups[req.method] = (module, proc_name, [])
+            groups[req.method][2].append((i, req))
+        return (singles, list(groups.values()))
+
+    def _execute_group(
+        self,
+        module: VerModule,
+        proc_name: str,
+        members: list[tuple[int, Request]],
+        http_headers: HttpHeaders,
+    ) -> list[tuple[int, Response[JSONValues, JSONValues]]]:
+        proc = cast(BatchedVerProcedure, module._procedures[proc_name])
+        responses: list[tuple[int, Response[JSONValues, JSONValues]]] = []
+        ready: list[tuple[int, Request, tuple[JSONValues, ...]]] = []
+        for i, req in members:
+            prepared = self._prepare(req, http_headers)
+            if isinstance(prepared, ErrRes):
+                responses.append((i, prepared))
+                continue
+            context = self._authorize(
+                module, proc_name, req, http_headers, prepared[2]
+            )
+            if isinstance(context, ErrRes):
+                responses.append((i, context))
+                continue
+            args = proc.bind(req.params if req.params != None else [])
+            if args is None:
+                responses.append(
+                    (
+                        i,
+                        VerLibErr(
+                            ErrKind.INVALID_PARAMS, ErrMsg.INVALID_PARAMS
+                        ).into_json_rpc_err(req.id),
+                    )
+                )
+                continue
+            ready.append((i, req, args))
+
+        if not ready:
+            return responses
+
+        # The merged calls are admitted as a single invocation, in the class
+        # of the procedure
+        limits = self._get_limits(module, proc_name)
+        rejected_by = acquire_all(
+            limits, priority_class=module._get_priority_class(proc_name)
+        )
+        if rejected_by is not None:
+            responses.extend(
+                (i, self._overloaded(req, rejected_by)) for i, req, _ in ready
+            )
+            return responses
+
+        started = time.perf_counter()
+        try:
+            results: Sequence[CallOutcome] = proc.call_many(
+                [args for _, _, args in ready]
+            )
+        except Exception as exc:
+            # Every call of the batch gets the error of the invocation, which
+            # is recorded once
+            error = self.errors.handle(ready[0][1].method, exc)
+            responses.extend((i, ErrRes(req.id, error)) for i, req, _ in ready)
+            return responses
+        finally:
+            release_all(limits, time.perf_counter() - started)
+
+        responses.extend(
+            (i, self._finish(req, result))
+            for (i, req, _), result in zip(ready, results)
+        )
+        return responses
+
+    def execute_batch(
+        self,
+        reqs: Sequence[Request],
+        http_headers: HttpHeaders = _empty_headers,
+    ) -> list[Response[JSONValues, JSONValues]]:
+        # Responses are returned in the order of the requests
+        responses: list[Response[JSONValues, JSONValues] | None] = [None] * len(
+            reqs
+        )
+        singles, groups = self._split_batch(reqs)
+        for i, req in singles:
+            responses[i] = self.execute_rpc(req, http_headers)
+        for module, proc_name, members in groups:
+            for i, res in self._execute_group(
+                module, proc_name, members, http_headers
+            ):
+                responses[i] = res
+        return cast(list[Response[JSONValues, JSONValues]], responses)
+
+    async def execute_batch_async(
+        self,
+        reqs: Sequence[Request],
+        http_headers: HttpHeaders = _empty_headers,
+        *,
+        run_sync: RunSync | None = None,
+    ) -> list[Response[JSONValues, JSONValues]]:
+        import asyncio
+
+        responses: list[Response[JSONValues, JSONValues] | None] = [None] * len(
+            reqs
+        )
+        singles, groups = self._split_batch(reqs)
+
+        async def execute_single(i: int, req: Request):
+            responses[i] = await self.execute_rpc_async(
+                req, http_headers, run_sync=run_sync
+            )
+
+        async def execute_group(
+            module: VerModule,
+            proc_name: str,
+            members: list[tuple[int, Request]],
+        ):
+            call = functools.partial(
+                self._execute_group, module, proc_name, members, http_headers
+            )
+            for i, res in await run_sync(call) if run_sync else call():
+                responses[i] = res
+
+        await asyncio.gather(
+            *(execute_single(i, req) for i, req in singles),
+            *(
+                execute_group(module, proc_name, members)
+                for module, proc_name, members in groups
+            ),
+        )
+        return cast(list[Response[JSONValues, JSONValues]], responses)
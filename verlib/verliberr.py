@@ -14,6 +14,8 @@ class ErrKind(IntEnum):
     INVALID_PARAMS = 0
     PROCEDURE_RAISED_EXCEPTION = -32500
     NOT_AUTHORIZED = -32501
+    OVERLOADED = -32502
+    DEADLINE_EXCEEDED = -32503
 
 
 class ErrMsg(Enum):
@@ -22,12 +24,14 @@ class ErrMsg(Enum):
         "An error occurred during the execution of the procedure."
     )
     NOT_AUTHORIZED = "Insufficient privileges to invoke procedure."
+    OVERLOADED = "The server is overloaded, retry the call later."
+    DEADLINE_EXCEEDED = "The deadline of the request was exceeded."
 
     def __str__(self) -> str:
         return self.value
 
 
-@dataclass
+@dataclass(slots=True)
 class VerLibErr:
     err_kind: ErrKind
     msg: ErrMsg
@@ -47,9 +51,19 @@ class VerLibErr:
                         None,
                     ),
                 )
+            case ErrKind.DEADLINE_EXCEEDED:
+                return ErrRes(
+                    req_id,
+                    JError(ErrKind.DEADLINE_EXCEEDED, str(self.msg), None),
+                )
             case ErrKind.PROCEDURE_RAISED_EXCEPTION:
-                # TODO: Design error treatment flow
-                assert isinstance(self.exc, Exception)
-                raise self.exc
+                # The exception itself is mapped by the ErrorRegistry of the
+                # lib, this is the error of unmapped exceptions
+                return ErrRes(
+                    req_id,
+                    JError(
+                        ErrKind.PROCEDURE_RAISED_EXCEPTION, str(self.msg), None
+                    ),
+                )
             case _:
                 return ErrRes(req_id, JError(-1, "", None))